@@ -0,0 +1,192 @@
+"""
+PocketBench worker agent: runs jobs from a PocketBench server's queue on this machine.
+
+    python agent.py --server http://bench-host:5000 --name box1 --token <shared token>
+
+The agent registers its specs, sends heartbeats, claims jobs that fit its free RAM,
+runs them with the local backend, streams their logs back and uploads the result
+records, which the server merges into its own store. Jobs of an agent that stops
+sending heartbeats are reassigned. Several agents can share one machine as long as
+each has its own --name (every agent keeps results, logs and temp files in its workdir).
+The token must match the server's POCKETBENCH_AGENT_TOKEN; a server without one only
+accepts agents on its own machine.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+RESULT_RETRIES = 8
+
+# --- SERVER API ---
+
+class AuthError(Exception): pass
+
+def _post(agent, path, payload, timeout=30):
+    headers = {"Authorization": f"Bearer {agent['token']}"} if agent["token"] else {}
+    r = requests.post(agent["server"] + path, json=payload, headers=headers, timeout=timeout)
+    if r.status_code in (401, 403): raise AuthError(r.json().get("msg", r.reason))
+    if r.status_code == 409: return r.json() # The job is no longer this agent's
+    r.raise_for_status()
+    return r.json()
+
+def _identity(agent):
+    """Specs and current free resources (optionally capped by --max-ram-gb)."""
+    from src.system_info import get_free_resources
+    resources = get_free_resources()
+    if agent["max_ram"]: resources["ram_available"] = min(resources["ram_available"], agent["max_ram"])
+    return {"agent_id": agent["agent_id"], "name": agent["name"], "specs": agent["specs"], "resources": resources}
+
+def _register(agent):
+    """Retries until the server answers; it tells the agent how often to check in."""
+    while True:
+        try:
+            reply = _post(agent, "/api/agents/register", _identity(agent))
+            agent["heartbeat_interval"] = reply.get("heartbeat_interval", 5)
+            agent["poll_interval"] = reply.get("poll_interval", 3)
+            print(f"[AGENT] Registered with {agent['server']} as {agent['name']} ({agent['agent_id']}).")
+            return
+        except AuthError as e:
+            sys.exit(f"[AGENT] Server refused the agent: {e}. Check --token.")
+        except Exception as e:
+            print(f"[AGENT] Server unreachable ({e}). Retrying in 5s...")
+            time.sleep(5)
+
+def _heartbeat_loop(agent):
+    from src import backend
+    while True:
+        try:
+            reply = _post(agent, "/api/agents/heartbeat", dict(_identity(agent), job_id=agent["job_id"]))
+            if reply.get("stop") and agent["job_id"] in reply["stop"]:
+                print(f"[AGENT] Server asked to stop {agent['job_id']}.")
+                backend.kill_current_process() # The agent runs one job at a time
+        except Exception as e:
+            print(f"[AGENT] Heartbeat failed: {e}")
+        time.sleep(agent["heartbeat_interval"])
+
+# --- JOBS ---
+
+def run_job(agent, job, settings):
+    """
+    Runs one claimed job through the local backend, forwarding its output.
+    Returns (status, lost): lost means the server took the job back (missed heartbeats).
+    """
+    from src import backend
+    outcome = {"status": "failed", "lost": False}
+    def on_job_done(job_id, status): outcome["status"] = status
+
+    # The server queues the leaderboard upload of the records it ingests
+    options = dict(settings, upload=False, prefetch=False)
+    for text, results, path, start_info, telemetry in backend.run_batch_process(
+        [job], settings.get("batch", 1), settings.get("device", "auto"), settings.get("verbosity", "INFO"),
+        max_parallel=1, batch_id=f"agent_{job['job_id']}", on_job_done=on_job_done, options=options
+    ):
+        # The server frames the job in its batch log: skip the local batch banner and footer
+        if start_info or results is not None or outcome["lost"]: continue
+        if not text and not telemetry: continue
+        try:
+            reply = _post(agent, "/api/agents/log", {"agent_id": agent["agent_id"], "job_id": job["job_id"],
+                                                      "log": text, "telemetry": telemetry})
+        except Exception as e:
+            print(f"[AGENT] Log upload failed: {e}")
+            continue
+        if reply.get("status") != "success":
+            print(f"[AGENT] {reply.get('msg')}. Stopping {job['job_id']}.")
+            outcome["lost"] = True
+            backend.kill_current_process()
+    return outcome["status"], outcome["lost"]
+
+def collect_records(job, settings):
+    """Result records this agent holds for the job's tasks, as save_result stored them."""
+    from src import backend, screening, speed_bench
+    from src.storage import get_unique_name, get_result_path, get_cached_tasks
+    unique_name = get_unique_name(job['repo_id'], job['filename'], backend.get_job_backend(job, settings))
+    tasks = job.get('tasks', ['mmlu'])
+    limit = int(job.get('limit') or 0)
+    # Screened tasks live in their own record; the speed suite always uses the regular one
+    if screening.get_config(job, settings):
+        groups = [(True, 0, [t for t in tasks if t != speed_bench.SPEED_TASK]),
+                  (False, limit, [t for t in tasks if t == speed_bench.SPEED_TASK])]
+    else:
+        groups = [(False, limit, tasks)]
+
+    records = []
+    for screen, record_limit, group in groups:
+        done = get_cached_tasks(unique_name, group, record_limit, screen) if group else []
+        if not done: continue
+        with open(get_result_path(unique_name, record_limit, screen)) as f: data = json.load(f)
+        records.append({"screen": screen, "limit": record_limit, "tasks": done, "data": data})
+    return records
+
+def report(agent, job, status, records):
+    """Uploads the final status and records, retrying while the server is unreachable."""
+    payload = {"agent_id": agent["agent_id"], "job_id": job["job_id"], "status": status, "records": records}
+    for attempt in range(RESULT_RETRIES):
+        try:
+            reply = _post(agent, "/api/agents/result", payload, timeout=120)
+            print(f"[AGENT] {job['filename']}: {status} - {reply.get('msg')}")
+            return reply.get("status") == "success"
+        except Exception as e:
+            wait = min(60, 5 * 2 ** attempt)
+            print(f"[AGENT] Result upload failed ({e}). Retrying in {wait}s...")
+            time.sleep(wait)
+    print(f"[AGENT] Gave up uploading {job['job_id']}; its results stay in {os.getcwd()}.")
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server", required=True, help="PocketBench server URL, e.g. http://bench-host:5000")
+    parser.add_argument("--name", default=socket.gethostname(), help="agent name shown in the batch log")
+    parser.add_argument("--workdir", help="results, logs and temp files of this agent (default: agent_data/<name>)")
+    parser.add_argument("--max-ram-gb", type=float, help="advertise at most this much free RAM")
+    parser.add_argument("--token", default=os.environ.get("POCKETBENCH_AGENT_TOKEN"),
+                        help="shared agent token of the server (default: $POCKETBENCH_AGENT_TOKEN)")
+    args = parser.parse_args()
+
+    # The backend keeps its files relative to the working directory
+    workdir = os.path.abspath(args.workdir or os.path.join("agent_data", args.name))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    sys.path.insert(0, ROOT)
+    from src import backend, eval_worker, system_info
+
+    agent = {
+        "server": args.server.rstrip("/"), "name": args.name, "agent_id": f"{args.name}-{uuid.uuid4().hex[:6]}",
+        "token": args.token,
+        "specs": dict(system_info.get_device_info(), host=socket.gethostname()), "job_id": None,
+        "max_ram": int(args.max_ram_gb * (1024 ** 3)) if args.max_ram_gb else None,
+        "heartbeat_interval": 5, "poll_interval": 3
+    }
+    _register(agent)
+    threading.Thread(target=_heartbeat_loop, args=(agent,), name="pocketbench-heartbeat", daemon=True).start()
+
+    try:
+        while True:
+            try: reply = _post(agent, "/api/agents/claim", _identity(agent))
+            except Exception as e:
+                print(f"[AGENT] Claim failed: {e}")
+                reply = {}
+            job = reply.get("job")
+            if not job:
+                eval_worker.shutdown_idle() # Give resident models' RAM back while idle
+                time.sleep(agent["poll_interval"])
+                continue
+
+            agent["job_id"] = job["job_id"]
+            print(f"[AGENT] Running {job['job_id']}: {job['filename']} ({', '.join(job.get('tasks', []))})")
+            settings = reply.get("settings") or {}
+            status, lost = run_job(agent, job, settings)
+            if not lost: report(agent, job, status, collect_records(job, settings) if status in ("done", "cached") else [])
+            agent["job_id"] = None
+    except KeyboardInterrupt:
+        backend.kill_current_process()
+        print("[AGENT] Stopped.")
+
+if __name__ == "__main__":
+    main()
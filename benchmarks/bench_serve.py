@@ -0,0 +1,151 @@
+"""
+Load test for serving: N concurrent SSE viewers of one batch, plus static
+asset and API requests, against `server.py --production`.
+
+A stub `lm_eval` prints a timestamped TICK line every --interval seconds.
+Each viewer measures time to its first frame and, for every TICK it
+receives, the delay between the stub printing it and the viewer reading it.
+Static / API latencies are sampled while all streams are open.
+
+    python benchmarks/bench_serve.py --streams 50 --seconds 20
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STUB = r'''#!/usr/bin/env python3
+import sys, os, json, time
+args = sys.argv
+out = args[args.index("--output_path") + 1]
+tasks = args[args.index("--tasks") + 1].split(",")
+end = time.time() + float(os.environ["STUB_SECONDS"])
+while time.time() < end:
+    print(f"TICK {time.time():.6f}", flush=True)
+    time.sleep(float(os.environ["STUB_INTERVAL"]))
+os.makedirs(os.path.join(out, "stub"), exist_ok=True)
+with open(os.path.join(out, "stub", "results.json"), "w") as f:
+    json.dump({"results": {t: {"acc,none": 0.5} for t in tasks}, "config": {"limit": None}}, f)
+'''
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _percentiles(values):
+    if not values: return {"n": 0}
+    ordered = sorted(values)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+    return {"n": len(ordered), "p50_ms": round(pick(50) * 1000, 1), "p95_ms": round(pick(95) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1)}
+
+def _viewer(base, batch_id, deadline, stats):
+    start = time.time()
+    first, delays = None, []
+    try:
+        with requests.get(f"{base}/api/queue/stream", params={"batch_id": batch_id}, stream=True, timeout=30) as r:
+            for line in r.iter_lines(decode_unicode=True):
+                if time.time() > deadline: break
+                if not line or not line.startswith("data: "): continue
+                now = time.time()
+                frame = json.loads(line[len("data: "):])
+                if first is None: first = now - start
+                for text in frame.get("log", "").splitlines():
+                    if text.startswith("TICK "): delays.append(now - float(text.split()[1]))
+                if frame.get("done"): break
+    except Exception as e:
+        stats["errors"].append(str(e))
+    with stats["lock"]:
+        if first is not None: stats["first_frame"].append(first)
+        stats["delays"].extend(delays)
+        stats["connected"] += first is not None
+
+def _probe(base, path, headers=None):
+    start = time.time()
+    r = requests.get(base + path, headers=headers or {}, timeout=30)
+    return time.time() - start, r
+
+def run(streams, seconds, interval):
+    work = tempfile.mkdtemp(prefix="pb_serve_")
+    bin_dir = os.path.join(work, "bin")
+    os.makedirs(bin_dir)
+    with open(os.path.join(bin_dir, "lm_eval"), "w") as f: f.write(STUB)
+    os.chmod(os.path.join(bin_dir, "lm_eval"), 0o755)
+
+    env = dict(os.environ, PATH=bin_dir + os.pathsep + os.environ["PATH"], STUB_SECONDS=str(seconds),
+               STUB_INTERVAL=str(interval), HF_HUB_OFFLINE="1")
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--production", "--port", str(port),
+                               "--threads", str(streams + 16)],
+                              cwd=work, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                requests.get(base + "/api/queue", timeout=1)
+                break
+            except requests.ConnectionError: time.sleep(0.2)
+
+        batch = requests.post(base + "/api/queue", json={
+            "jobs": [{"repo_id": "bench/stub", "filename": "stub.Q4_K_M.gguf", "size_bytes": 1, "tasks": ["bench_task"]}],
+            "batch": 1, "device": "cpu", "prefetch": False, "runner": "subprocess", "response_cache": False
+        }).json()
+
+        stats = {"lock": threading.Lock(), "first_frame": [], "delays": [], "connected": 0, "errors": []}
+        deadline = time.time() + seconds + 30
+        viewers = [threading.Thread(target=_viewer, args=(base, batch["batch_id"], deadline, stats), daemon=True)
+                   for _ in range(streams)]
+        for t in viewers: t.start()
+
+        # Static and API latency while every stream is open
+        time.sleep(1)
+        static, api, not_modified, gzip_ok = [], [], 0, False
+        probe_end = time.time() + max(1, seconds - 2)
+        while time.time() < probe_end:
+            elapsed, r = _probe(base, "/js/benchmark.js", {"Accept-Encoding": "gzip"})
+            static.append(elapsed)
+            gzip_ok = r.headers.get("Content-Encoding") == "gzip"
+            elapsed, r = _probe(base, "/js/benchmark.js", {"Accept-Encoding": "gzip", "If-None-Match": r.headers.get("ETag", "")})
+            static.append(elapsed)
+            not_modified += r.status_code == 304
+            elapsed, _ = _probe(base, "/api/queue")
+            api.append(elapsed)
+            time.sleep(0.1)
+
+        for t in viewers: t.join(timeout=max(1, deadline - time.time()))
+    finally:
+        server.terminate()
+        try: server.wait(timeout=10)
+        except subprocess.TimeoutExpired: server.kill()
+        shutil.rmtree(work, ignore_errors=True)
+
+    return {
+        "streams": streams,
+        "connected": stats["connected"],
+        "errors": stats["errors"][:5],
+        "time_to_first_frame": _percentiles(stats["first_frame"]),
+        "frame_delay": _percentiles(stats["delays"]),
+        "static_latency": _percentiles(static),
+        "api_latency": _percentiles(api),
+        "static_304s": not_modified,
+        "static_gzip": gzip_ok
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=20, help="concurrent SSE viewers")
+    parser.add_argument("--seconds", type=float, default=15, help="how long the stub batch streams")
+    parser.add_argument("--interval", type=float, default=0.1, help="seconds between stub log lines")
+    args = parser.parse_args()
+    print(json.dumps(run(args.streams, args.seconds, args.interval), indent=2))
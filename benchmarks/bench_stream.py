@@ -0,0 +1,85 @@
+"""
+Measures PocketBench's own CPU cost while streaming lm_eval output.
+
+A stub `lm_eval` floods stdout (log lines + tqdm redraws) and the batch
+runner forwards it exactly as the /api/run SSE path does. The reported
+CPU time is for the server process only; the stub's cost is excluded.
+
+    python benchmarks/bench_stream.py --lines 200000
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import psutil
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STUB = r'''#!/usr/bin/env python3
+import sys, os, json
+args = sys.argv
+out = args[args.index("--output_path") + 1]
+tasks = args[args.index("--tasks") + 1].split(",")
+n = int(os.environ.get("STUB_LINES", "100000"))
+w = sys.stdout.write
+for i in range(n):
+    if i % 4 == 0: w(f"\r{i * 100 // n:3d}%|#####     | {i}/{n} [00:01<00:01, 9999.99it/s]")
+    else: w(f"INFO [evaluator.py:{i}] Building contexts for task on rank 0... {i}\n")
+sys.stdout.flush()
+os.makedirs(os.path.join(out, "stub"), exist_ok=True)
+with open(os.path.join(out, "stub", "results.json"), "w") as f:
+    json.dump({"results": {t: {"acc,none": 0.5} for t in tasks}, "config": {"limit": None}}, f)
+'''
+
+def run(lines, jobs, parallel):
+    work = tempfile.mkdtemp(prefix="pb_bench_")
+    bin_dir = os.path.join(work, "bin")
+    os.makedirs(bin_dir)
+    stub_path = os.path.join(bin_dir, "lm_eval")
+    with open(stub_path, "w") as f: f.write(STUB)
+    os.chmod(stub_path, 0o755)
+
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+    os.environ["STUB_LINES"] = str(lines)
+    os.chdir(work)
+    sys.path.insert(0, ROOT)
+    from src import backend
+    backend.enqueue_upload = lambda path: 0 # Never touch the real leaderboard
+
+    batch = [{"repo_id": "bench/stub", "filename": f"stub-{i}.Q4_K_M.gguf", "size_bytes": 1,
+              "tasks": [f"task{i}"]} for i in range(jobs)]
+
+    me = psutil.Process()
+    cpu0, t0 = me.cpu_times(), time.perf_counter()
+    frames, out_bytes = 0, 0
+    for log_chunk, *_ in backend.run_batch_process(batch, 1, "cpu", max_parallel=parallel,
+                                             options={"prefetch": False, "runner": "subprocess"}):
+        # Same serialisation cost as the SSE route
+        out_bytes += len(f"data: {json.dumps({'log': log_chunk})}\n\n")
+        frames += 1
+    wall = time.perf_counter() - t0
+    cpu1 = me.cpu_times()
+    cpu = (cpu1.user - cpu0.user) + (cpu1.system - cpu0.system)
+
+    shutil.rmtree(work, ignore_errors=True)
+    return {
+        "lines_per_job": lines,
+        "jobs": jobs,
+        "wall_s": round(wall, 3),
+        "server_cpu_s": round(cpu, 3),
+        "server_cpu_pct": round(100 * cpu / wall, 1) if wall else 0,
+        "sse_frames": frames,
+        "sse_bytes": out_bytes,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=100000, help="lines emitted per stub job")
+    parser.add_argument("--jobs", type=int, default=2)
+    parser.add_argument("--parallel", default="2")
+    args = parser.parse_args()
+    print(json.dumps(run(args.lines, args.jobs, args.parallel), indent=2))
@@ -0,0 +1,286 @@
+"""
+Regression suite for PocketBench's own hot paths, offline on synthetic fixtures.
+
+    local_models  get_local_models over a fake HF cache of --models models--* dirs
+    logs_list     /api/logs_list over --logs batch logs (the first call indexes them)
+    stream        run_batch_process + SSE framing of a stub lm_eval's output
+    results       bulk save_result, then check_cache / get_missing_tasks
+    startup       cold import of the server and time until /api/ready answers
+
+Each scenario runs in a fresh process and temp dir. Timings are milliseconds
+(lower is better); `info` values are context and never compared.
+
+    python benchmarks/bench_suite.py --out bench.json
+    python benchmarks/bench_suite.py --compare bench.json   # exit 1 on a regression
+"""
+import os
+import sys
+import json
+import time
+import struct
+import shutil
+import hashlib
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+SCENARIOS = ("local_models", "logs_list", "stream", "results", "startup")
+REPEATS = 5
+TOLERANCE = 0.25   # A metric regresses when it is this much slower than the baseline...
+MIN_DELTA_MS = 5   # ...and slower by at least this many ms (timer noise on fast paths)
+
+# --- HELPERS ---
+
+def _median_ms(fn, repeats=REPEATS):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(sorted(samples)[len(samples) // 2] * 1000, 2)
+
+def _once_ms(fn):
+    start = time.perf_counter()
+    result = fn()
+    return round((time.perf_counter() - start) * 1000, 2), result
+
+def _gguf_stub(file_type):
+    """Smallest GGUF the header reader accepts: v3, no tensors, general.file_type only."""
+    key = b"general.file_type"
+    return (b"GGUF" + struct.pack("<IQQ", 3, 0, 1) + struct.pack("<Q", len(key)) + key
+            + struct.pack("<II", 4, file_type))
+
+# --- FIXTURES ---
+
+QUANTS = [("Q4_K_M", 15), ("Q8_0", 7), ("Q5_K_M", 17), ("F16", 1)]
+
+def make_hf_cache(root, models):
+    """models--org--name folders like huggingface_hub writes them, plus a few ghosts and partial downloads."""
+    for i in range(models):
+        repo = os.path.join(root, f"models--org{i % 50}--model-{i}-GGUF")
+        if i % 100 == 99:  # Ghost: no snapshot tree
+            os.makedirs(os.path.join(repo, "blobs"))
+            continue
+        rev = hashlib.sha1(str(i).encode()).hexdigest()
+        os.makedirs(os.path.join(repo, "blobs"))
+        os.makedirs(os.path.join(repo, "refs"))
+        os.makedirs(os.path.join(repo, "snapshots", rev))
+        with open(os.path.join(repo, "refs", "main"), "w") as f: f.write(rev)
+        for quant, file_type in QUANTS[:1 + i % 3]:
+            blob = hashlib.sha256(f"{i}-{quant}".encode()).hexdigest()
+            with open(os.path.join(repo, "blobs", blob), "wb") as f: f.write(_gguf_stub(file_type))
+            os.symlink(os.path.join("..", "..", "blobs", blob), os.path.join(repo, "snapshots", rev, f"model-{i}.{quant}.gguf"))
+        if i % 100 == 50:
+            with open(os.path.join(repo, "blobs", "partial.incomplete"), "wb") as f: f.write(b"\0" * 1024)
+
+def make_logs(logs_dir, count):
+    """Finished batch logs shaped like the runner's: job headers, lm_eval noise, outcome markers. Older ones gzipped."""
+    import gzip
+    os.makedirs(logs_dir, exist_ok=True)
+    base = datetime(2024, 1, 1).timestamp()
+    for i in range(count):
+        name = f"BATCH_{datetime.fromtimestamp(base + i * 60).strftime('%Y%m%d_%H%M%S')}.log"
+        outcome = ("SUCCESS", "FAILURE", "CACHED", "STOPPED")[i % 4]
+        lines = [f"=== BATCH {i} ===\n"]
+        for j in range(2):
+            lines.append(f"JOB {j + 1}/2: org{i % 50}/model-{i}-GGUF/model-{i}.Q4_K_M.gguf\n")
+            lines += [f"INFO [evaluator.py:{k}] Building contexts for arc_easy on rank 0... {k}\n" for k in range(40)]
+            lines.append(f"[{outcome}] job {j + 1} finished with token{i}\n")
+        text = "".join(lines)
+        if i < count // 2:
+            with gzip.open(os.path.join(logs_dir, name + ".gz"), "wt") as f: f.write(text)
+        else:
+            with open(os.path.join(logs_dir, name), "w") as f: f.write(text)
+
+def _fake_result(task, i):
+    return {
+        "results": {task: {"alias": task, "acc,none": 0.5 + (i % 40) / 100, "acc_stderr,none": 0.01}},
+        "configs": {task: {"task": task, "num_fewshot": 0, "metric_list": [{"metric": "acc"}]}},
+        "versions": {task: 1.0},
+        "config": {"model": "hf", "limit": None}
+    }
+
+# --- SCENARIOS (each runs in its own process, inside its temp dir) ---
+
+def bench_local_models(args):
+    os.environ["HF_HUB_CACHE"] = os.path.abspath("hf_cache")
+    make_hf_cache(os.environ["HF_HUB_CACHE"], args.models)
+    from src import hf_utils
+
+    cold_ms, items = _once_ms(hf_utils.get_local_models)
+    warm_ms = _median_ms(hf_utils.get_local_models)
+    # Restart: the inventory is read back from disk
+    def restart():
+        hf_utils._inventory = None
+        hf_utils.get_local_models()
+    restart_ms = _median_ms(restart)
+    # One new download: only its repo is rescanned
+    repo = os.path.join(os.environ["HF_HUB_CACHE"], "models--org0--model-0-GGUF")
+    rev = os.listdir(os.path.join(repo, "snapshots"))[0]
+    with open(os.path.join(repo, "blobs", "new"), "wb") as f: f.write(_gguf_stub(7))
+    os.symlink(os.path.join("..", "..", "blobs", "new"), os.path.join(repo, "snapshots", rev, "model-0.Q8_0.gguf"))
+    changed_ms, _ = _once_ms(hf_utils.get_local_models)
+    return {"metrics": {"cold_scan_ms": cold_ms, "warm_ms": warm_ms, "restart_ms": restart_ms, "one_changed_ms": changed_ms},
+            "info": {"repos": args.models, "items": len(items)}}
+
+def bench_logs_list(args):
+    from src import log_store
+    make_logs(log_store.LOGS_DIR, args.logs)
+    import server
+    client = server.app.test_client()
+    def get(query):
+        reply = client.get("/api/logs_list?" + query).get_json()
+        assert reply["status"] == "success", reply
+        return reply
+
+    first_ms, page = _once_ms(lambda: get("limit=50"))
+    return {"metrics": {
+        "first_list_ms": first_ms,
+        "page_ms": _median_ms(lambda: get("limit=50")),
+        "deep_page_ms": _median_ms(lambda: get(f"limit=50&offset={args.logs - 100}")),
+        "sort_size_ms": _median_ms(lambda: get("limit=50&sort=size_bytes&order=asc")),
+        "filter_model_ms": _median_ms(lambda: get("limit=50&model=model-42-GGUF")),
+        "filter_outcome_ms": _median_ms(lambda: get("limit=50&outcome=FAILURE")),
+        "search_ms": _median_ms(lambda: get(f"limit=50&q=token{args.logs // 2}")),
+        "reindex_ms": _once_ms(lambda: client.post("/api/logs_reindex"))[0]
+    }, "info": {"logs": args.logs, "total": page["total"]}}
+
+def bench_stream(args):
+    # bench_stream.py owns the stub lm_eval and the SSE framing loop
+    sys.path.insert(0, BENCH_DIR)
+    import bench_stream
+    stats = bench_stream.run(args.lines, 2, "2")
+    return {"metrics": {"wall_ms": round(stats["wall_s"] * 1000, 1), "server_cpu_ms": round(stats["server_cpu_s"] * 1000, 1)},
+            "info": {k: stats[k] for k in ("lines_per_job", "jobs", "sse_frames", "sse_bytes")}}
+
+def bench_results(args):
+    from src import storage
+    tasks = ["arc_easy", "hellaswag", "mmlu", "winogrande"]
+    names = [storage.get_unique_name(f"org{i % 50}/model-{i}-GGUF", f"model-{i}.Q4_K_M.gguf") for i in range(args.records)]
+
+    def save_all():
+        for i, name in enumerate(names):
+            for task in tasks:
+                storage.save_result(name, _fake_result(task, i), f"org{i % 50}/model-{i}-GGUF", f"model-{i}.Q4_K_M.gguf", [task])
+    save_ms, _ = _once_ms(save_all)
+    def hits():
+        for name in names: assert storage.check_cache(name, tasks) is not None
+    def misses():
+        for name in names: assert storage.get_missing_tasks(name, tasks + ["gsm8k"]) == ["gsm8k"]
+    calls = len(names) * len(tasks)
+    return {"metrics": {
+        "save_result_total_ms": save_ms,
+        "save_result_each_ms": round(save_ms / calls, 3),
+        "check_cache_hits_ms": _median_ms(hits, 3),
+        "missing_tasks_ms": _median_ms(misses, 3)
+    }, "info": {"records": args.records, "save_calls": calls}}
+
+def bench_startup(args):
+    import urllib.request
+    from src import startup
+    profiles = [startup.import_profile("server") for _ in range(3)]
+    median = lambda key: sorted(p[key] for p in profiles)[1]
+
+    # Process start -> first 200 from the readiness probe (fresh dir: no queue or caches to resume)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--port", str(port)],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/ready", timeout=1) as r:
+                    if r.status == 200: break
+            except OSError:
+                if time.perf_counter() - start > 60: raise RuntimeError("server never became ready")
+                time.sleep(0.01)
+        ready_ms = round((time.perf_counter() - start) * 1000, 1)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {"metrics": {"import_ms": median("imports_ms"), "import_process_ms": median("process_ms"), "first_ready_ms": ready_ms},
+            "info": {"modules": profiles[0]["modules"], "top_packages": profiles[0]["packages"][:5]}}
+
+# --- RUNNER ---
+
+def _run_scenario(name, args):
+    """Runs one scenario in a child process with its own cwd, HF cache and no network."""
+    work = tempfile.mkdtemp(prefix=f"pb_suite_{name}_")
+    env = dict(os.environ, HF_HUB_OFFLINE="1", PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    cmd = [sys.executable, os.path.abspath(__file__), "--scenario", name, "--models", str(args.models),
+           "--logs", str(args.logs), "--lines", str(args.lines), "--records", str(args.records)]
+    try:
+        proc = subprocess.run(cmd, cwd=work, env=env, capture_output=True, text=True)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    try: return json.loads(proc.stdout.strip().splitlines()[-1])
+    except (IndexError, ValueError):
+        return {"error": (proc.stderr or proc.stdout).strip().splitlines()[-1:] or [f"exit {proc.returncode}"]}
+
+def _commit():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError: return None
+
+def compare(report, baseline, tolerance):
+    """Metrics slower than the baseline by more than `tolerance` (and MIN_DELTA_MS). Returns [(scenario, metric, old, new)]."""
+    regressions = []
+    for name, result in report["scenarios"].items():
+        old_metrics = baseline.get("scenarios", {}).get(name, {}).get("metrics", {})
+        for metric, new in result.get("metrics", {}).items():
+            old = old_metrics.get(metric)
+            if old is None: continue
+            if new > old * (1 + tolerance) and new - old >= MIN_DELTA_MS:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="comma-separated scenarios (default: all)")
+    parser.add_argument("--models", type=int, default=2000, help="models--* folders in the fake HF cache")
+    parser.add_argument("--logs", type=int, default=10000, help="batch log files")
+    parser.add_argument("--lines", type=int, default=50000, help="lines per stub lm_eval job")
+    parser.add_argument("--records", type=int, default=500, help="models saved with save_result (4 tasks each)")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline report: exit 1 if a metric regressed")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="allowed slowdown vs the baseline (0.25 = 25%%)")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)  # Child process: run one scenario, print its JSON
+    args = parser.parse_args()
+
+    if args.scenario:
+        sys.path.insert(0, ROOT)
+        print(json.dumps(globals()[f"bench_{args.scenario}"](args)))
+        return
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown: parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    report = {"commit": _commit(), "time": datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "platform": platform.platform(), "scenarios": {}}
+    for name in names:
+        print(f"[{name}] running...", file=sys.stderr)
+        report["scenarios"][name] = _run_scenario(name, args)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f: json.dump(report, f, indent=2)
+
+    failed = [n for n, r in report["scenarios"].items() if "error" in r]
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f: baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name}.{metric}: {old} -> {new} ms (+{(new / old - 1) * 100 if old else 0:.0f}%)", file=sys.stderr)
+        if not regressions: print(f"No regressions vs {baseline.get('commit') or args.compare}.", file=sys.stderr)
+    for name in failed: print(f"FAILED {name}: {report['scenarios'][name]['error']}", file=sys.stderr)
+    sys.exit(1 if regressions or failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,25 @@
-from flask import Flask, jsonify, request, Response, send_from_directory
-from flask_cors import CORS
-from src import hf_utils, backend, system_info
+from src import startup # First: starts the cold-start clock
+with startup.phase("flask"):
+    from flask import Flask, jsonify, request, Response
+    from flask_cors import CORS
+    from src import static_files
+# Subsystems are imported by the routes (and startup steps) that use them, not with the app
 import json
+import hmac
 import os
-import datetime
+import threading
 
 app = Flask(__name__, static_folder='static')
 CORS(app)
+STATIC_DIR = os.path.join(app.root_path, 'static')
+
+# Production serving: each SSE viewer holds one server thread while it watches a batch, so
+# streams are capped below the pool size; the spare threads keep the UI and API responsive
+SERVER_THREADS = int(os.environ.get("POCKETBENCH_THREADS", 64))
+STREAM_RESERVE = 8
+_stream_slots = None # threading.BoundedSemaphore set by serve() for waitress
+_workers_lock = threading.Lock()
+_workers_started = False
 
 # --- CONFIGURATION ---
 POPULAR_TASKS = [
@@ -17,26 +30,171 @@ POPULAR_TASKS = [
 # --- STATIC FILES ---
 @app.route('/')
 def index():
-    return send_from_directory('static', 'index.html')
+    return static_files.serve(STATIC_DIR, 'index.html')
 
 @app.route('/<path:path>')
 def serve_static(path):
-    return send_from_directory('static', path)
+    return static_files.serve(STATIC_DIR, path)
+
+# --- BACKGROUND WORKERS ---
+def _run_workers():
+    with startup.phase("workers"):
+        from src import hf_utils, job_queue, uploader
+        job_queue.ensure_worker() # Resumes unfinished batches from the last run
+        uploader.ensure_worker()  # Drains uploads left in the outbox
+        if os.environ.get("POCKETBENCH_WATCH_CACHE") == "1": hf_utils.start_cache_watch()
+    startup.mark_ready()
+    print(startup.format_report(startup.report()))
+
+def start_workers():
+    """
+    Starts the queue and upload workers in the background (once). serve() calls this as soon
+    as it is listening, so /api/ready answers 503 while they import; under another WSGI host
+    the first request starts them.
+    """
+    global _workers_started
+    with _workers_lock:
+        if _workers_started: return
+        _workers_started = True
+    threading.Thread(target=_run_workers, daemon=True).start()
+
+@app.before_request
+def _start_workers_on_first_request():
+    if not _workers_started: start_workers()
 
 # --- PROCESS CONTROL ---
+@app.route('/api/ready')
+def api_ready():
+    """Readiness probe: answers at once (no Hub, queue or heavy imports) with the startup report."""
+    report = startup.report()
+    return jsonify(dict(report, status="success" if report["ready"] else "starting")), 200 if report["ready"] else 503
+
 @app.route('/api/stop', methods=['POST'])
 def api_stop():
-    success = backend.kill_current_process()
+    from src import backend, job_queue
+    data = request.get_json(silent=True) or {}
+    job_id = data.get('job_id') # Omit to stop every running job
+    success = backend.kill_current_process(job_id) or job_queue.stop_agent_jobs(job_id)
     if success: return jsonify({"status": "success", "msg": "Process stopped"})
     return jsonify({"status": "error", "msg": "No running process found"})
 
+@app.route('/api/workers')
+def api_workers():
+    """Persistent evaluation workers and the model each keeps loaded."""
+    from src import eval_worker
+    return jsonify(eval_worker.get_status())
+
+@app.route('/api/workers/release', methods=['POST'])
+def api_workers_release():
+    """Shuts down idle workers now to free the RAM held by their models."""
+    from src import eval_worker
+    count = eval_worker.shutdown_idle(max_idle=0)
+    return jsonify({"status": "success", "msg": f"{count} idle worker(s) stopped"})
+
+# --- WORKER AGENTS ---
+@app.route('/api/agents')
+def api_agents():
+    """Worker agents (agent.py) that pull jobs from this server, with their specs and current job."""
+    from src import agents
+    return jsonify(agents.list_agents())
+
+# Agents present this shared token (agent.py --token). Without one, only local agents are accepted.
+AGENT_TOKEN = os.environ.get("POCKETBENCH_AGENT_TOKEN")
+LOCAL_ADDRS = ("127.0.0.1", "::1")
+
+def _agent_request(need_job=False):
+    """(payload, None) for an authorized agent request with a valid agent_id, else (None, error response)."""
+    if AGENT_TOKEN:
+        sent = request.headers.get("Authorization", "")
+        if not sent.startswith("Bearer "): return None, (jsonify({"status": "error", "msg": "Agent token required"}), 401)
+        if not hmac.compare_digest(sent[len("Bearer "):].encode(), AGENT_TOKEN.encode()):
+            return None, (jsonify({"status": "error", "msg": "Invalid agent token"}), 403)
+    elif request.remote_addr not in LOCAL_ADDRS:
+        return None, (jsonify({"status": "error", "msg": "Remote agents need POCKETBENCH_AGENT_TOKEN set on the server"}), 403)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict): return None, (jsonify({"status": "error", "msg": "JSON body required"}), 400)
+    agent_id = data.get('agent_id')
+    if not isinstance(agent_id, str) or not agent_id.strip() or len(agent_id) > 128:
+        return None, (jsonify({"status": "error", "msg": "Missing or invalid agent_id"}), 400)
+    if need_job and not isinstance(data.get('job_id'), str):
+        return None, (jsonify({"status": "error", "msg": "Missing job_id"}), 400)
+    return data, None
+
+def _agent_heartbeat(data, job_id=None):
+    from src import agents
+    return agents.heartbeat(data['agent_id'], data.get('name'), request.remote_addr, data.get('specs'),
+                            data.get('resources'), job_id)
+
+@app.route('/api/agents/register', methods=['POST'])
+def api_agents_register():
+    from src import agents
+    data, error = _agent_request()
+    if error: return error
+    _agent_heartbeat(data)
+    return jsonify({"status": "success", "heartbeat_interval": agents.HEARTBEAT_INTERVAL,
+                    "poll_interval": agents.POLL_INTERVAL})
+
+@app.route('/api/agents/heartbeat', methods=['POST'])
+def api_agents_heartbeat():
+    """Keeps the agent alive; the reply lists jobs it should stop."""
+    data, error = _agent_request()
+    if error: return error
+    stop = _agent_heartbeat(data, data.get('job_id'))
+    return jsonify({"status": "success", "stop": stop})
+
+@app.route('/api/agents/claim', methods=['POST'])
+def api_agents_claim():
+    """Next job that fits the agent's free RAM (job is null when there is none)."""
+    from src import job_queue
+    data, error = _agent_request()
+    if error: return error
+    _agent_heartbeat(data) # Fresh free RAM to match jobs against
+    job, settings = job_queue.claim_for_agent(data['agent_id'])
+    return jsonify({"status": "success", "job": job, "settings": settings})
+
+@app.route('/api/agents/log', methods=['POST'])
+def api_agents_log():
+    from src import job_queue
+    data, error = _agent_request(need_job=True)
+    if error: return error
+    if job_queue.agent_log(data['agent_id'], data['job_id'], data.get('log', ''), data.get('telemetry')):
+        return jsonify({"status": "success"})
+    return jsonify({"status": "error", "msg": "Job is not assigned to this agent"}), 409
+
+@app.route('/api/agents/result', methods=['POST'])
+def api_agents_result():
+    """Final status and result records of an agent's job, saved into this server's store."""
+    from src import job_queue
+    data, error = _agent_request(need_job=True)
+    if error: return error
+    try: count = job_queue.agent_result(data['agent_id'], data['job_id'], data.get('status', 'failed'), data.get('records'))
+    except Exception as e: return jsonify({"status": "error", "msg": str(e)})
+    if count is None: return jsonify({"status": "error", "msg": "Job is not assigned to this agent"}), 409
+    return jsonify({"status": "success", "msg": f"{count} record(s) ingested"})
+
+@app.route('/api/response_cache')
+def api_response_cache():
+    """Per-model lm_eval request caches that retries and reruns replay from."""
+    from src import response_cache
+    return jsonify(response_cache.get_stats())
+
+@app.route('/api/response_cache/prune', methods=['POST'])
+def api_response_cache_prune():
+    """Drops the cached responses of every model file no longer in the HF cache."""
+    from src import response_cache
+    try: count = response_cache.prune()
+    except Exception as e: return jsonify({"status": "error", "msg": str(e)})
+    return jsonify({"status": "success", "msg": f"{count} cache(s) evicted"})
+
 @app.route('/api/system_info')
 def api_system():
+    from src import system_info
     return jsonify(system_info.get_device_info())
 
 # --- HUGGING FACE API ---
 @app.route('/api/search')
 def api_search():
+    from src import hf_utils
     query = request.args.get('q', '')
     if not query: return jsonify([])
     results = hf_utils.search_hf_models_rich(query)
@@ -44,18 +202,49 @@ def api_search():
 
 @app.route('/api/files')
 def api_files():
+    from src import hf_utils
     repo = request.args.get('repo', '')
     if not repo: return jsonify([])
     files = hf_utils.list_repo_files_rich(repo)
     return jsonify(files)
 
+@app.route('/api/gguf_info')
+def api_gguf_info():
+    """
+    GGUF header facts (architecture, parameters, context, quant types, KV shape) and the
+    predicted peak RAM of a run: ?repo=&filename=&backend=hf|llamacpp&batch=&n_ctx=
+    """
+    from src import hf_utils, backend, system_info
+    args = request.args
+    job = {"repo_id": args.get('repo', ''), "filename": args.get('filename', ''), "size_bytes": _int_arg('size_bytes')}
+    if not job["repo_id"] or not job["filename"]: return jsonify({"status": "error", "msg": "repo and filename are required"})
+    summary = hf_utils.get_gguf_summary(job["repo_id"], job["filename"], job["size_bytes"])
+    if not summary: return jsonify({"status": "error", "msg": "GGUF header unavailable"})
+    need, prediction = backend.predict_job_memory(job, backend.get_job_backend(job, {"backend": args.get('backend')}),
+                                                  args.get('batch', 1), _int_arg('n_ctx'))
+    label, color = system_info.check_memory_compatibility(None, need)
+    return jsonify({"status": "success", "summary": summary, "memory": prediction,
+                    "compatibility": {"label": label, "color": color}})
+
+@app.route('/api/offline', methods=['GET', 'POST'])
+def api_offline():
+    """Offline mode serves the last known Hub metadata without network calls."""
+    from src import hf_utils
+    if request.method == 'POST':
+        hf_utils.set_offline_mode((request.get_json(silent=True) or {}).get('enabled', True))
+    return jsonify({"offline": hf_utils.is_offline()})
+
 # --- LOCAL MODEL MANAGER ---
 @app.route('/api/local_models')
 def api_local_models():
+    from src import hf_utils
+    # ?refresh=1 forces a full rescan of the cache inventory
+    if request.args.get('refresh'): hf_utils.refresh_inventory(force=True)
     return jsonify(hf_utils.get_local_models())
 
 @app.route('/api/delete_model', methods=['POST'])
 def api_delete_model():
+    from src import hf_utils, prefetch, response_cache
     data = request.json
     repo_id = data.get('repo_id')
     revision = data.get('revision')
@@ -66,18 +255,22 @@ def api_delete_model():
         return jsonify({"status": "error", "msg": "Missing parameters"})
         
     success, msg = hf_utils.delete_local_file(repo_id, revision, filename, path)
+    if success:
+        if repo_id: prefetch.forget(repo_id, filename) # A later batch must download it again
+        # Cached lm_eval responses of a model file that is gone are dead weight
+        try: response_cache.prune(repo_id, filename)
+        except Exception as e: print(f"Response cache prune error: {e}")
     status = "success" if success else "error"
     return jsonify({"status": status, "msg": msg})
 
 # --- BENCHMARK EXECUTION ---
 @app.route('/api/tasks')
 def api_tasks_list():
-    return jsonify(sorted(POPULAR_TASKS))
+    from src import speed_bench
+    # The speed suite (tok/s, TTFT) is selectable like any accuracy task
+    return jsonify(sorted(POPULAR_TASKS) + [speed_bench.SPEED_TASK])
 
-@app.route('/api/run', methods=['POST'])
-def api_run():
-    data = request.json
-    
+def _parse_run_request(data):
     # Process Jobs
     if 'jobs' in data:
         jobs = data['jobs']
@@ -87,83 +280,286 @@ def api_run():
             "repo_id": data.get('repo_id'),
             "filename": data.get('filename'),
             "tasks": data.get('tasks', ['mmlu']),
+            "backend": data.get('backend', 'hf'),
             "limit": 0 # Default to NO LIMIT
         }]
 
-    batch_size = data.get('batch', 1)
-    device = data.get('device', 'auto')
-    verbosity = data.get('verbosity', 'INFO')
+    settings = {
+        "batch": data.get('batch', 1),
+        "device": data.get('device', 'auto'),
+        "verbosity": data.get('verbosity', 'INFO'),
+        "parallel": data.get('parallel', 'auto'),
+        "prefetch": data.get('prefetch', True),
+        "disk_budget_gb": data.get('disk_budget_gb'),
+        "evict_after": data.get('evict_after', False),
+        "runner": data.get('runner', 'worker'),
+        "backend": data.get('backend', 'hf'), # Default for jobs without their own `backend`
+        "threads": data.get('threads', 'auto'),
+        "n_ctx": data.get('n_ctx'),
+        "speed": data.get('speed'), # Sweep for the speed suite: prompt_lengths, threads, batch_sizes, trials...
+        "response_cache": data.get('response_cache', True), # Replay lm_eval responses computed by earlier runs
+        "screen": data.get('screen'), # Quick screen: true or {ci_half_width, confidence, start, growth, max_limit}
+        "dispatch": data.get('dispatch', 'auto') # auto (worker agents if any are online), local or agents
+    }
+    return jobs, settings
+
+def _stream_batch(batch_id, since=0):
+    """SSE feed of a queued batch. Disconnecting only detaches the viewer."""
+    from src import job_queue
+    # No proxy buffering / caching: frames must reach viewers as they happen
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    slots = _stream_slots
+    if slots and not slots.acquire(blocking=False):
+        # Every stream thread is taken: the batch still runs, its log stays readable in Logs
+        msg = f"[SERVER] Too many live viewers ({SERVER_THREADS - STREAM_RESERVE} max). Follow the batch in Logs.\n"
+        frame = {"log": msg, "batch_id": batch_id, "done": True}
+        return Response(f"data: {json.dumps(frame)}\n\n", status=503, mimetype='text/event-stream', headers=headers)
 
     def generate_logs():
-        for log_chunk, results, path, start_info in backend.run_batch_process(
-            jobs, batch_size, device, verbosity
-        ):
-            payload = {
-                "log": log_chunk, 
-                "results": results, 
-                "path": path,
-                "start_info": start_info,
-                "done": False
-            }
-            if "BATCH COMPLETE" in log_chunk: payload["done"] = True
-            yield f"data: {json.dumps(payload)}\n\n"
-            
-    return Response(generate_logs(), mimetype='text/event-stream')
+        try:
+            # Frames are coalesced by the queue; 'index' is the resume point (?since=)
+            for index, frame in job_queue.subscribe(batch_id, since):
+                if frame is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                payload = dict(frame, batch_id=batch_id, index=index, done=False)
+                if "BATCH COMPLETE" in frame["log"]: payload["done"] = True
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield f"data: {json.dumps({'log': '', 'batch_id': batch_id, 'done': True})}\n\n"
+        finally:
+            if slots: slots.release()
+
+    return Response(generate_logs(), mimetype='text/event-stream', headers=headers)
+
+@app.route('/api/run', methods=['POST'])
+def api_run():
+    """Queues the batch and streams its progress (the batch survives disconnects)."""
+    from src import job_queue
+    jobs, settings = _parse_run_request(request.json)
+    batch_id, _ = job_queue.enqueue_batch(jobs, settings)
+    return _stream_batch(batch_id)
+
+# --- JOB QUEUE ---
+@app.route('/api/queue', methods=['GET'])
+def api_queue_list():
+    from src import job_queue
+    return jsonify(job_queue.list_batches(int(request.args.get('limit', 50))))
+
+@app.route('/api/queue', methods=['POST'])
+def api_queue_add():
+    """Queues jobs without streaming. Pass batch_id to append to an unfinished batch."""
+    from src import job_queue
+    data = request.json
+    jobs, settings = _parse_run_request(data)
+    batch_id, job_ids = job_queue.enqueue_batch(jobs, settings, batch_id=data.get('batch_id'))
+    return jsonify({"status": "success", "batch_id": batch_id, "job_ids": job_ids})
+
+@app.route('/api/queue/stream')
+def api_queue_stream():
+    from src import job_queue
+    batch_id = request.args.get('batch_id')
+    job_id = request.args.get('job_id')
+    if not batch_id and job_id: batch_id = job_queue.find_batch_for_job(job_id)
+    if not batch_id: return jsonify({"status": "error", "msg": "Unknown batch"})
+    return _stream_batch(batch_id, int(request.args.get('since', 0)))
+
+# --- RESULTS DATABASE ---
+def _result_filters():
+    args = request.args
+    filters = {k: args.get(k) for k in ("repo_id", "gguf_file", "task", "metric", "family", "quant", "filter", "search", "backend")}
+    filters["include_limited"] = args.get('include_limited', 'false').lower() == 'true'
+    filters["include_screened"] = args.get('include_screened', 'false').lower() == 'true'
+    return filters
+
+@app.route('/api/results')
+def api_results():
+    """Filtered, sorted and paginated rows (one per model / task / metric)."""
+    from src import results_db
+    args = request.args
+    try:
+        return jsonify(results_db.query_results(
+            _result_filters(), sort=args.get('sort', 'value'), order=args.get('order', 'desc'),
+            limit=min(int(args.get('limit', 100)), 1000), offset=int(args.get('offset', 0))
+        ))
+    except Exception as e:
+        return jsonify({"status": "error", "msg": str(e)})
+
+@app.route('/api/results/best')
+def api_results_best():
+    """Best row per group, e.g. ?group_by=family&quant=Q4&task=gsm8k"""
+    from src import results_db
+    args = request.args
+    try:
+        return jsonify(results_db.best_per_group(
+            _result_filters(), group_by=args.get('group_by', 'family'),
+            order=args.get('order', 'desc'), limit=min(int(args.get('limit', 100)), 1000)
+        ))
+    except Exception as e:
+        return jsonify({"status": "error", "msg": str(e)})
+
+@app.route('/api/results/summary')
+def api_results_summary():
+    """Aggregate per group: ?group_by=quant&agg=avg&task=mmlu"""
+    from src import results_db
+    args = request.args
+    try:
+        return jsonify(results_db.aggregate(
+            _result_filters(), group_by=args.get('group_by', 'family'),
+            agg=args.get('agg', 'avg'), limit=min(int(args.get('limit', 100)), 1000)
+        ))
+    except Exception as e:
+        return jsonify({"status": "error", "msg": str(e)})
+
+@app.route('/api/results/reindex', methods=['POST'])
+def api_results_reindex():
+    """Bulk (re)imports the JSON result files into the index."""
+    from src import results_db
+    force = (request.get_json(silent=True) or {}).get('force', False)
+    try: return jsonify(dict(results_db.import_json_dir(force=force), status="success"))
+    except Exception as e: return jsonify({"status": "error", "msg": str(e)})
+
+# --- LEADERBOARD UPLOADS ---
+@app.route('/api/uploads')
+def api_uploads():
+    """Outbox depth and the most recent upload attempts."""
+    from src import uploader
+    return jsonify(uploader.get_status(int(request.args.get('limit', 50))))
+
+@app.route('/api/uploads/retry', methods=['POST'])
+def api_uploads_retry():
+    from src import uploader
+    path = (request.get_json(silent=True) or {}).get('path') # Omit to retry every failed upload
+    count = uploader.retry_failed(path)
+    return jsonify({"status": "success", "msg": f"{count} upload(s) re-queued"})
 
 # --- LOG HISTORY ---
 @app.route('/api/logs_list')
 def api_logs_list():
+    """
+    Paginated log history from the log index: ?offset=&limit=&sort=&order=
+    Filters: model, task, outcome (SUCCESS / FAILURE / STOPPED ...), status, batch_id,
+    since / until (unix time) and q (full-text search over log contents).
+    """
+    from src import log_index
+    args = request.args
+    filters = {k: args.get(k) for k in ("model", "task", "outcome", "status", "batch_id", "since", "until", "q")}
     try:
-        if not os.path.exists("logs"): return jsonify([])
-        files = []
-        for f in os.listdir("logs"):
-            if f.endswith(".log"):
-                path = os.path.join("logs", f)
-                stats = os.stat(path)
-                size_kb = stats.st_size / 1024
-                
-                parts = f.split("__") # Format: BATCH_Date_Time.log or Date_Model.log
-                name_disp = f if len(parts) < 2 else parts[-1].replace(".log", "")
-                
-                # Try parsing timestamp
-                date_disp = "Unknown"
-                try:
-                    ts_str = f.split("BATCH_")[1].split(".")[0]
-                    dt = datetime.datetime.strptime(ts_str, "%Y%m%d_%H%M%S")
-                    date_disp = dt.strftime("%Y-%m-%d %H:%M")
-                except: 
-                    date_disp = datetime.datetime.fromtimestamp(stats.st_mtime).strftime("%Y-%m-%d %H:%M")
-
-                files.append({
-                    "filename": f,
-                    "date": date_disp,
-                    "name": name_disp,
-                    "size": f"{size_kb:.1f} KB"
-                })
-        return jsonify(sorted(files, key=lambda x: x['filename'], reverse=True))
+        page = log_index.list_logs(filters, sort=args.get('sort', 'started'), order=args.get('order', 'desc'),
+                                   limit=_int_arg('limit') or 50, offset=_int_arg('offset') or 0)
     except Exception as e:
-        return jsonify({"error": str(e)})
+        return jsonify({"status": "error", "msg": str(e)})
+    for row in page["rows"]:
+        row["name"] = row["batch_id"] or row["filename"]
+        row["size"] = f"{(row['size_bytes'] or 0) / 1024:.1f} KB"
+    return jsonify(dict(page, status="success"))
+
+@app.route('/api/logs_reindex', methods=['POST'])
+def api_logs_reindex():
+    """Rebuilds the log index from the files on disk."""
+    from src import log_index
+    try: stats = log_index.import_logs(force=True)
+    except Exception as e: return jsonify({"status": "error", "msg": str(e)})
+    return jsonify({"status": "success", "msg": f"Indexed {stats['imported']} of {stats['scanned']} logs"})
+
+def _int_arg(name):
+    value = request.args.get(name)
+    try: return int(value) if value not in (None, "") else None
+    except ValueError: return None
 
 @app.route('/api/logs_content')
 def api_logs_content():
+    """Whole log as text (decompressed). Prefer logs_tail / logs_range for large logs."""
+    from src import log_store
     filename = request.args.get('filename')
     if not filename: return "No filename"
-    try: return send_from_directory('logs', filename)
+    try:
+        text = log_store.read_all(filename)
+        if text is None: return "Error reading log: not found"
+        return Response(text, mimetype='text/plain')
     except Exception as e: return f"Error reading log: {e}"
 
+@app.route('/api/logs_tail')
+def api_logs_tail():
+    """Bytes appended after ?offset= (omit it for the last ?max_bytes=). Returns the next offset."""
+    from src import log_store
+    filename = request.args.get('filename')
+    if not filename: return jsonify({"status": "error", "msg": "No filename"})
+    try:
+        chunk = log_store.read_tail(filename, _int_arg('offset'), _int_arg('max_bytes'))
+        if chunk is None: return jsonify({"status": "error", "msg": "File not found"})
+        return jsonify(dict(chunk, status="success"))
+    except Exception as e:
+        return jsonify({"status": "error", "msg": str(e)})
+
+@app.route('/api/logs_range')
+def api_logs_range():
+    """Pages through history: ?start=&length= reads forward, ?end=&length= reads backwards."""
+    from src import log_store
+    filename = request.args.get('filename')
+    if not filename: return jsonify({"status": "error", "msg": "No filename"})
+    try:
+        chunk = log_store.read_range(filename, _int_arg('start'), _int_arg('length'), _int_arg('end'))
+        if chunk is None: return jsonify({"status": "error", "msg": "File not found"})
+        return jsonify(dict(chunk, status="success"))
+    except Exception as e:
+        return jsonify({"status": "error", "msg": str(e)})
+
 @app.route('/api/logs_delete', methods=['POST'])
 def api_logs_delete():
+    from src import log_store, log_index
     data = request.json
     filename = data.get('filename')
     try:
-        path = os.path.join("logs", filename)
-        if os.path.exists(path):
-            os.remove(path)
+        if log_store.delete_log(filename):
+            log_index.remove(filename)
             return jsonify({"status": "success", "msg": "Log deleted"})
         return jsonify({"status": "error", "msg": "File not found"})
     except Exception as e:
         return jsonify({"status": "error", "msg": str(e)})
 
+def serve(production=False, host="127.0.0.1", port=5000, threads=SERVER_THREADS):
+    """
+    Development: Flask's debug server. Production: waitress with a fixed thread pool (live
+    streams capped at threads - STREAM_RESERVE), else the threaded Werkzeug server.
+    The background workers start once the socket is bound.
+    """
+    global SERVER_THREADS, _stream_slots
+    from werkzeug.serving import make_server
+    if not production:
+        from werkzeug.debug import DebuggedApplication
+        app.debug = True
+        run = make_server(host, port, DebuggedApplication(app, evalex=True), threaded=True).serve_forever
+    else:
+        try:
+            from waitress import create_server
+        except ImportError:
+            print("waitress is not installed (pip install waitress): using the threaded Werkzeug server.")
+            run = make_server(host, port, app, threaded=True).serve_forever
+        else:
+            SERVER_THREADS = threads
+            _stream_slots = threading.BoundedSemaphore(max(1, threads - STREAM_RESERVE))
+            run = create_server(app, host=host, port=port, threads=threads, connection_limit=max(100, threads * 2),
+                                channel_timeout=120, ident="PocketBench").run
+    start_workers()
+    run()
+
 if __name__ == '__main__':
-    print("PocketBench Server running at http://localhost:5000")
-    app.run(port=5000, debug=True, use_reloader=False)
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="PocketBench server")
+    parser.add_argument("--production", action="store_true", default=os.environ.get("POCKETBENCH_PRODUCTION") == "1",
+                        help="serve with waitress (many concurrent SSE viewers) instead of the debug server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS)
+    parser.add_argument("--startup-report", action="store_true",
+                        help="profile a cold import of the server (-X importtime, summarised) and exit")
+    args = parser.parse_args()
+
+    if args.startup_report:
+        print(startup.format_profile(startup.import_profile("server")))
+        raise SystemExit(0)
+
+    with startup.phase("static"):
+        static_files.preload(STATIC_DIR) # Compress the UI once, before the first visitor
+    print(f"PocketBench Server running at http://localhost:{args.port}" + (" (production)" if args.production else ""))
+    serve(args.production, args.host, args.port, args.threads)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import time
+import queue
+import threading
+from . import backend
+
+# Worker agents (agent.py) on other machines pull jobs from this server's queue
+HEARTBEAT_INTERVAL = 5    # Seconds between agent heartbeats
+POLL_INTERVAL = 3         # Seconds an idle agent waits before asking for work again
+AGENT_TIMEOUT = 30        # An agent silent for this long is dead: its jobs are reassigned
+MAX_JOB_ATTEMPTS = 3      # Hand-outs per job before it is failed (e.g. it keeps killing its agent)
+DISPATCH_MODES = ("auto", "local", "agents")
+
+# agent_id -> {"agent_id", "name", "host", "specs", "resources", "job_id", "registered", "last_seen"}
+_agents = {}
+_stop_requests = set()   # job_ids to cancel, delivered with the next heartbeat
+_lock = threading.Lock()
+_started = time.time()
+
+# Log / telemetry events from agents, per batch: batch_id -> Queue of (text, telemetry)
+_events = {}
+_events_lock = threading.Lock()
+
+# --- REGISTRY ---
+
+def heartbeat(agent_id, name=None, host=None, specs=None, resources=None, job_id=None):
+    """Registers or refreshes an agent. Returns the job_ids it should stop."""
+    now = time.time()
+    with _lock:
+        agent = _agents.get(agent_id)
+        joined = agent is None
+        if joined:
+            agent = _agents[agent_id] = {"agent_id": agent_id, "name": name or agent_id, "host": host,
+                                         "specs": specs or {}, "resources": {}, "job_id": None, "registered": now}
+        if specs: agent["specs"] = specs
+        if resources: agent["resources"] = resources
+        agent["job_id"] = job_id
+        agent["last_seen"] = now
+        stop = [job_id] if job_id in _stop_requests else []
+    if joined: print(f"Agent joined: {agent['name']} ({agent_id})")
+    return stop
+
+def get(agent_id):
+    with _lock:
+        agent = _agents.get(agent_id)
+        return dict(agent) if agent else None
+
+def is_alive(agent_id):
+    """Unknown agents get one timeout of grace after a server restart to re-attach."""
+    with _lock: agent = _agents.get(agent_id)
+    if not agent: return time.time() - _started < AGENT_TIMEOUT
+    return time.time() - agent["last_seen"] < AGENT_TIMEOUT
+
+def get_alive():
+    now = time.time()
+    with _lock:
+        return [dict(a) for a in _agents.values() if now - a["last_seen"] < AGENT_TIMEOUT]
+
+def list_agents():
+    now = time.time()
+    with _lock:
+        return [dict(a, alive=now - a["last_seen"] < AGENT_TIMEOUT, seen_ago=round(now - a["last_seen"], 1))
+                for a in sorted(_agents.values(), key=lambda a: a["registered"])]
+
+def use_agents(settings):
+    """Batch `dispatch` setting: auto (agents if any are online), local or agents."""
+    mode = str(settings.get("dispatch") or "auto").lower()
+    if mode not in DISPATCH_MODES: mode = "auto"
+    if mode == "auto": return bool(get_alive())
+    return mode == "agents"
+
+def free_ram(agent):
+    """RAM an agent can give a job, after the headroom its OS keeps."""
+    return (agent.get("resources") or {}).get("ram_available", 0) - backend.RAM_HEADROOM
+
+def job_memory(job, settings):
+    """Peak RAM predicted when the job was queued (see backend.predict_job_memory), else the size estimate."""
+    return job.get('memory_bytes') or backend.estimate_job_memory(job.get('size_bytes'), backend.get_job_backend(job, settings))
+
+def fits(agent, job, settings):
+    return job_memory(job, settings) <= free_ram(agent)
+
+# --- STOP REQUESTS ---
+
+def request_stop(job_id):
+    with _lock: _stop_requests.add(job_id)
+
+def clear_stop(job_id):
+    with _lock: _stop_requests.discard(job_id)
+
+def is_stop_requested(job_id):
+    with _lock: return job_id in _stop_requests
+
+# --- EVENTS ---
+
+def _get_events(batch_id):
+    with _events_lock:
+        if batch_id not in _events: _events[batch_id] = queue.Queue()
+        return _events[batch_id]
+
+def push_event(batch_id, text="", telemetry=None):
+    _get_events(batch_id).put((text, telemetry))
+
+def drain_events(batch_id, timeout=0.5):
+    """Waits for agent output, then returns everything queued as (text, telemetry)."""
+    events = _get_events(batch_id)
+    try: items = [events.get(timeout=timeout)]
+    except queue.Empty: return "", None
+    while True:
+        try: items.append(events.get_nowait())
+        except queue.Empty: break
+    samples = {}
+    for _, sample in items:
+        if sample: samples.update(sample)
+    return "".join(text for text, _ in items), samples or None
+
+def close_events(batch_id):
+    with _events_lock: _events.pop(batch_id, None)
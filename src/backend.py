@@ -4,149 +4,759 @@ import shutil
 import glob
 import json
 import time
+import queue
+import threading
+from collections import deque
 from datetime import datetime
-from .storage import save_result
-from .hf_utils import submit_result_to_leaderboard
+from .storage import save_result, get_missing_tasks, get_unique_name, get_first_leaf
+from .hf_utils import get_file_size, get_gguf_summary
+from .uploader import enqueue_upload
+from . import gguf_reader, log_index, prefetch, eval_worker, llama_backend, telemetry, speed_bench, batch_tuner, response_cache, screening
+from .system_info import get_free_resources
+from .log_pump import pump_output
+from .log_store import compress_log, reopen_for_append
 
 TEMP_OUTPUT_DIR = "temp_outputs"
 LOGS_DIR = "logs"
 
-os.makedirs(TEMP_OUTPUT_DIR, exist_ok=True)
-os.makedirs(LOGS_DIR, exist_ok=True)
+# --- SCHEDULER SETTINGS ---
+# HF backend dequantizes GGUF weights, so RAM use is a multiple of the file size
+MEMORY_FACTOR = 4.0
+MEMORY_OVERHEAD = 2 * (1024 ** 3)   # Python + torch + datasets per process
+RAM_HEADROOM = 2 * (1024 ** 3)      # Always left free for the OS
+MIN_CORES_PER_JOB = 4
 
-current_process = None
+# --- STREAMING SETTINGS ---
+MAX_FRAME_BYTES = 64 * 1024   # Upper bound of one SSE frame
+EVENT_QUEUE_SIZE = 256        # Job threads block (backpressure) when this fills
+PREFETCH_EMIT_TIMEOUT = 30    # Prefetch lines wait this long for room too, rather than being dropped
 
-def kill_current_process():
-    """Stops the currently running benchmark."""
-    global current_process
-    if current_process:
-        if current_process.poll() is None:
-            current_process.terminate()
-        current_process = None
-        return True
-    return False
+# Evaluation backends: "hf" dequantizes the GGUF into torch weights, "llamacpp" serves it natively
+BACKENDS = ("hf", "llamacpp")
 
-def run_batch_process(jobs_list, batch_size, device="auto", verbosity="INFO"):
-    global current_process
-    
+# Per-job process handles: job_id -> Popen
+running_processes = {}
+_stopped_jobs = set()
+_batch_jobs = set()  # job_ids of the running batch not finished yet (waiting for admission or running)
+_stop_all = threading.Event()
+_batch_running = threading.Event()
+_proc_lock = threading.Lock()
+
+def kill_current_process(job_id=None):
+    """Stops one running benchmark (by job_id) or every running benchmark."""
+    with _proc_lock:
+        if job_id is None:
+            _stop_all.set()
+            targets = list(running_processes.keys())
+        else:
+            targets = [job_id] if job_id in running_processes else []
+            if not targets and job_id in _batch_jobs:
+                # Not started yet (or between processes): the scheduler and _run_job skip stopped jobs
+                _stopped_jobs.add(job_id)
+                return True
+
+        for jid in targets:
+            _stopped_jobs.add(jid)
+            proc = running_processes.pop(jid)
+            if proc.poll() is None:
+                proc.terminate()
+    # Stopping all also cancels jobs waiting between retries or for admission
+    return bool(targets) or (job_id is None and _batch_running.is_set())
+
+def get_running_jobs():
+    with _proc_lock:
+        return list(running_processes.keys())
+
+def estimate_job_memory(size_bytes, backend="hf"):
+    """Rough peak RAM of an lm_eval run for a GGUF of this size."""
+    if backend == "llamacpp":
+        return int((size_bytes or 0) * llama_backend.MEMORY_FACTOR) + llama_backend.MEMORY_OVERHEAD
+    return int((size_bytes or 0) * MEMORY_FACTOR) + MEMORY_OVERHEAD
+
+def predict_job_memory(job, backend="hf", batch_size=1, n_ctx=None):
+    """
+    Peak RAM of a job predicted from its GGUF header (parameters, KV shape, vocab) for
+    this batch size and context, or (no header) the file-size estimate.
+    Returns (bytes, prediction or None). Auto batch sizes are predicted at 1.
+    """
+    summary = get_gguf_summary(job['repo_id'], job['filename'], job.get('size_bytes'))
+    if not summary: return estimate_job_memory(job.get('size_bytes') or get_file_size(job['repo_id'], job['filename']), backend), None
+    try: batch = 1 if batch_tuner.is_auto(batch_size) else int(batch_size)
+    except (TypeError, ValueError): batch = 1
+    if backend == "llamacpp": n_ctx = n_ctx or llama_backend.DEFAULT_N_CTX
+    prediction = gguf_reader.predict_memory(summary, backend, batch, n_ctx)
+    prediction["overhead"] = llama_backend.MEMORY_OVERHEAD if backend == "llamacpp" else MEMORY_OVERHEAD
+    prediction["total"] += prediction["overhead"]
+    return prediction["total"], prediction
+
+def get_job_backend(job, options=None):
+    """Per-job `backend` field, else the batch default. Accepts llama.cpp / llama_cpp spellings."""
+    name = str(job.get('backend') or (options or {}).get("backend") or "hf").lower()
+    name = name.replace(".", "").replace("_", "")
+    return name if name in BACKENDS else "hf"
+
+def _resolve_max_parallel(max_parallel, device, total_jobs, cores):
+    if str(max_parallel).lower() != "auto":
+        try: return max(1, min(int(max_parallel), total_jobs))
+        except (TypeError, ValueError): return 1
+    # GPU memory is not tracked, so accelerators stay sequential in auto mode
+    if device in ("cuda", "mps"): return 1
+    return max(1, min(cores // MIN_CORES_PER_JOB, total_jobs))
+
+def _model_spec(job, server=None, n_ctx=None):
+    """(lm_eval model type, model_args) for a job; llama.cpp jobs point at their server."""
+    if server: return "gguf", llama_backend.model_args(server, n_ctx)
+    return "hf", f"pretrained={job['repo_id']},gguf_file={job['filename']}"
+
+def _build_command(job, pending_tasks, output_path, batch_size, device, spec=None, use_cache=None):
+    model, model_args = spec or _model_spec(job)
+
+    cmd = [
+        "lm_eval", "--model", model, "--model_args", model_args,
+        "--tasks", ",".join(pending_tasks), "--output_path", output_path,
+        "--batch_size", "auto" if batch_tuner.is_auto(batch_size) else str(int(batch_size))
+    ]
+
+    # Only add limit if explicitly requested > 0
+    limit = job.get('limit', 0)
+    if limit and int(limit) > 0:
+        cmd.extend(["--limit", str(int(limit))])
+
+    if device and device != "auto" and model == "hf":
+        cmd.extend(["--device", device])
+    # Request-level cache: a retry or rerun replays every response already computed
+    if use_cache:
+        cmd.extend(["--use_cache", use_cache])
+    return cmd
+
+def _run_cli(job_id, job, pending_tasks, output_path, ctx, emit, run, limit):
+    """One lm_eval CLI process. Returns (outcome, data): done, stopped, failed (no retry) or crashed."""
+    cmd = _build_command(dict(job, limit=limit), pending_tasks, output_path, run["batch_size"], ctx["device"],
+                         run["spec"], run["cache_base"])
+
+    env = os.environ.copy()
+    env["PYTHONIOENCODING"] = "utf-8"
+    env["HF_HUB_DISABLE_PROGRESS_BARS"] = "1"
+    # Pin each job to its share of cores so parallel jobs don't oversubscribe
+    threads = str(ctx["threads"])
+    env["OMP_NUM_THREADS"] = threads
+    env["MKL_NUM_THREADS"] = threads
+
+    proc = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        bufsize=0, env=env
+    )
+    with _proc_lock: running_processes[job_id] = proc
+
+    pump_output(proc.stdout, emit)
+
+    rc = proc.wait()
+    run["rc"] = rc
+    with _proc_lock: running_processes.pop(job_id, None)
+    if job_id in _stopped_jobs: return "stopped", None
+    if rc != 0:
+        emit(f"\n[FAILURE] Crashed (Code {rc}).\n")
+        return "crashed", None
+
+    json_files = glob.glob(os.path.join(output_path, "**", "*.json"), recursive=True)
+    if not json_files:
+        emit("\n[ERROR] No JSON output generated.\n")
+        return "failed", None
+    try:
+        with open(json_files[0], 'r') as f: return "done", json.load(f)
+    except Exception as e:
+        emit(f"\n[ERROR] Result Processing Failed: {e}\n")
+        return "failed", None
+
+def _attempt_cli(job_id, job, pending_tasks, output_path, ctx, emit, run):
+    """One lm_eval CLI run in a fresh process (the isolated fallback path).
+    `run` carries the job's model spec, backend and telemetry sampler.
+    Returns (outcome, saved_path): done, stopped, failed (no retry) or crashed."""
+    if run["screen"]: return _attempt_cli_screen(job_id, job, pending_tasks, output_path, ctx, emit, run)
+    outcome, data = _run_cli(job_id, job, pending_tasks, output_path, ctx, emit, run, job.get('limit', 0))
+    if outcome != "done": return outcome, None
+    try:
+        # The CLI runs every task in one go, so they share one usage summary
+        usage = telemetry.mark_task(run["sampler"], ",".join(pending_tasks))
+        saved_path = save_result(
+            get_unique_name(job['repo_id'], job['filename'], run["backend"]), data, repo_id=job['repo_id'],
+            gguf_file=job['filename'], tasks=pending_tasks, limit=job.get('limit', 0), backend=run["backend"],
+            telemetry={t: dict(usage, shared_with=pending_tasks) for t in pending_tasks}
+        )
+        run["finished"].extend(pending_tasks)
+        emit(f"\n[SUCCESS] Results saved: {saved_path}\n")
+        return "done", saved_path
+    except Exception as e:
+        emit(f"\n[ERROR] Result Processing Failed: {e}\n")
+        return "failed", None
+
+def _attempt_cli_screen(job_id, job, pending_tasks, output_path, ctx, emit, run):
+    """Quick screen on the CLI: one process per task increment (the response cache replays
+    the samples of earlier increments). Returns (outcome, saved_path) like _attempt_cli."""
+    saved_path = None
+    for task in pending_tasks:
+        step = {"outcome": "failed"}
+        def evaluate(limit, task=task):
+            step_path = os.path.join(output_path, f"screen_{task}_{limit or 'all'}")
+            step["outcome"], data = _run_cli(job_id, job, [task], step_path, ctx, emit, run, limit)
+            return data
+        data = screening.run(evaluate, task, run["screen"], log=lambda text: emit(text + "\n"))
+        if data is None: return step["outcome"], saved_path
+        try:
+            usage = telemetry.mark_task(run["sampler"], task)
+            saved_path = save_result(
+                get_unique_name(job['repo_id'], job['filename'], run["backend"]), data, repo_id=job['repo_id'],
+                gguf_file=job['filename'], tasks=[task], backend=run["backend"], telemetry={task: usage}, screen=True
+            )
+            run["finished"].append(task)
+            emit(f"\n[SUCCESS] {task} (screened) saved: {saved_path}\n")
+        except Exception as e:
+            emit(f"\n[ERROR] Result Processing Failed ({task}): {e}\n")
+            return "failed", saved_path
+    return "done", saved_path
+
+def _attempt_speed(job_id, job, output_path, ctx, emit, run):
+    """Runs the llama.cpp speed suite in its own process and saves it into the job's record.
+    Returns (outcome, saved_path) like _attempt_cli."""
+    sweep = speed_bench.get_sweep(job, ctx, int(job.get('threads') or ctx["threads"]))
+    output_file = os.path.abspath(os.path.join(output_path, f"{speed_bench.SPEED_TASK}.json"))
+    env = os.environ.copy()
+    env["PYTHONIOENCODING"] = "utf-8"
+    env["HF_HUB_DISABLE_PROGRESS_BARS"] = "1"
+
+    proc = subprocess.Popen(
+        speed_bench.build_command(job['repo_id'], job['filename'], sweep, output_file),
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0, env=env,
+        cwd=eval_worker.PROJECT_ROOT
+    )
+    with _proc_lock: running_processes[job_id] = proc
+    pump_output(proc.stdout, emit)
+    rc = proc.wait()
+    with _proc_lock: running_processes.pop(job_id, None)
+
+    if job_id in _stopped_jobs: return "stopped", None
+    if rc == speed_bench.EXIT_UNAVAILABLE: return "failed", None
+    if rc != 0 or not os.path.exists(output_file):
+        emit(f"\n[FAILURE] Speed suite crashed (Code {rc}).\n")
+        return "crashed", None
+
+    with open(output_file, 'r') as f: data = json.load(f)
+    usage = telemetry.mark_task(run["sampler"], speed_bench.SPEED_TASK)
+    saved_path = save_result(
+        get_unique_name(job['repo_id'], job['filename'], run["backend"]), data, repo_id=job['repo_id'],
+        gguf_file=job['filename'], tasks=[speed_bench.SPEED_TASK], limit=job.get('limit', 0),
+        backend=run["backend"], telemetry={speed_bench.SPEED_TASK: usage}
+    )
+    run["finished"].append(speed_bench.SPEED_TASK)
+    emit(f"\n[SUCCESS] {speed_bench.SPEED_TASK} saved: {saved_path}\n")
+    return "done", saved_path
+
+def _attempt_worker(job_id, job, pending_tasks, output_path, ctx, emit, run):
+    """Runs the job on a persistent lm_eval worker that keeps its model loaded.
+    Each task is saved as soon as it completes (and appended to run["finished"]),
+    so a retry only runs what is left. Returns (outcome, saved_path)."""
+    repo_id, gguf_filename = job['repo_id'], job['filename']
+    spec, backend = run["spec"], run["backend"]
+    key = (repo_id, gguf_filename, spec[0], spec[1], ctx["device"])
+    worker = eval_worker.acquire(key, ctx["threads"])
+    if not worker: return "unavailable", None
+
+    saved = {"path": None, "errors": 0}
+    def on_result(task, path):
+        try:
+            with open(path, 'r') as f: data = json.load(f)
+            usage = telemetry.mark_task(run["sampler"], task)
+            saved["path"] = save_result(
+                get_unique_name(repo_id, gguf_filename, backend), data, repo_id=repo_id, gguf_file=gguf_filename,
+                tasks=[task], limit=job.get('limit', 0), backend=backend, telemetry={task: usage},
+                screen=bool(run["screen"])
+            )
+            run["finished"].append(task)
+            emit(f"\n[SUCCESS] {task}{' (screened)' if run['screen'] else ''} saved: {saved['path']}\n")
+        except Exception as e:
+            saved["errors"] += 1
+            emit(f"\n[ERROR] Result Processing Failed ({task}): {e}\n")
+
+    request = {
+        "repo_id": repo_id, "filename": gguf_filename, "model": spec[0], "model_args": spec[1], "tasks": pending_tasks,
+        "limit": int(job.get('limit', 0) or 0), "batch_size": run["batch_size"] if batch_tuner.is_auto(run["batch_size"]) else int(run["batch_size"]),
+        "device": ctx["device"], "threads": ctx["threads"], "output_path": os.path.abspath(output_path),
+        "use_cache": run["cache_base"], "screen": run["screen"]
+    }
+    with _proc_lock: running_processes[job_id] = worker["proc"]
+    try:
+        outcome = eval_worker.run_tasks(worker, request, emit, on_result)
+    finally:
+        with _proc_lock: running_processes.pop(job_id, None)
+        eval_worker.release(worker)
+
+    run["rc"] = worker["proc"].poll()
+    if job_id in _stopped_jobs: return "stopped", None
+    if outcome == "done":
+        return ("failed" if saved["errors"] else "done"), saved["path"]
+    emit("\n[FAILURE] Evaluation worker " + ("exited.\n" if outcome == "crashed" else "reported an error.\n"))
+    return "crashed", saved["path"]
+
+def _calibrate_batch(job_id, job, task, ctx, emit):
+    """Probes increasing batch sizes on a short slice of `task` using the persistent
+    worker (the model stays loaded for the real run). None if no worker is available."""
+    spec = _model_spec(job)
+    worker = eval_worker.acquire((job['repo_id'], job['filename'], spec[0], spec[1], ctx["device"]), ctx["threads"])
+    if not worker: return None
+
+    emit(f"[CALIBRATE] Finding the fastest batch size that fits ({task}, {batch_tuner.CALIBRATION_LIMIT} samples per probe)...\n")
+    probes = []
+    request = {
+        "repo_id": job['repo_id'], "filename": job['filename'], "model": spec[0], "model_args": spec[1],
+        "device": ctx["device"], "threads": ctx["threads"], "batch_size": 1,
+        "calibrate": {"task": task, "limit": batch_tuner.CALIBRATION_LIMIT, "candidates": batch_tuner.CANDIDATES,
+                      "ram_headroom": batch_tuner.RAM_HEADROOM, "min_speedup": batch_tuner.MIN_SPEEDUP}
+    }
+    with _proc_lock: running_processes[job_id] = worker["proc"]
+    try:
+        outcome = eval_worker.run_tasks(worker, request, emit, on_result=lambda task, path: None,
+                                        on_probe=lambda p: probes.append({k: v for k, v in p.items() if k != "event"}))
+    finally:
+        with _proc_lock: running_processes.pop(job_id, None)
+        eval_worker.release(worker)
+
+    if job_id in _stopped_jobs: return None
+    if outcome == "crashed":
+        # Killed mid-probe (usually the OOM killer): that size is not safe
+        tried = {p["batch_size"] for p in probes}
+        untried = [b for b in batch_tuner.CANDIDATES if b not in tried]
+        if untried: probes.append({"batch_size": untried[0], "oom": True})
+    elif outcome != "done" and not probes:
+        return None
+
+    batch_size = batch_tuner.choose(probes)
+    batch_tuner.record(job['repo_id'], job['filename'], ctx["device"], batch_size, "calibrated", probes)
+    timings = ", ".join(f"{p['batch_size']}: " + ("OOM" if p.get("oom") else f"{p['seconds']:.1f}s") for p in probes)
+    emit(f"[CALIBRATE] Using batch size {batch_size} ({timings}).\n")
+    return batch_size
+
+def _resolve_batch_size(job_id, job, tasks, ctx, emit, backend):
+    requested = job.get('batch_size') or ctx["batch_size"]
+    if not batch_tuner.is_auto(requested):
+        # A fixed size that already ran out of memory for this file is capped at what worked
+        safe = batch_tuner.get_cached(job['repo_id'], job['filename'], ctx["device"], reason="oom_backoff")
+        if safe and int(requested) > safe:
+            emit(f"[OOM] Batch size {requested} ran out of memory for {job['filename']} before. Using {safe}.\n")
+            return safe
+        return int(requested)
+    if backend == "llamacpp" or not tasks: return 1 # The gguf client scores one request at a time
+
+    cached = batch_tuner.get_cached(job['repo_id'], job['filename'], ctx["device"])
+    if cached:
+        emit(f"[CALIBRATE] Using cached batch size {cached} for {job['filename']} on {ctx['device']}.\n")
+        return cached
+    if (job.get('runner') or ctx.get("runner") or "worker") == "worker":
+        # --limit applies per subtask: probing a whole group (mmlu: 57 subjects) would be a full-size run
+        batch_size = _calibrate_batch(job_id, job, get_first_leaf(tasks[0]) or tasks[0], ctx, emit)
+        if batch_size: return batch_size
+    # Without a worker to probe with, only lm_eval's own CUDA OOM search is safe
+    return "auto" if ctx["device"] == "cuda" else 1
+
+def _resolve_response_cache(job, tasks, ctx, emit, backend):
+    """lm_eval --use_cache path for the job's model file ("" when caching is off or unavailable)."""
+    if not tasks or not ctx.get("response_cache", True): return ""
+    try: cache_base = response_cache.get_cache_base(job['repo_id'], job['filename'], backend)
+    except Exception as e:
+        emit(f"[CACHE] Response cache unavailable: {e}\n")
+        return ""
+    if not cache_base:
+        emit(f"[CACHE] No content hash for {job['filename']}; running without the response cache.\n")
+        return ""
+    emit(f"[CACHE] Response cache: {os.path.basename(cache_base)}\n")
+    return cache_base
+
+def _cache_ratio(counts):
+    requests = counts["hits"] + counts["misses"]
+    return {"hits": counts["hits"], "requests": requests,
+            "hit_ratio": round(counts["hits"] / requests, 4) if requests else 0.0}
+
+def _run_job(job_id, job, pending_tasks, ctx, emit, emit_telemetry=None):
+    """Runs a single model through lm_eval (with retries). Log lines go to `emit`,
+    resource samples of the job's process tree to `emit_telemetry`.
+    Returns the final status: done, failed or stopped."""
+    MAX_RETRIES = 2  # Benchmark Retries
+
+    run_timestamp = datetime.now().strftime("%H%M%S")
+    current_output_path = os.path.join(TEMP_OUTPUT_DIR, f"{job_id}_{run_timestamp}")
+    os.makedirs(current_output_path, exist_ok=True)
+
+    use_worker = (job.get('runner') or ctx.get("runner") or "worker") == "worker"
+    backend = get_job_backend(job, ctx)
+    n_ctx = int(job.get('n_ctx') or ctx.get("n_ctx") or llama_backend.DEFAULT_N_CTX)
+    server = None
+    saved_path = None
+    status = "failed"
+
+    def job_pids():
+        with _proc_lock: proc = running_processes.get(job_id)
+        return [p.pid for p in (proc, server and server["proc"]) if p]
+    run = {"spec": None, "backend": backend, "finished": [], "batch_size": None, "oom": False, "rc": None,
+           "cache_base": None, "cache": {"hits": 0, "misses": 0}, "screen": screening.get_config(job, ctx)}
+
+    def on_sample(sample):
+        if run["cache"]["hits"] or run["cache"]["misses"]: sample["cache"] = _cache_ratio(run["cache"])
+        emit_telemetry(sample)
+    run["sampler"] = telemetry.start(job_pids, on_sample=on_sample if emit_telemetry else None)
+
+    job_emit = emit
+    def emit(text):
+        # Remember OOM errors so the retry can back off the batch size
+        if batch_tuner.is_oom(text): run["oom"] = True
+        hits, misses = response_cache.parse_counts(text)
+        run["cache"]["hits"] += hits
+        run["cache"]["misses"] += misses
+        job_emit(text)
+
+    # --- BENCHMARK RETRY LOOP ---
+    for attempt in range(MAX_RETRIES + 1):
+        if attempt > 0:
+            emit(f"\n[RETRY] Benchmark Attempt {attempt}/{MAX_RETRIES}. Waiting 10s...\n")
+            time.sleep(10)
+        if job_id in _stopped_jobs or _stop_all.is_set():
+            emit("\n[STOPPED] User Cancelled.\n")
+            status = "stopped"
+            break
+
+        remaining = [t for t in pending_tasks if t not in run["finished"]]
+        accuracy_tasks = [t for t in remaining if t != speed_bench.SPEED_TASK]
+        telemetry.begin_task(run["sampler"])
+        run["oom"], run["rc"] = False, None
+        try:
+            if run["batch_size"] is None:
+                run["batch_size"] = _resolve_batch_size(job_id, job, accuracy_tasks, ctx, emit, backend)
+            if run["cache_base"] is None:
+                run["cache_base"] = _resolve_response_cache(job, accuracy_tasks, ctx, emit, backend)
+            spec = _model_spec(job)
+            if backend == "llamacpp" and accuracy_tasks:
+                unsupported = llama_backend.unsupported_tasks(accuracy_tasks)
+                if unsupported:
+                    emit(f"[LLAMA.CPP] POCKETBENCH_LLAMA_SERVER (llama-server) returns no prompt logprobs, so it only runs "
+                         f"generate_until tasks. Not supported: {', '.join(unsupported)}. Unset it to use the "
+                         "llama-cpp-python server, or pick generation tasks (e.g. gsm8k).\n")
+                    break # Retrying can't change the task types
+                # One llama.cpp server per job, restarted only if it died
+                if not llama_backend.is_alive(server):
+                    llama_backend.stop_server(server)
+                    server = llama_backend.start_server(
+                        job['repo_id'], job['filename'], int(job.get('threads') or ctx["threads"]), n_ctx, emit,
+                        should_stop=lambda: job_id in _stopped_jobs or _stop_all.is_set()
+                    )
+                    if not server: continue
+                spec = _model_spec(job, server, n_ctx)
+            run["spec"] = spec
+
+            outcome = "done" if not accuracy_tasks else "unavailable" # Every task was saved before a failure
+            if use_worker and accuracy_tasks:
+                outcome, saved_path = _attempt_worker(job_id, job, accuracy_tasks, current_output_path, ctx, emit, run)
+                if outcome == "unavailable":
+                    use_worker = False
+                    emit(f"[WORKER] In-process lm_eval unavailable ({eval_worker.get_status()['error'] or 'worker failed to start'}). Using the CLI.\n")
+            if outcome == "unavailable":
+                outcome, saved_path = _attempt_cli(job_id, job, accuracy_tasks, current_output_path, ctx, emit, run)
+
+            # Speed runs after accuracy on the same GGUF, in its own llama.cpp process
+            if outcome == "done" and speed_bench.SPEED_TASK in remaining:
+                outcome, speed_path = _attempt_speed(job_id, job, current_output_path, ctx, emit, run)
+                saved_path = speed_path or saved_path
+        except Exception as e:
+            with _proc_lock: running_processes.pop(job_id, None)
+            emit(f"\n[CRITICAL] Job Exception: {e}\n")
+            continue
+
+        if outcome == "done":
+            status = "done"
+            # Leaderboard upload happens in the background outbox (a worker agent leaves it to its server)
+            if ctx.get("upload", True):
+                depth = enqueue_upload(saved_path)
+                emit(f"[UPLOAD] Queued for leaderboard upload (outbox: {depth} pending).\n")
+            break
+        elif outcome == "stopped":
+            emit("\n[STOPPED] User Cancelled.\n")
+            status = "stopped"
+            break
+        elif outcome == "failed":
+            break # Ran, but produced nothing usable: retrying won't help
+
+        # Out of memory: retrying with the same arguments would crash the same way
+        if run["oom"] or run["rc"] in batch_tuner.OOM_EXIT_CODES:
+            current = run["batch_size"]
+            smaller = 1 if batch_tuner.is_auto(current) else batch_tuner.back_off(current)
+            if smaller:
+                emit(f"[OOM] Out of memory at batch size {current}. Retrying with {smaller}.\n")
+                run["batch_size"] = smaller
+                batch_tuner.record(job['repo_id'], job['filename'], ctx["device"], smaller, "oom_backoff")
+
+    llama_backend.stop_server(server)
+    usage = telemetry.stop(run["sampler"])
+    if run["cache"]["hits"] or run["cache"]["misses"]:
+        usage["cache"] = _cache_ratio(run["cache"])
+        emit(f"[CACHE] {usage['cache']['hits']}/{usage['cache']['requests']} requests replayed from the response cache "
+             f"({usage['cache']['hit_ratio']:.0%}).\n")
+    emit(f"[TELEMETRY] {telemetry.format_summary(usage)}\n")
+    if emit_telemetry: emit_telemetry(dict(usage, final=True))
+    try: shutil.rmtree(current_output_path)
+    except: pass
+    return status
+
+def run_batch_process(jobs_list, batch_size, device="auto", verbosity="INFO", max_parallel="auto",
+                      batch_id=None, on_job_done=None, fetch_jobs=None, options=None):
+    """
+    Runs a list of jobs, yielding (log, results, path, start_info, telemetry) chunks.
+    Optional hooks let the job queue persist progress:
+    - batch_id: reuse (append to) an existing batch log, e.g. when resuming
+    - on_job_done(job_id, status): called with done/failed/stopped/cached
+    - fetch_jobs(): returns jobs added to the batch while it is running
+    Batch options (dict):
+    - prefetch (default True): download upcoming GGUFs while jobs evaluate
+    - disk_budget_gb: cap on GGUF bytes in the HF cache for prefetching
+    - evict_after (default False): delete a GGUF once its results are saved
+    - runner: "worker" (default) keeps models loaded in a persistent lm_eval
+      process; "subprocess" runs the CLI per job. Jobs may override it.
+    - backend: "hf" (default) or "llamacpp"; jobs may set their own `backend`
+    - threads / n_ctx: llama.cpp threads (default: the job's core share) and context size
+    - speed: sweep for the pocketbench_speed task (see speed_bench.DEFAULT_SWEEP); jobs may override it
+    - upload (default True): queue saved results for the leaderboard upload
+    """
     # 1. Create Log File
-    batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    batch_id = batch_id or datetime.now().strftime("%Y%m%d_%H%M%S")
     log_filename = f"BATCH_{batch_id}.log"
     log_file_path = os.path.join(LOGS_DIR, log_filename)
-    
-    def log_yield(text, res=None, path=None, start_info=None):
-        with open(log_file_path, "a", encoding="utf-8") as f:
-            f.write(text)
-        return text, res, path, start_info
+    os.makedirs(LOGS_DIR, exist_ok=True)
+
+    # One buffered handle per batch; flushed per chunk so the file can be tailed
+    reopen_for_append(log_file_path)
+    log_file = open(log_file_path, "a", encoding="utf-8")
+    log_index.begin(log_filename, batch_id, jobs_list)
+
+    def log_yield(text, res=None, path=None, start_info=None, telemetry=None):
+        if text:
+            log_file.write(text)
+            log_file.flush()
+            log_index.append(log_filename, text)
+        return text, res, path, start_info, telemetry
+
+    def job_done(job_id, status):
+        with _proc_lock: _batch_jobs.discard(job_id)
+        if on_job_done: on_job_done(job_id, status)
+
+    _stop_all.clear()
+    _stopped_jobs.clear()
+    _batch_jobs.clear()
+    _batch_running.set()
+    finished = False
+    try:
+        yield from _schedule_jobs(
+            jobs_list, batch_id, log_filename, log_yield, job_done, fetch_jobs,
+            batch_size, device, max_parallel, options or {}
+        )
+        finished = True
+    finally:
+        _batch_running.clear()
+        _batch_jobs.clear()
+        log_file.close()
+        # Finished logs are stored compressed; the log API decompresses on read
+        if finished:
+            try: compress_log(log_file_path)
+            except Exception as e: print(f"Log compression failed: {e}")
+        log_index.finish(log_filename, "finished" if finished else "interrupted")
+
+def job_missing_tasks(job, tasks, options):
+    """Tasks without stored results. Screened tasks are looked up in the screening record;
+    the speed suite isn't sampled, so it always uses the regular one."""
+    unique_name = get_unique_name(job['repo_id'], job['filename'], get_job_backend(job, options))
+    limit = job.get('limit', 0)
+    if not screening.get_config(job, options): return get_missing_tasks(unique_name, tasks, limit)
+    missing = set(get_missing_tasks(unique_name, [t for t in tasks if t != speed_bench.SPEED_TASK], screen=True))
+    if speed_bench.SPEED_TASK in tasks: missing.update(get_missing_tasks(unique_name, [speed_bench.SPEED_TASK], limit))
+    return [t for t in tasks if t in missing]
+
+def _evict_finished(model, pending, active, job_models, log_yield):
+    """Frees disk for a benchmarked GGUF unless another queued/running job still needs it."""
+    still_needed = any((j['repo_id'], j['filename']) == model for _, j in pending) or \
+        any(job_models[j] == model for j in active)
+    if still_needed: return
+    if prefetch.evict_model(*model):
+        yield log_yield(f"[PREFETCH] Evicted {model[1]} from the cache (results saved).\n")
 
-    # 2. Yield Initial Info
+def _drain_events(events, timeout=0.5):
+    """Waits for job output, then coalesces everything queued into one frame.
+    Returns (text, telemetry) where telemetry maps job_id -> latest sample (or None)."""
+    try: items = [events.get(timeout=timeout)]
+    except queue.Empty: return "", None
+    chunks, samples, size = [], {}, 0
+    while True:
+        for item in items:
+            if isinstance(item, dict): samples.update(item)
+            else:
+                chunks.append(item)
+                size += len(item)
+        if size >= MAX_FRAME_BYTES: break
+        try: items = [events.get_nowait()]
+        except queue.Empty: break
+    return "".join(chunks), samples or None
+
+def _schedule_jobs(jobs_list, batch_id, log_filename, log_yield, job_done, fetch_jobs,
+                   batch_size, device, max_parallel, options):
+    """Scheduler body of run_batch_process (the caller owns the log handle)."""
+    # 2. Plan Resources
+    jobs_list = [dict(j, job_id=j.get('job_id') or f"{batch_id}_{i}") for i, j in enumerate(jobs_list)]
     total_jobs = len(jobs_list)
-    start_msg = f"--- BATCH STARTED: {total_jobs} Models Scheduled ---\nDevice: {device} | Batch Size: {batch_size}\n\n"
-    yield log_yield(start_msg, start_info={"log_file": log_filename})
+    resources = get_free_resources()
+    cores = resources["cpu_logical"]
+    ram_budget = resources["ram_available"] - RAM_HEADROOM
+    # Batches that can grow are not capped by their initial size
+    parallel = _resolve_max_parallel(max_parallel, device, total_jobs if fetch_jobs is None else cores, cores)
+    threads_per_job = max(1, cores // parallel)
+    job_ids = [j['job_id'] for j in jobs_list]
+    with _proc_lock: _batch_jobs.update(job_ids)
 
-    MAX_RETRIES = 2  # Benchmark Retries
-    UPLOAD_RETRIES = 3 # Upload Retries
-
-    for index, job in enumerate(jobs_list):
-        repo_id = job['repo_id']
-        gguf_filename = job['filename']
-        tasks = job.get('tasks', ['mmlu'])
-        limit = job.get('limit', 0)
-        
-        job_header = f"\n{'='*40}\nJOB {index+1}/{total_jobs}: {gguf_filename}\n{'='*40}\n"
-        yield log_yield(job_header)
-
-        # Setup Command
-        run_timestamp = datetime.now().strftime("%H%M%S")
-        current_output_path = os.path.join(TEMP_OUTPUT_DIR, f"{batch_id}_{index}_{run_timestamp}")
-        os.makedirs(current_output_path, exist_ok=True)
-        
-        model_args = f"pretrained={repo_id},gguf_file={gguf_filename}"
-        
-        cmd = [
-            "lm_eval", "--model", "hf", "--model_args", model_args, 
-            "--tasks", ",".join(tasks), "--output_path", current_output_path, 
-            "--batch_size", str(int(batch_size))
-        ]
-        
-        # Only add limit if explicitly requested > 0
-        if limit and int(limit) > 0: 
-            cmd.extend(["--limit", str(int(limit))])
-            
-        if device and device != "auto": 
-            cmd.extend(["--device", device])
-
-        env = os.environ.copy()
-        env["PYTHONIOENCODING"] = "utf-8"
-        env["HF_HUB_DISABLE_PROGRESS_BARS"] = "1"
-
-        # --- BENCHMARK RETRY LOOP ---
-        for attempt in range(MAX_RETRIES + 1):
-            if attempt > 0:
-                yield log_yield(f"\n[RETRY] Benchmark Attempt {attempt}/{MAX_RETRIES}. Waiting 10s...\n")
-                time.sleep(10)
-
-            try:
-                current_process = subprocess.Popen(
-                    cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
-                    text=True, bufsize=1, encoding="utf-8", env=env
-                )
-                
-                while True:
-                    if current_process is None: break
-                    line = current_process.stdout.readline()
-                    if not line:
-                        if current_process is None or current_process.poll() is not None: break
-                        continue
-                    if "%|" not in line and "Running loglikelihood" not in line:
-                        yield log_yield(line)
-
-                rc = current_process.poll() if current_process else -1
-                current_process = None
-
-                if rc == 0:
-                    json_files = glob.glob(os.path.join(current_output_path, "**", "*.json"), recursive=True)
-                    if json_files:
-                        try:
-                            with open(json_files[0], 'r') as f: data = json.load(f)
-                            unique_name = f"{repo_id}_{gguf_filename}"
-                            saved_path = save_result(unique_name, data, repo_id=repo_id, gguf_file=gguf_filename)
-                            yield log_yield(f"\n[SUCCESS] Results saved: {saved_path}\n")
-                            
-                            # --- UPLOAD RETRY LOOP ---
-                            uploaded = False
-                            for up_try in range(UPLOAD_RETRIES):
-                                try:
-                                    yield log_yield(f"[UPLOAD] Auto-uploading (Attempt {up_try+1})...\n")
-                                    msg = submit_result_to_leaderboard(saved_path)
-                                    yield log_yield(f"[UPLOAD] {msg}\n")
-                                    uploaded = True
-                                    break 
-                                except Exception as up_err:
-                                    yield log_yield(f"[UPLOAD ERROR] {up_err}. Retrying in 5s...\n")
-                                    time.sleep(5)
-                            
-                            if not uploaded:
-                                yield log_yield("[UPLOAD] Failed after retries. Result is saved locally.\n")
-
-                        except Exception as e:
-                            yield log_yield(f"\n[ERROR] Result Processing Failed: {e}\n")
-                    else:
-                        yield log_yield("\n[ERROR] No JSON output generated.\n")
-                    
-                    break # Success, exit benchmark loop
-                
-                elif rc == -1:
-                    yield log_yield("\n[STOPPED] User Cancelled.\n")
-                    return
-                else:
-                    yield log_yield(f"\n[FAILURE] Crashed (Code {rc}).\n")
-
-            except Exception as e:
-                yield log_yield(f"\n[CRITICAL] Job Exception: {e}\n")
-        
-        try: shutil.rmtree(current_output_path)
-        except: pass
-        time.sleep(2)
-
-    yield log_yield(f"\n{'='*40}\nBATCH COMPLETE\n{'='*40}\n", res=[], path=None)
\ No newline at end of file
+    # 3. Yield Initial Info
+    start_msg = (
+        f"--- BATCH STARTED: {total_jobs} Models Scheduled ---\n"
+        f"Device: {device} | Batch Size: {batch_size} | Parallel Jobs: {parallel} | Threads/Job: {threads_per_job}\n\n"
+    )
+    yield log_yield(start_msg, start_info={"log_file": log_filename, "batch_id": batch_id, "job_ids": job_ids})
+
+    ctx = {"batch_size": batch_size, "device": device, "threads": threads_per_job, "runner": options.get("runner"),
+           "backend": options.get("backend"), "n_ctx": options.get("n_ctx"), "speed": options.get("speed"),
+           "response_cache": options.get("response_cache", True), "screen": options.get("screen"),
+           "upload": options.get("upload", True)}
+    if str(options.get("threads") or "auto").isdigit(): ctx["threads"] = int(options["threads"])
+    use_prefetch = options.get("prefetch", True)
+    budget_gb = options.get("disk_budget_gb")
+    budget_bytes = int(float(budget_gb) * (1024 ** 3)) if budget_gb else None
+    events = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+    pending = deque(enumerate(jobs_list))
+    active = {}  # job_id -> (thread, reserved_ram)
+    statuses = {}
+    job_models = {}  # job_id -> (repo_id, filename)
+    looked_ahead = set()  # job_ids already considered for prefetching
+    plans = {}  # job_id -> (pending_tasks, need, prediction) of a job waiting for admission
+
+    def prefetch_emit(text):
+        # The download thread outlives the batch: once nothing drains the queue, give up after a while
+        events.put(text, timeout=PREFETCH_EMIT_TIMEOUT)
+
+    def start_job(index, job, pending_tasks, reserved):
+        job_id = job['job_id']
+        # Prefix interleaved lines so parallel streams stay readable
+        prefix = f"[J{index+1}] " if parallel > 1 else ""
+        def emit(text):
+            if prefix: text = "".join(prefix + l if l.strip() else l for l in text.splitlines(True))
+            events.put(text)
+        def emit_telemetry(sample):
+            # Kept out of the log text: frames carry it as a separate 'telemetry' field
+            events.put({job_id: dict(sample, job=index+1, model=job['filename'])})
+        def target():
+            statuses[job_id] = _run_job(job_id, job, pending_tasks, ctx, emit, emit_telemetry)
+        t = threading.Thread(target=target, daemon=True)
+        active[job_id] = (t, reserved)
+        job_models[job_id] = (job['repo_id'], job['filename'])
+        t.start()
+
+    # --- SCHEDULER LOOP ---
+    while True:
+        if fetch_jobs and not _stop_all.is_set():
+            for job in fetch_jobs():
+                with _proc_lock: _batch_jobs.add(job['job_id'])
+                pending.append((total_jobs, job))
+                total_jobs += 1
+                log_index.add_jobs(log_filename, [job])
+                yield log_yield(f"\n[QUEUE] Added {job['filename']} (Job {total_jobs}).\n")
+
+        if not pending and not active: break
+
+        if _stop_all.is_set() and pending:
+            for _, job in pending: job_done(job['job_id'], "stopped")
+            pending.clear()
+            prefetch.cancel_pending()
+
+        # Jobs stopped while they waited for admission
+        for entry in [e for e in pending if e[1]['job_id'] in _stopped_jobs]:
+            pending.remove(entry)
+            yield log_yield(f"\n[STOPPED] {entry[1]['filename']} was stopped before it started.\n")
+            job_done(entry[1]['job_id'], "stopped")
+
+        # A. Admit jobs while RAM / core budget allows (always at least one)
+        while pending and len(active) < parallel:
+            index, job = pending[0]
+            repo_id, gguf_filename = job['repo_id'], job['filename']
+            tasks = job.get('tasks', ['mmlu'])
+
+            # Skip tasks already evaluated for this model + limit (or screening). The plan is kept
+            # while the job waits for RAM; a finishing job (which may have stored its tasks) resets it
+            job_backend = get_job_backend(job, options)
+            if job['job_id'] not in plans:
+                pending_tasks = job_missing_tasks(job, tasks, options)
+                need, prediction = predict_job_memory(job, job_backend, job.get('batch_size') or batch_size,
+                                                      job.get('n_ctx') or ctx["n_ctx"]) if pending_tasks else (0, None)
+                plans[job['job_id']] = (pending_tasks, need, prediction)
+            pending_tasks, need, prediction = plans[job['job_id']]
+            if not pending_tasks:
+                del plans[job['job_id']]
+                pending.popleft()
+                yield log_yield(f"\n[CACHED] JOB {index+1}/{total_jobs}: {gguf_filename} - all {len(tasks)} tasks already evaluated. Skipping.\n")
+                job_done(job['job_id'], "cached")
+                continue
+
+            committed = sum(r for _, r in active.values())
+            free_now = get_free_resources()["ram_available"] - RAM_HEADROOM
+            if active and (committed + need > ram_budget or need > free_now):
+                break
+
+            pending.popleft()
+            del plans[job['job_id']]
+            backend_tag = " [llama.cpp]" if job_backend == "llamacpp" else ""
+            job_header = f"\n{'='*40}\nJOB {index+1}/{total_jobs}: {gguf_filename}{backend_tag}\n{'='*40}\n"
+            yield log_yield(job_header)
+            if len(pending_tasks) < len(tasks):
+                cached = [t for t in tasks if t not in pending_tasks]
+                yield log_yield(f"[CACHED] Reusing: {', '.join(cached)}\n[CACHED] Running: {', '.join(pending_tasks)}\n")
+            screen = screening.get_config(job, options)
+            if screen:
+                yield log_yield(f"[SCREEN] Quick screen: {screen['start']}+ random documents per subtask (seed {screen['seed']}; "
+                                f"first N on the CLI runner) until the {float(screen['confidence']):.0%} CI is within "
+                                f"+/-{float(screen['ci_half_width']):.3f}.\n")
+            if prediction:
+                yield log_yield(f"[MEMORY] {gguf_reader.format_prediction(prediction)}.\n")
+            if need > ram_budget:
+                yield log_yield(f"[WARNING] Estimated {need / (1024 ** 3):.1f} GB RAM exceeds available memory.\n")
+            start_job(index, job, pending_tasks, need)
+
+        # B. Download the next jobs' GGUFs while the current ones evaluate
+        if use_prefetch:
+            for _, job in list(pending)[:prefetch.PREFETCH_AHEAD]:
+                repo_id, gguf_filename = job['repo_id'], job['filename']
+                if job['job_id'] in looked_ahead: continue
+                looked_ahead.add(job['job_id'])
+                if not job_missing_tasks(job, job.get('tasks', ['mmlu']), options): continue
+                size_bytes = job.get('size_bytes') or get_file_size(repo_id, gguf_filename)
+                prefetch.request_prefetch(repo_id, gguf_filename, size_bytes, emit=prefetch_emit, budget_bytes=budget_bytes)
+
+        # C. Forward interleaved job output, coalesced into bounded frames
+        frame, samples = _drain_events(events)
+        if frame or samples: yield log_yield(frame, telemetry=samples)
+
+        # D. Reap finished jobs
+        for job_id in [j for j, (t, _) in active.items() if not t.is_alive()]:
+            del active[job_id]
+            plans.clear()
+            status = statuses.get(job_id, "failed")
+            job_done(job_id, status)
+            if status == "done" and options.get("evict_after"):
+                yield from _evict_finished(job_models[job_id], pending, active, job_models, log_yield)
+
+    while not events.empty():
+        frame, samples = _drain_events(events, timeout=0)
+        yield log_yield(frame, telemetry=samples)
+
+    if _stop_all.is_set():
+        yield log_yield("\n[STOPPED] Batch Cancelled.\n")
+        return
+
+    yield log_yield(f"\n{'='*40}\nBATCH COMPLETE\n{'='*40}\n", res=[], path=None)
@@ -0,0 +1,68 @@
+import os
+import re
+import json
+import threading
+from datetime import datetime
+import psutil
+
+CACHE_FILE = "batch_size_cache.json"
+
+CANDIDATES = [1, 2, 4, 8, 16, 32]
+CALIBRATION_LIMIT = 32          # Samples per probe, from one subtask of the job's first task
+MIN_SPEEDUP = 1.05              # Stop probing once doubling gains less than this
+RAM_HEADROOM = 2 * (1024 ** 3)  # A probe leaving less free RAM than this is not safe
+
+# Output that means the run died of memory exhaustion, not a bug
+OOM_PATTERN = re.compile(r"out of memory|OutOfMemoryError|MemoryError|Cannot allocate memory|std::bad_alloc", re.IGNORECASE)
+OOM_EXIT_CODES = (-9, 137)  # SIGKILL, which the Linux OOM killer sends
+
+_lock = threading.Lock()
+
+def is_auto(batch_size):
+    return str(batch_size).lower() == "auto"
+
+def is_oom(text):
+    return bool(OOM_PATTERN.search(text or ""))
+
+def get_cache_key(repo_id, gguf_file, device):
+    """
+    Choices only transfer between runs of the same file on the same device and RAM size.
+    The repo is part of the key: generic names (ggml-model-q4_0.gguf) are shared by many models.
+    """
+    ram_gb = round(psutil.virtual_memory().total / (1024 ** 3))
+    return f"{repo_id}/{gguf_file}|{device or 'auto'}|{ram_gb}GB"
+
+def _load_cache():
+    if not os.path.exists(CACHE_FILE): return {}
+    try:
+        with open(CACHE_FILE, 'r') as f: return json.load(f)
+    except: return {}
+
+def get_cached(repo_id, gguf_file, device, reason=None):
+    """Cached batch size for this file/device (optionally only one recorded for `reason`)."""
+    with _lock: entry = _load_cache().get(get_cache_key(repo_id, gguf_file, device))
+    if not entry or (reason and entry.get("reason") != reason): return None
+    return entry["batch_size"]
+
+def record(repo_id, gguf_file, device, batch_size, reason, probes=None):
+    """Stores the batch size to use for this file/device (calibrated or backed off after an OOM)."""
+    with _lock:
+        cache = _load_cache()
+        cache[get_cache_key(repo_id, gguf_file, device)] = {
+            "batch_size": int(batch_size), "reason": reason, "probes": probes or [],
+            "updated": datetime.now().isoformat(timespec="seconds")
+        }
+        tmp_path = CACHE_FILE + ".tmp"
+        with open(tmp_path, 'w') as f: json.dump(cache, f, indent=2)
+        os.replace(tmp_path, CACHE_FILE)
+
+def choose(probes):
+    """Fastest probe that finished without running out of memory (1 if none did)."""
+    safe = [p for p in probes if not p.get("oom") and not p.get("low_memory") and p.get("seconds")]
+    if not safe: return 1
+    return min(safe, key=lambda p: (p["seconds"], p["batch_size"]))["batch_size"]
+
+def back_off(batch_size):
+    """Batch size for the retry after an OOM, or None if it can't go lower."""
+    batch_size = int(batch_size)
+    return batch_size // 2 if batch_size > 1 else None
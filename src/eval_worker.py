@@ -0,0 +1,305 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import subprocess
+
+from .log_pump import pump_output
+from . import screening
+
+# Control lines the worker prints between ordinary log output
+MARKER = "@@POCKETBENCH@@ "
+
+STARTUP_TIMEOUT = 300        # Importing torch + lm_eval can be slow on a cold disk
+CONTROL_POLL = 5             # How often a waiting job checks that its worker is still alive
+IDLE_TIMEOUT = 10 * 60       # Idle workers (and their resident model) are released after this
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_workers = []   # dicts: proc, key, busy, control, emit, last_used
+_pool_lock = threading.Lock()
+_unavailable = None   # Set to the import error once lm_eval can't be loaded in-process
+_task_manager = None  # Worker side: lm_eval TaskManager, indexed once per process
+
+# --- SERVER SIDE ---
+
+def _route_output(worker):
+    """Splits worker output into log text (to the job's emit) and control messages."""
+    def route(chunk):
+        text = []
+        for line in chunk.splitlines(keepends=True):
+            if line.startswith(MARKER):
+                try: worker["control"].put(json.loads(line[len(MARKER):]))
+                except ValueError: text.append(line)
+            else:
+                text.append(line)
+        emit = worker["emit"]
+        if text and emit: emit("".join(text))
+    return route
+
+def _pump(worker):
+    # Markers are routed before the noise filter: an error text may contain e.g. "Running loglikelihood"
+    try: pump_output(worker["proc"].stdout, _route_output(worker), keep=lambda line: line.startswith(MARKER))
+    except Exception as e: print(f"Eval worker pump error: {e}")
+    worker["control"].put({"event": "exit"})
+
+def _spawn(threads):
+    global _unavailable
+    env = os.environ.copy()
+    env["PYTHONIOENCODING"] = "utf-8"
+    env["HF_HUB_DISABLE_PROGRESS_BARS"] = "1"
+    env["OMP_NUM_THREADS"] = str(threads)
+    env["MKL_NUM_THREADS"] = str(threads)
+
+    proc = subprocess.Popen(
+        [sys.executable, "-u", "-m", "src.eval_worker"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        bufsize=0, env=env, cwd=PROJECT_ROOT
+    )
+    worker = {"proc": proc, "key": None, "busy": True, "control": queue.Queue(), "emit": None, "last_used": time.time()}
+    threading.Thread(target=_pump, args=(worker,), daemon=True).start()
+
+    try: msg = worker["control"].get(timeout=STARTUP_TIMEOUT)
+    except queue.Empty: msg = {"event": "exit"}
+    if msg["event"] != "ready":
+        if msg["event"] == "unavailable": _unavailable = msg.get("error") or "lm_eval not importable"
+        if proc.poll() is None: proc.kill()
+        return None
+
+    with _pool_lock: _workers.append(worker)
+    return worker
+
+def acquire(key, threads):
+    """
+    Returns a busy-marked worker, preferring one that already has `key`
+    (repo_id, filename, model, model_args, device) loaded.
+    None if in-process evaluation is unavailable, so the caller falls back
+    to the CLI.
+    """
+    if _unavailable: return None
+    with _pool_lock:
+        _workers[:] = [w for w in _workers if w["proc"].poll() is None]
+        idle = [w for w in _workers if not w["busy"]]
+        worker = next((w for w in idle if w["key"] == key), idle[0] if idle else None)
+        if worker:
+            worker["busy"] = True
+            return worker
+    return _spawn(threads)
+
+def release(worker):
+    with _pool_lock:
+        worker["busy"] = False
+        worker["emit"] = None
+        worker["last_used"] = time.time()
+
+def run_tasks(worker, request, emit, on_result, on_probe=None):
+    """
+    Sends one job to the worker and blocks until it finishes. `on_result(task, path)`
+    is called as each task completes (`on_probe(probe)` per calibration probe).
+    Returns done, failed (worker still alive) or crashed (worker exited, e.g.
+    killed by Stop).
+    """
+    worker["emit"] = emit
+    try:
+        worker["proc"].stdin.write((json.dumps(request) + "\n").encode("utf-8"))
+        worker["proc"].stdin.flush()
+    except OSError:
+        return "crashed"
+
+    exited = False
+    while True:
+        try: msg = worker["control"].get(timeout=CONTROL_POLL)
+        except queue.Empty:
+            # The pump only sees EOF once every holder of the pipe exits: don't wait on that
+            if worker["proc"].poll() is None: continue
+            if exited: return "crashed"
+            exited = True # One more poll for messages still in the pipe
+            continue
+        event = msg.get("event")
+        if event == "loaded":
+            worker["key"] = tuple(msg["key"])
+        elif event == "task_done":
+            on_result(msg["task"], msg["path"])
+        elif event == "probe":
+            if on_probe: on_probe(msg)
+        elif event == "done":
+            return "done"
+        elif event == "error":
+            return "failed"
+        elif event == "exit":
+            return "crashed"
+
+def shutdown_idle(max_idle=IDLE_TIMEOUT):
+    """Stops workers idle for longer than `max_idle` seconds to give their RAM back."""
+    now = time.time()
+    with _pool_lock:
+        stale = [w for w in _workers if not w["busy"] and now - w["last_used"] >= max_idle]
+        for w in stale: _workers.remove(w)
+    for w in stale:
+        try:
+            w["proc"].stdin.close()
+            w["proc"].wait(timeout=10)
+        except Exception:
+            w["proc"].kill()
+    return len(stale)
+
+def get_status():
+    with _pool_lock:
+        return {
+            "available": not _unavailable,
+            "error": _unavailable,
+            "workers": [{
+                "pid": w["proc"].pid,
+                "model": w["key"][1] if w["key"] else None,
+                "repo_id": w["key"][0] if w["key"] else None,
+                "busy": w["busy"],
+                "idle_seconds": 0 if w["busy"] else int(time.time() - w["last_used"])
+            } for w in _workers if w["proc"].poll() is None]
+        }
+
+# --- WORKER PROCESS ---
+
+def _send(event, **data):
+    # '|' is escaped so a "%|" inside an error message can't look like a tqdm line
+    print(MARKER + json.dumps(dict(data, event=event)).replace("|", "\\u007c"), flush=True)
+
+def _load_model(get_model, request):
+    args = {"batch_size": request.get("batch_size", 1)}
+    device = request.get("device")
+    if device and device != "auto": args["device"] = device
+    return get_model(request.get("model", "hf")).create_from_arg_string(request["model_args"], args)
+
+def _set_batch_size(lm, batch_size):
+    """The batch size is a runtime setting of a loaded HF model: no reload needed to change it."""
+    if not batch_size or not hasattr(lm, "batch_size_per_gpu"): return
+    # "auto" lets lm_eval search for the largest size that fits (CUDA, when calibration found none)
+    lm.batch_size_per_gpu = "auto" if str(batch_size).lower() == "auto" else int(batch_size)
+
+def _free_memory():
+    import gc
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available(): torch.cuda.empty_cache()
+    except Exception: pass
+
+def _calibrate(lm_eval, lm, calibration):
+    """Times a short workload at increasing batch sizes; reports each probe."""
+    import psutil
+    previous = None
+    for batch_size in calibration["candidates"]:
+        _set_batch_size(lm, batch_size)
+        print(f"[CALIBRATE] Batch size {batch_size}...", flush=True)
+        start = time.perf_counter()
+        try:
+            lm_eval.simple_evaluate(model=lm, tasks=[calibration["task"]], limit=calibration["limit"], log_samples=False)
+        except Exception as e:
+            if "out of memory" not in str(e).lower() and not isinstance(e, MemoryError): raise
+            _free_memory()
+            _send("probe", batch_size=batch_size, oom=True)
+            return
+        seconds = time.perf_counter() - start
+        low_memory = psutil.virtual_memory().available < calibration["ram_headroom"]
+        _send("probe", batch_size=batch_size, seconds=round(seconds, 3), low_memory=low_memory)
+        if low_memory: return
+        if previous and previous / seconds < calibration["min_speedup"]: return
+        previous = seconds
+
+def _doc_counts(lm_eval, task):
+    """
+    {subtask: evaluation documents} of a task (groups expanded), for seeded screening samples.
+    None when this lm_eval can't take explicit samples or the task can't be loaded.
+    """
+    global _task_manager
+    import inspect
+    if "samples" not in inspect.signature(lm_eval.simple_evaluate).parameters: return None
+    try:
+        from lm_eval.tasks import TaskManager, get_task_dict
+        if _task_manager is None: _task_manager = TaskManager()
+        counts = {}
+        def walk(tasks):
+            for value in tasks.values():
+                if isinstance(value, dict): walk(value)
+                else: counts[value.config.task] = len(value.eval_docs)
+        walk(get_task_dict([task], _task_manager))
+        return counts or None
+    except Exception as e:
+        print(f"[SCREEN] Can't count the documents of {task} ({e}): screening the first N instead.", flush=True)
+        return None
+
+def _enable_info_logging():
+    """The response cache reports its hit counts at INFO, which the CLI shows by default."""
+    import logging
+    for name in ("lm-eval", "lm_eval"):
+        logger = logging.getLogger(name)
+        logger.setLevel(logging.INFO)
+    if not logging.getLogger().handlers and not logging.getLogger("lm-eval").handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(levelname)s [%(name)s] %(message)s"))
+        logging.getLogger().addHandler(handler)
+
+def main():
+    """Reads one JSON job per stdin line, keeping the last model loaded between jobs."""
+    try:
+        import lm_eval
+        from lm_eval.api.registry import get_model
+    except Exception as e:
+        _send("unavailable", error=str(e))
+        return
+    _enable_info_logging()
+    _send("ready")
+
+    lm, loaded_key = None, None
+    for line in sys.stdin:
+        if not line.strip(): continue
+        request = json.loads(line)
+        key = [request["repo_id"], request["filename"], request.get("model", "hf"), request["model_args"],
+               request.get("device")]
+        try:
+            if request.get("threads"):
+                try:
+                    import torch
+                    torch.set_num_threads(int(request["threads"]))
+                except Exception: pass
+
+            if key != loaded_key:
+                lm, loaded_key = None, None  # Free the previous model before loading the next
+                print(f"[WORKER] Loading {request['filename']}...", flush=True)
+                lm = _load_model(get_model, request)
+                loaded_key = key
+                _send("loaded", key=key)
+            else:
+                print(f"[WORKER] Reusing resident model {request['filename']}.", flush=True)
+
+            if request.get("calibrate"):
+                _calibrate(lm_eval, lm, request["calibrate"])
+                _send("done")
+                continue
+
+            _set_batch_size(lm, request.get("batch_size"))
+            for task in request["tasks"]:
+                print(f"[WORKER] Running {task}...", flush=True)
+                evaluate = lambda limit, samples=None, task=task: lm_eval.simple_evaluate(
+                    model=lm, tasks=[task], limit=limit or None, log_samples=False,
+                    use_cache=request.get("use_cache") or None, **({"samples": samples} if samples else {})
+                )
+                if request.get("screen"):
+                    results = screening.run(evaluate, task, request["screen"], log=lambda text: print(text, flush=True),
+                                            doc_counts=_doc_counts(lm_eval, task))
+                else:
+                    results = evaluate(request.get("limit"))
+                path = os.path.join(request["output_path"], f"results_{task}.json")
+                with open(path, "w") as f: json.dump(results, f, indent=2, default=str)
+                _send("task_done", task=task, path=path)
+            _send("done")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            sys.stderr.flush()
+            _free_memory()
+            _send("error", error=str(e))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import os
+import re
+import json
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+
+# --- GGUF FORMAT ---
+# Header: magic, version, tensor count, metadata count; then the metadata key/values
+# and one info record (name, shape, type, offset) per tensor. The weights follow,
+# so a reader only ever touches the first few MB of a file.
+
+GGUF_MAGIC = b"GGUF"
+# gguf-split shards: model-Q4_K_M-00001-of-00003.gguf. The first holds the metadata,
+# every shard its own tensors
+SPLIT_RE = re.compile(r"-(\d{5})-of-(\d{5})\.gguf$", re.IGNORECASE)
+DEFAULT_ALIGNMENT = 32
+MAX_KEPT_ARRAY = 64     # Longer metadata arrays (tokenizer vocab...) are summarized by length
+
+# Metadata value types: struct format (None for string / array)
+VALUE_FORMATS = {0: "<B", 1: "<b", 2: "<H", 3: "<h", 4: "<I", 5: "<i", 6: "<f", 7: "<?",
+                 8: None, 9: None, 10: "<Q", 11: "<q", 12: "<d"}
+
+# ggml tensor types: (name, elements per block, bytes per block)
+GGML_TYPES = {
+    0: ("F32", 1, 4), 1: ("F16", 1, 2), 2: ("Q4_0", 32, 18), 3: ("Q4_1", 32, 20), 6: ("Q5_0", 32, 22),
+    7: ("Q5_1", 32, 24), 8: ("Q8_0", 32, 34), 9: ("Q8_1", 32, 36), 10: ("Q2_K", 256, 84), 11: ("Q3_K", 256, 110),
+    12: ("Q4_K", 256, 144), 13: ("Q5_K", 256, 176), 14: ("Q6_K", 256, 210), 15: ("Q8_K", 256, 292),
+    16: ("IQ2_XXS", 256, 66), 17: ("IQ2_XS", 256, 74), 18: ("IQ3_XXS", 256, 98), 19: ("IQ1_S", 256, 50),
+    20: ("IQ4_NL", 32, 18), 21: ("IQ3_S", 256, 110), 22: ("IQ2_S", 256, 82), 23: ("IQ4_XS", 256, 136),
+    24: ("I8", 1, 1), 25: ("I16", 1, 2), 26: ("I32", 1, 4), 27: ("I64", 1, 8), 28: ("F64", 1, 8),
+    29: ("IQ1_M", 256, 56), 30: ("BF16", 1, 2), 34: ("TQ1_0", 256, 54), 35: ("TQ2_0", 256, 66),
+    39: ("MXFP4", 32, 17)
+}
+
+# general.file_type: the quantization the file was made with (llama.cpp's llama_ftype)
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1", 10: "Q2_K", 11: "Q3_K_S",
+    12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M", 16: "Q5_K_S", 17: "Q5_K_M", 18: "Q6_K",
+    19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S", 22: "IQ3_XS", 23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL",
+    26: "IQ3_S", 27: "IQ3_M", 28: "IQ2_S", 29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+    36: "TQ1_0", 37: "TQ2_0", 38: "MXFP4_MOE"
+}
+
+class Truncated(Exception):
+    """The buffer ends inside the header (a range read that was too short)."""
+
+def _read(buf, pos, fmt):
+    size = struct.calcsize(fmt)
+    if pos + size > len(buf): raise Truncated()
+    return struct.unpack_from(fmt, buf, pos)[0], pos + size
+
+def _read_str(buf, pos, len_fmt):
+    n, pos = _read(buf, pos, len_fmt)
+    if pos + n > len(buf): raise Truncated()
+    return bytes(buf[pos:pos + n]).decode("utf-8", errors="replace"), pos + n
+
+def _read_value(buf, pos, vtype, len_fmt):
+    if vtype == 8: return _read_str(buf, pos, len_fmt)
+    if vtype == 9:
+        item_type, pos = _read(buf, pos, "<I")
+        count, pos = _read(buf, pos, len_fmt)
+        item_fmt = VALUE_FORMATS.get(item_type)
+        if item_fmt and count > MAX_KEPT_ARRAY:
+            # Fixed-size items: skip the whole array in one step
+            end = pos + count * struct.calcsize(item_fmt)
+            if end > len(buf): raise Truncated()
+            return {"type": item_type, "length": count}, end
+        if item_type == 8 and count > MAX_KEPT_ARRAY:
+            # Long string arrays (the vocab) are skipped by their lengths alone, nothing is decoded
+            len_size = struct.calcsize(len_fmt)
+            for _ in range(count):
+                if pos + len_size > len(buf): raise Truncated()
+                pos += len_size + struct.unpack_from(len_fmt, buf, pos)[0]
+            if pos > len(buf): raise Truncated()
+            return {"type": item_type, "length": count}, pos
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(buf, pos, item_type, len_fmt)
+            if count <= MAX_KEPT_ARRAY: items.append(item)
+        return (items if count <= MAX_KEPT_ARRAY else {"type": item_type, "length": count}), pos
+    fmt = VALUE_FORMATS.get(vtype)
+    if not fmt: raise ValueError(f"Unknown GGUF value type {vtype}")
+    return _read(buf, pos, fmt)
+
+def parse_header(buf):
+    """
+    Parses the header of a GGUF file from a bytes-like buffer (an mmap or a range read).
+    Returns {"version", "metadata", "tensors", "data_offset"}; raises Truncated when
+    `buf` ends before the tensor infos do.
+    """
+    if bytes(buf[:4]) != GGUF_MAGIC: raise ValueError("Not a GGUF file")
+    version, pos = _read(buf, 4, "<I")
+    len_fmt = "<I" if version == 1 else "<Q"  # v1 used 32-bit counts and lengths
+    tensor_count, pos = _read(buf, pos, len_fmt)
+    kv_count, pos = _read(buf, pos, len_fmt)
+
+    metadata = {}
+    for _ in range(kv_count):
+        key, pos = _read_str(buf, pos, len_fmt)
+        vtype, pos = _read(buf, pos, "<I")
+        metadata[key], pos = _read_value(buf, pos, vtype, len_fmt)
+
+    tensors = []
+    for _ in range(tensor_count):
+        name, pos = _read_str(buf, pos, len_fmt)
+        n_dims, pos = _read(buf, pos, "<I")
+        shape = []
+        for _ in range(n_dims):
+            dim, pos = _read(buf, pos, len_fmt)
+            shape.append(dim)
+        ggml_type, pos = _read(buf, pos, "<I")
+        offset, pos = _read(buf, pos, "<Q")
+        tensors.append({"name": name, "shape": shape, "type": ggml_type, "offset": offset})
+
+    alignment = int(metadata.get("general.alignment") or DEFAULT_ALIGNMENT)
+    return {"version": version, "metadata": metadata, "tensors": tensors,
+            "data_offset": (pos + alignment - 1) // alignment * alignment}
+
+def read_header(path):
+    """Header of a local GGUF file. The file is memory-mapped, so only the header pages are read."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        return parse_header(buf)
+
+# --- SUMMARY ---
+
+def _tensor_bytes(tensor):
+    name, block, size = GGML_TYPES.get(tensor["type"], (str(tensor["type"]), 1, 0))
+    elements = 1
+    for dim in tensor["shape"]: elements *= dim
+    return elements, elements // block * size
+
+def _per_layer(value, layers):
+    """Some architectures store per-layer attention sizes as arrays."""
+    if isinstance(value, list): return [int(v or 0) for v in value]
+    return [int(value or 0)] * layers
+
+def summarize(header):
+    """Model facts a run needs, from a parsed header: architecture, size, quantization, KV shape."""
+    meta = header["metadata"]
+    arch = meta.get("general.architecture", "")
+    get = lambda key, default=None: meta.get(f"{arch}.{key}", default)
+
+    types, parameters, weights = {}, 0, 0
+    for tensor in header["tensors"]:
+        elements, size = _tensor_bytes(tensor)
+        name = GGML_TYPES.get(tensor["type"], (f"TYPE_{tensor['type']}",))[0]
+        entry = types.setdefault(name, {"tensors": 0, "parameters": 0, "bytes": 0})
+        entry["tensors"] += 1
+        entry["parameters"] += elements
+        entry["bytes"] += size
+        parameters += elements
+        weights += size
+
+    layers = int(get("block_count") or 0)
+    embedding = int(get("embedding_length") or 0)
+    heads = _per_layer(get("attention.head_count"), layers)
+    kv_heads = _per_layer(get("attention.head_count_kv", get("attention.head_count")), layers)
+    head_dim = embedding // max(heads) if heads and max(heads) else 0
+    key_length = int(get("attention.key_length") or head_dim)
+    value_length = int(get("attention.value_length") or head_dim)
+    vocab = get("vocab_size") or meta.get("tokenizer.ggml.tokens")
+    if isinstance(vocab, dict): vocab = vocab["length"]
+    elif isinstance(vocab, list): vocab = len(vocab)
+
+    file_type = meta.get("general.file_type")
+    # Files without a file_type are named after the type most of their weights use
+    dominant = max(types.items(), key=lambda kv: kv[1]["bytes"])[0] if types else None
+    return {
+        "version": header["version"],
+        "architecture": arch,
+        "name": meta.get("general.name"),
+        "quant": FILE_TYPES.get(file_type) or dominant,
+        "file_type": file_type,
+        "parameters": parameters,
+        "weights_bytes": weights,
+        "context_length": int(get("context_length") or 0),
+        "block_count": layers,
+        "embedding_length": embedding,
+        "feed_forward_length": int(max(_per_layer(get("feed_forward_length"), 1)) or 0),
+        "head_count": max(heads) if heads else 0,
+        "head_count_kv": max(kv_heads) if kv_heads else 0,
+        "key_length": key_length,
+        "value_length": value_length,
+        "vocab_size": int(vocab or 0),
+        "expert_count": int(get("expert_count") or 0),
+        # K and V elements cached per token, summed over layers
+        "kv_elements_per_token": sum(n * (key_length + value_length) for n in kv_heads[:layers]),
+        "tensor_count": len(header["tensors"]),
+        "tensor_types": types
+    }
+
+def split_shards(filename):
+    """Every shard of a split GGUF, in order ([filename] for a single file)."""
+    m = SPLIT_RE.search(filename)
+    if not m or int(m.group(2)) < 2: return [filename]
+    base, count = filename[:m.start()], int(m.group(2))
+    return [f"{base}-{i:05d}-of-{count:05d}{filename[m.end() - 5:]}" for i in range(1, count + 1)]
+
+def merge_shards(summaries):
+    """One summary for a split GGUF: the first shard's model facts, tensors summed over all shards."""
+    merged = dict(summaries[0], tensor_types={})
+    merged["parameters"] = merged["weights_bytes"] = merged["tensor_count"] = 0
+    for summary in summaries:
+        merged["parameters"] += summary["parameters"]
+        merged["weights_bytes"] += summary["weights_bytes"]
+        merged["tensor_count"] += summary["tensor_count"]
+        for name, entry in summary["tensor_types"].items():
+            total = merged["tensor_types"].setdefault(name, {"tensors": 0, "parameters": 0, "bytes": 0})
+            for field in total: total[field] += entry[field]
+    if merged["file_type"] is None and merged["tensor_types"]:
+        merged["quant"] = max(merged["tensor_types"].items(), key=lambda kv: kv[1]["bytes"])[0]
+    merged["shards"] = len(summaries)
+    return merged
+
+# --- MEMORY PREDICTION ---
+
+LLAMA_UBATCH = 512      # Tokens llama.cpp evaluates per compute pass
+DEFAULT_EVAL_TOKENS = 2048
+
+def predict_memory(summary, backend="hf", batch_size=1, n_ctx=None):
+    """
+    Peak RAM (bytes) of an evaluation run, by part (process overhead not included):
+    - llamacpp: the GGUF is mmapped as-is, with an f16 KV cache for n_ctx tokens, the
+      logits of every token (the server runs with logits_all) and a compute buffer
+    - hf: transformers dequantizes every weight to float32 while the GGUF is still
+      mapped; the KV cache, logits and their log-softmax are float32 for batch_size
+      sequences of n_ctx tokens
+    """
+    n_ctx = int(n_ctx or min(summary["context_length"] or DEFAULT_EVAL_TOKENS, DEFAULT_EVAL_TOKENS))
+    batch_size = max(1, int(batch_size or 1))
+    vocab, embedding = summary["vocab_size"], summary["embedding_length"]
+    if backend == "llamacpp":
+        weights = summary["weights_bytes"]
+        kv_cache = n_ctx * summary["kv_elements_per_token"] * 2
+        activations = n_ctx * vocab * 4 + LLAMA_UBATCH * (vocab + 4 * embedding) * 4
+        batch_size = 1  # One context: lm_eval's requests share it
+    else:
+        tokens = batch_size * n_ctx
+        weights = summary["parameters"] * 4
+        kv_cache = tokens * summary["kv_elements_per_token"] * 4
+        activations = tokens * vocab * 4 * 2 + tokens * max(summary["feed_forward_length"], 4 * embedding) * 4 * 2
+        # Loading holds the mapped GGUF next to the float32 copy; evaluation the caches instead
+        return {"total": weights + max(kv_cache + activations, summary["weights_bytes"]), "weights": weights,
+                "kv_cache": kv_cache, "activations": activations, "batch_size": batch_size, "n_ctx": n_ctx}
+    return {"total": weights + kv_cache + activations, "weights": weights, "kv_cache": kv_cache,
+            "activations": activations, "batch_size": batch_size, "n_ctx": n_ctx}
+
+def format_prediction(prediction):
+    gb = lambda n: f"{n / (1024 ** 3):.1f}"
+    return (f"~{gb(prediction['total'])} GB peak (weights {gb(prediction['weights'])}, KV cache "
+            f"{gb(prediction['kv_cache'])}, activations {gb(prediction['activations'])}, overhead "
+            f"{gb(prediction.get('overhead', 0))} GB) at batch {prediction['batch_size']} x {prediction['n_ctx']} tokens")
+
+# --- CACHE ---
+# Summaries keyed by file (or Hub URL) and validated against its size + mtime (or sha256)
+
+CACHE_FILE = "gguf_header_cache.json"
+CACHE_MAX_ENTRIES = 2000
+SAVE_DELAY = 2  # Seconds: a cold scan parses hundreds of headers, written out once
+
+_cache = None
+_cache_lock = threading.Lock()
+_save_timer = None
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = OrderedDict()
+        try:
+            with open(CACHE_FILE, 'r') as f:
+                for key, entry in json.load(f): _cache[key] = entry
+        except: pass
+    return _cache
+
+def flush():
+    """Writes pending cache entries now (callers that just parsed a batch of headers)."""
+    global _save_timer
+    with _cache_lock:
+        if _save_timer is None: return
+        _save_timer.cancel()
+        _save_timer = None
+        try:
+            tmp_path = f"{CACHE_FILE}.tmp"
+            with open(tmp_path, 'w') as f: json.dump(list(_cache.items()), f)
+            os.replace(tmp_path, CACHE_FILE)
+        except Exception as e: print(f"GGUF header cache write error: {e}")
+
+def _cached(key, signature, parse):
+    global _save_timer
+    with _cache_lock:
+        entry = _load_cache().get(key)
+        if entry and entry["signature"] == signature:
+            _cache.move_to_end(key)
+            return entry["summary"]
+    summary = parse()
+    with _cache_lock:
+        _cache[key] = {"signature": signature, "summary": summary}
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_MAX_ENTRIES: _cache.popitem(last=False)
+        if _save_timer is None:
+            _save_timer = threading.Timer(SAVE_DELAY, flush)
+            _save_timer.daemon = True
+            _save_timer.start()
+    return summary
+
+def read_summary(path):
+    """Summary of a local GGUF, cached by (path, size, mtime)."""
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+    return _cached(path, [stat.st_size, stat.st_mtime_ns], lambda: summarize(read_header(path)))
+
+def read_remote_summary(key, signature, read_range, start_bytes=4 * 1024 * 1024, max_bytes=256 * 1024 * 1024):
+    """
+    Summary of a remote GGUF, cached by `key` + `signature`. `read_range(n)` returns
+    its first n bytes; the window doubles until it covers the header. Without a signature
+    (no size or sha256 listed) it is parsed every time: nothing could tell a cached entry is stale.
+    """
+    def parse():
+        n = start_bytes
+        while True:
+            buf = read_range(n)
+            try: return summarize(parse_header(buf))
+            except Truncated:
+                if len(buf) < n or n >= max_bytes: raise ValueError("GGUF header larger than the read limit")
+                n *= 2
+    if not any(signature): return parse()
+    return _cached(key, signature, parse)
@@ -1,143 +1,495 @@
-from gradio_client import Client, handle_file
-from huggingface_hub import HfApi, scan_cache_dir, constants
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from . import gguf_reader
 import os
+import re
+import json
+import atexit
+import time
 import shutil
 import pathlib
+import threading
+
+# huggingface_hub's Hub client, gradio_client and requests take most of the server's
+# import time: they are imported on first use (Hub search, downloads, uploads)
+_api = None
+
+def get_api():
+    global _api
+    if _api is None:
+        from huggingface_hub import HfApi
+        _api = HfApi()
+    return _api
+
+def hub_cache_root():
+    """The HF cache folder (huggingface_hub.constants, read on first use like the rest of the Hub code)."""
+    from huggingface_hub import constants
+    return str(constants.HF_HUB_CACHE)
+
+def cached_path(repo_id, filename, revision=None):
+    """Path of a file in the local HF cache, or None (try_to_load_from_cache without its sentinel)."""
+    from huggingface_hub import try_to_load_from_cache
+    path = try_to_load_from_cache(repo_id, filename, revision=revision)
+    return path if isinstance(path, str) and os.path.exists(path) else None
 
-api = HfApi()
 # Update these IDs if your spaces have different names
-SUBMISSION_API_ID = "siddharthbhadu/benchmark-submission-api" 
+SUBMISSION_API_ID = os.environ.get("POCKETBENCH_SUBMISSION_API", "siddharthbhadu/benchmark-submission-api")
 LEADERBOARD_DATASET = "siddharthbhadu/quant-benchmark-results"
 
+# --- METADATA CACHE ---
+# Hub responses are kept in a bounded LRU, persisted to disk. Fresh entries
+# (< TTL) are served directly; stale ones (< STALE_TTL) are served while a
+# background refresh runs. Offline mode never touches the network.
+
+METADATA_CACHE_FILE = "hf_metadata_cache.json"
+METADATA_TTL = 15 * 60
+METADATA_STALE_TTL = 7 * 24 * 3600
+METADATA_MAX_ENTRIES = 500
+METADATA_SAVE_DELAY = 2  # Seconds: stores are written out together, not one file rewrite each
+
+_meta_cache = None     # OrderedDict: key -> {"time", "value"}
+_meta_lock = threading.Lock()
+_meta_save_timer = None
+_meta_refreshing = set()
+_offline = os.environ.get("POCKETBENCH_OFFLINE") == "1" or os.environ.get("HF_HUB_OFFLINE") == "1"
+
+def set_offline_mode(enabled):
+    global _offline
+    _offline = bool(enabled)
+    return _offline
+
+def is_offline():
+    return _offline
+
+def _load_meta_cache():
+    global _meta_cache
+    if _meta_cache is None:
+        _meta_cache = OrderedDict()
+        try:
+            with open(METADATA_CACHE_FILE, 'r') as f:
+                for key, entry in json.load(f): _meta_cache[key] = entry
+        except: pass
+    return _meta_cache
+
+def flush_meta_cache():
+    """Writes pending metadata now (also runs at exit)."""
+    global _meta_save_timer
+    with _meta_lock:
+        if _meta_save_timer is None: return
+        _meta_save_timer.cancel()
+        _meta_save_timer = None
+        try:
+            tmp_path = f"{METADATA_CACHE_FILE}.tmp"
+            with open(tmp_path, 'w') as f: json.dump(list(_meta_cache.items()), f)
+            os.replace(tmp_path, METADATA_CACHE_FILE)
+        except Exception as e: print(f"Metadata cache write error: {e}")
+
+atexit.register(flush_meta_cache)
+
+def _store_meta(key, value):
+    global _meta_save_timer
+    with _meta_lock:
+        cache = _load_meta_cache()
+        cache[key] = {"time": time.time(), "value": value}
+        cache.move_to_end(key)
+        while len(cache) > METADATA_MAX_ENTRIES: cache.popitem(last=False)
+        if _meta_save_timer is None:
+            _meta_save_timer = threading.Timer(METADATA_SAVE_DELAY, flush_meta_cache)
+            _meta_save_timer.daemon = True
+            _meta_save_timer.start()
+
+def _refresh_meta(key, fetch):
+    try: _store_meta(key, fetch())
+    except Exception as e: print(f"Metadata refresh error ({key}): {e}")
+    finally:
+        with _meta_lock: _meta_refreshing.discard(key)
+
+def _cached_call(key, fetch):
+    """Returns fetch() through the cache. `fetch` raises on failure (errors are never cached)."""
+    with _meta_lock:
+        entry = _load_meta_cache().get(key)
+        if entry: _meta_cache.move_to_end(key)
+    age = time.time() - entry["time"] if entry else None
+
+    if _offline: return entry["value"] if entry else None
+    if entry and age < METADATA_TTL: return entry["value"]
+
+    if entry and age < METADATA_STALE_TTL:
+        # Stale-while-revalidate: answer now, refresh once in the background
+        with _meta_lock:
+            start = key not in _meta_refreshing
+            _meta_refreshing.add(key)
+        if start: threading.Thread(target=_refresh_meta, args=(key, fetch), daemon=True).start()
+        return entry["value"]
+
+    try:
+        value = fetch()
+    except Exception:
+        if entry: return entry["value"] # Hub unreachable: last known metadata beats nothing
+        raise
+    _store_meta(key, value)
+    return value
+
 # --- SEARCH & METADATA ---
 
+def _fetch_search(query):
+    search_query = query + " gguf"
+    models = get_api().list_models(search=search_query, limit=15, sort="downloads", direction=-1, full=True)
+    results = []
+    for m in models:
+        results.append({
+            "id": m.modelId,
+            "author": m.author if m.author else m.modelId.split('/')[0],
+            "name": m.modelId.split('/')[-1],
+            "likes": m.likes,
+            "downloads": m.downloads,
+            "updated": str(m.lastModified)[:10]
+        })
+    return results
+
 def search_hf_models_rich(query):
     """Returns detailed JSON for the UI cards during search."""
     if not query: return []
-    search_query = query + " gguf"
     try:
-        models = api.list_models(search=search_query, limit=15, sort="downloads", direction=-1, full=True)
-        results = []
-        for m in models:
-            results.append({
-                "id": m.modelId,
-                "author": m.author if m.author else m.modelId.split('/')[0],
-                "name": m.modelId.split('/')[-1],
-                "likes": m.likes,
-                "downloads": m.downloads,
-                "updated": str(m.lastModified)[:10]
-            })
-        return results
+        return _cached_call(f"search:{query.strip().lower()}", lambda: _fetch_search(query)) or []
     except Exception as e:
         print(f"Search Error: {e}")
         return []
 
+def _fetch_repo_files(repo_id):
+    info = get_api().model_info(repo_id=repo_id, files_metadata=True)
+    gguf_files = [f for f in info.siblings if f.rfilename.endswith(".gguf")]
+
+    results = []
+    for f in gguf_files:
+        size_gb = f.size / (1024 ** 3)
+        results.append({
+            "name": f.rfilename,
+            "size_str": f"{size_gb:.2f} GB",
+            "size_bytes": f.size,
+            "sha256": getattr(f.lfs, "sha256", None) if f.lfs else None,
+            "tags": get_tags(f.rfilename)
+        })
+    return sorted(results, key=lambda x: x['name'])
+
 def list_repo_files_rich(repo_id):
     """Returns GGUF files within a specific repo."""
     if not repo_id: return []
-    try:
-        info = api.model_info(repo_id=repo_id, files_metadata=True)
-        gguf_files = [f for f in info.siblings if f.rfilename.endswith(".gguf")]
-        
-        results = []
-        for f in gguf_files:
-            size_gb = f.size / (1024 ** 3)
-            results.append({
-                "name": f.rfilename,
-                "size_str": f"{size_gb:.2f} GB",
-                "size_bytes": f.size,
-                "tags": _get_tags(f.rfilename)
-            })
-        return sorted(results, key=lambda x: x['name'])
+    try: return _cached_call(f"files:{repo_id}", lambda: _fetch_repo_files(repo_id)) or []
     except: return []
 
-def _get_tags(filename):
-    """Extracts quantization tags (e.g. Q4_K_M) from filename."""
-    parts = filename.lower().split('-')
-    for p in parts:
-        if p.startswith('q') or 'iq' in p:
-            return p.upper().replace('.GGUF', '')
-    return "GGUF"
+def get_file_size(repo_id, filename):
+    """Size in bytes of a GGUF file, from the local cache if present, else the Hub."""
+    try:
+        cached = cached_path(repo_id, filename)
+        if cached: return os.path.getsize(cached)
+    except: pass
+    for f in list_repo_files_rich(repo_id):
+        if f["name"] == filename: return f["size_bytes"]
+    return 0
+
+# Quantization names as they appear in GGUF filenames (model.Q4_K_M.gguf, model-iq3_xxs.gguf, ...)
+QUANT_RE = re.compile(
+    r"(?:^|[._\-])((?:I?Q[1-8](?:_[0-9A-Z]+)*)|BF16|F16|FP16|F32|TQ[12]_0|MXFP4(?:_MOE)?)(?=[._\-]|$)",
+    re.IGNORECASE
+)
+
+def get_tags(filename):
+    """Extracts the quantization tag (e.g. Q4_K_M) from a filename; the last match wins."""
+    name = os.path.basename(filename)
+    if name.lower().endswith(".gguf"): name = name[:-5]
+    # Split files: model-Q4_K_M-00001-of-00002.gguf
+    name = re.sub(r"-\d{5}-of-\d{5}$", "", name)
+    matches = QUANT_RE.findall(name)
+    if not matches: return "GGUF"
+    tag = matches[-1].upper()
+    return "F16" if tag == "FP16" else tag
+
+def _local_quant(blob_path):
+    """Exact quantization from the GGUF header of a downloaded file (None if unreadable)."""
+    try: return gguf_reader.read_summary(blob_path)["quant"]
+    except Exception: return None
+
+HEADER_RETRY_AFTER = 10 * 60
+_header_failures = {}  # hf:// key -> time of the last failed range read
+
+def get_gguf_summary(repo_id, filename, size_bytes=None):
+    """
+    GGUF header summary (architecture, parameters, quant types, KV shape): memory-mapped
+    from the HF cache when the file is downloaded, else range-read from the Hub. A split
+    GGUF is summed over all its shards. Returns None when neither is possible (e.g.
+    offline and not downloaded).
+    """
+    shards = gguf_reader.split_shards(filename)
+    if len(shards) == 1: return _shard_summary(repo_id, filename, size_bytes)
+    summaries = [_shard_summary(repo_id, shard, size_bytes if shard == filename else None) for shard in shards]
+    return gguf_reader.merge_shards(summaries) if all(summaries) else None
+
+def _shard_summary(repo_id, filename, size_bytes=None):
+    try:
+        cached = cached_path(repo_id, filename)
+        if cached: return gguf_reader.read_summary(cached)
+    except Exception as e:
+        print(f"GGUF header read error ({filename}): {e}")
+    key = f"hf://{repo_id}/{filename}"
+    if _offline or time.time() - _header_failures.get(key, 0) < HEADER_RETRY_AFTER: return None
+
+    import requests
+    from huggingface_hub import hf_hub_url
+    from huggingface_hub.utils import build_hf_headers
+    # A re-upload can keep the size: the LFS sha256 (when the Hub lists it) keys the cached header too
+    listed = next((f for f in list_repo_files_rich(repo_id) if f["name"] == filename), {})
+    size = size_bytes or listed.get("size_bytes") or 0
+    url = hf_hub_url(repo_id, filename)
+    def read_range(n):
+        r = requests.get(url, headers={**build_hf_headers(), "Range": f"bytes=0-{n - 1}"}, timeout=60)
+        r.raise_for_status()
+        return r.content
+    try: return gguf_reader.read_remote_summary(key, [size, listed.get("sha256")], read_range)
+    except Exception as e:
+        # Callers poll (job admission): don't hit the Hub again for a while
+        _header_failures[key] = time.time()
+        print(f"GGUF header fetch error ({filename}): {e}")
+        return None
 
 # --- LOCAL STORAGE MANAGEMENT ---
+# The HF cache is indexed per `models--*` folder. A folder is only re-read when
+# its directory mtimes change (or, in watch mode, when a file event marks it dirty).
+
+INVENTORY_FILE = "model_inventory.json"
+INVENTORY_VERSION = 1
+SCAN_WORKERS = 8
+
+_inventory = None
+_inventory_lock = threading.Lock()
+_dirty_repos = set()   # Filled by the optional watcher
+_watcher = None
+
+def _load_inventory():
+    global _inventory
+    if _inventory is None:
+        try:
+            with open(INVENTORY_FILE, 'r') as f: _inventory = json.load(f)
+            if _inventory.get("version") != INVENTORY_VERSION or _inventory.get("cache_root") != hub_cache_root():
+                _inventory = None
+        except: _inventory = None
+        if _inventory is None:
+            _inventory = {"version": INVENTORY_VERSION, "cache_root": hub_cache_root(), "repos": {}}
+    return _inventory
+
+def _save_inventory():
+    tmp_path = f"{INVENTORY_FILE}.tmp"
+    with open(tmp_path, 'w') as f: json.dump(_inventory, f)
+    os.replace(tmp_path, INVENTORY_FILE)
+
+def _mtime(path):
+    try: return os.stat(path).st_mtime
+    except OSError: return None
+
+def _repo_signature(cache_root, folder):
+    """Directory mtimes that change whenever files are added to / removed from a repo."""
+    repo_dir = os.path.join(cache_root, folder)
+    sig = [_mtime(repo_dir), _mtime(os.path.join(repo_dir, "blobs")), _mtime(os.path.join(cache_root, ".locks", folder))]
+    snapshots = os.path.join(repo_dir, "snapshots")
+    sig.append(_mtime(snapshots))
+    try:
+        for rev in sorted(os.scandir(snapshots), key=lambda e: e.name):
+            sig.append([rev.name, _mtime(rev.path)] + sorted(
+                [e.name, _mtime(e.path)] for e in os.scandir(rev.path) if e.is_dir(follow_symlinks=False)
+            ))
+    except OSError: pass
+    return sig
+
+def _incomplete_item(full_path):
+    size_gb = os.path.getsize(full_path) / (1024 ** 3)
+    return {
+        "type": "incomplete",
+        "repo_id": "Incomplete Download",
+        "filename": os.path.basename(full_path),
+        "path": full_path, # Absolute path for deletion
+        "size_str": f"{size_gb:.2f} GB",
+        "tags": "CORRUPTED",
+        "sort_key": 3
+    }
+
+def _scan_repo(cache_root, folder):
+    """Reads one models--* folder: valid GGUF snapshots, ghost folder, partial files."""
+    repo_dir = os.path.join(cache_root, folder)
+    repo_id = folder.replace("models--", "", 1).replace("--", "/")
+    items = []
+
+    # A. Incomplete Files (.incomplete or .lock), including the shared .locks tree
+    for root_dir in (repo_dir, os.path.join(cache_root, ".locks", folder)):
+        for root, dirs, files in os.walk(root_dir):
+            for file in files:
+                if file.endswith(".incomplete") or file.endswith(".lock"):
+                    try: items.append(_incomplete_item(os.path.join(root, file)))
+                    except OSError: pass
+
+    # B. Valid snapshots: snapshots/<rev>/<file> symlinks into blobs/
+    snapshots = os.path.join(repo_dir, "snapshots")
+    valid = os.path.isdir(snapshots)
+    if valid:
+        for rev in os.scandir(snapshots):
+            if not rev.is_dir(): continue
+            for root, dirs, files in os.walk(rev.path):
+                for file in files:
+                    if not file.endswith(".gguf"): continue
+                    file_path = os.path.join(root, file)
+                    blob_path = os.path.realpath(file_path)
+                    try: size = os.path.getsize(blob_path)
+                    except OSError: continue # Dangling link: blob missing
+                    items.append({
+                        "type": "valid",
+                        "repo_id": repo_id,
+                        "revision": rev.name,
+                        "filename": os.path.relpath(file_path, rev.path).replace(os.sep, "/"),
+                        "size_str": f"{size / (1024 ** 3):.2f} GB",
+                        "size_bytes": size,
+                        "tags": _local_quant(blob_path) or get_tags(file),
+                        "sort_key": 1,
+                        "_file_path": file_path,
+                        "_blob_path": blob_path
+                    })
+
+    # C. Ghost Repos: folders without a usable snapshot tree
+    if not valid:
+        size_gb = _get_dir_size(repo_dir) / (1024 ** 3)
+        items.append({
+            "type": "ghost",
+            "repo_id": repo_id,
+            "filename": "Corrupted / Orphaned Folder",
+            "path": repo_dir,
+            "size_str": f"{size_gb:.2f} GB",
+            "tags": "JUNK",
+            "sort_key": 2
+        })
+    return items
+
+def refresh_inventory(force=False):
+    """Rescans only models--* folders whose signature changed. Returns the inventory."""
+    cache_root = hub_cache_root()
+    with _inventory_lock:
+        inv = _load_inventory()
+        repos = inv["repos"]
+        try: folders = [e.name for e in os.scandir(cache_root) if e.is_dir() and e.name.startswith("models--")]
+        except OSError: folders = []
+
+        watching = _watcher is not None
+        dirty = set(_dirty_repos)
+        _dirty_repos.clear()
+
+        changed = {}
+        for folder in folders:
+            if watching and not force and folder in repos and folder not in dirty: continue
+            sig = _repo_signature(cache_root, folder)
+            if force or folder in dirty or folder not in repos or repos[folder]["signature"] != sig:
+                changed[folder] = sig
+
+        # Rescan changed repos in parallel (sizes are dominated by stat latency)
+        if changed:
+            with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+                scanned = dict(zip(changed, pool.map(lambda f: _scan_repo(cache_root, f), changed)))
+            for folder, sig in changed.items():
+                repos[folder] = {"signature": sig, "items": scanned[folder]}
+            gguf_reader.flush() # Headers parsed by the scan
+
+        removed = set(repos) - set(folders)
+        for folder in removed: del repos[folder]
+
+        if changed or removed: _save_inventory()
+        return inv
 
 def get_local_models():
     """
     Returns a mixed list of:
     1. Valid HF Snapshots (Green)
-    2. 'Ghost' Folders (Orange) - Folders not recognized by scan_cache_dir
+    2. 'Ghost' Folders (Orange) - Folders without a snapshot tree
     3. Incomplete Blobs (Red) - Partial downloads
     """
     items = []
-    
-    # 1. Get Official Valid Models
-    valid_repo_ids = set()
     try:
-        report = scan_cache_dir()
-        for repo in report.repos:
-            valid_repo_ids.add(repo.repo_id)
-            for revision in repo.revisions:
-                gguf_files = [f for f in revision.files if f.file_name.endswith('.gguf')]
-                for f in gguf_files:
-                    # Note: .size_on_disk prevents crashes on some systems
-                    size_gb = f.size_on_disk / (1024 ** 3)
-                    items.append({
-                        "type": "valid",
-                        "repo_id": repo.repo_id,
-                        "revision": revision.commit_hash,
-                        "filename": f.file_name,
-                        "size_str": f"{size_gb:.2f} GB",
-                        "tags": _get_tags(f.file_name),
-                        "sort_key": 1
-                    })
+        inv = refresh_inventory()
+        for entry in inv["repos"].values():
+            for item in entry["items"]:
+                item = {k: v for k, v in item.items() if not k.startswith("_")}
+                if item["type"] == "incomplete":
+                    # Partial downloads keep growing without touching dir mtimes
+                    try: item = _incomplete_item(item["path"])
+                    except OSError: continue
+                items.append(item)
     except Exception as e:
         print(f"Cache scan error: {e}")
 
-    # 2. Scan for 'Ghost' Folders & Incomplete Files
-    cache_root = constants.HF_HUB_CACHE
-    if os.path.exists(cache_root):
-        for root, dirs, files in os.walk(cache_root):
-            
-            # A. Check for Incomplete Files (.incomplete or .lock)
-            for file in files:
-                if file.endswith(".incomplete") or file.endswith(".lock"):
-                    full_path = os.path.join(root, file)
-                    try:
-                        size = os.path.getsize(full_path)
-                        size_gb = size / (1024 ** 3)
-                        items.append({
-                            "type": "incomplete",
-                            "repo_id": "Incomplete Download",
-                            "filename": file,
-                            "path": full_path, # Absolute path for deletion
-                            "size_str": f"{size_gb:.2f} GB",
-                            "tags": "CORRUPTED",
-                            "sort_key": 3
-                        })
-                    except: pass
-
-            # B. Check for Ghost Repos (folders in root not in valid_repo_ids)
-            if root == str(cache_root):
-                for d in dirs:
-                    if d.startswith("models--"):
-                        repo_id_from_folder = d.replace("models--", "").replace("--", "/")
-                        if repo_id_from_folder not in valid_repo_ids:
-                            full_path = os.path.join(root, d)
-                            size = _get_dir_size(full_path)
-                            size_gb = size / (1024 ** 3)
-                            items.append({
-                                "type": "ghost",
-                                "repo_id": repo_id_from_folder,
-                                "filename": "Corrupted / Orphaned Folder",
-                                "path": full_path,
-                                "size_str": f"{size_gb:.2f} GB",
-                                "tags": "JUNK",
-                                "sort_key": 2
-                            })
-
     # Sort: Valid first, then Ghosts, then Incomplete
     return sorted(items, key=lambda x: (x['sort_key'], x['repo_id']))
 
+def _refresh_repo(folder):
+    """Re-checks one models--* folder (rescanned only if its signature changed). Returns its entry, or None if gone."""
+    cache_root = hub_cache_root()
+    with _inventory_lock:
+        repos = _load_inventory()["repos"]
+        _dirty_repos.discard(folder)
+        if not os.path.isdir(os.path.join(cache_root, folder)):
+            if repos.pop(folder, None) is not None: _save_inventory()
+            return None
+        sig = _repo_signature(cache_root, folder)
+        entry = repos.get(folder)
+        if entry is None or entry["signature"] != sig:
+            entry = repos[folder] = {"signature": sig, "items": _scan_repo(cache_root, folder)}
+            gguf_reader.flush()
+            _save_inventory()
+        return entry
+
+def _find_local_file(repo_id, revision, filename):
+    """Looks a valid file up in its repo's inventory entry (only that folder is re-checked)."""
+    entry = _refresh_repo("models--" + repo_id.replace("/", "--"))
+    if not entry: return None
+    for item in entry["items"]:
+        if item["type"] == "valid" and item["revision"] == revision and item["filename"] == filename:
+            return item
+    return None
+
+def _repo_folder(path):
+    """The models--* folder that contains `path` (also under .locks), or None."""
+    rel = os.path.relpath(path, hub_cache_root()).split(os.sep)
+    if rel and rel[0] == ".locks" and len(rel) > 1: rel = rel[1:]
+    return rel[0] if rel and rel[0].startswith("models--") else None
+
+def _mark_dirty(path):
+    """Flags the models--* folder that contains `path` for rescanning."""
+    folder = _repo_folder(path)
+    if folder: _dirty_repos.add(folder)
+
+def start_cache_watch():
+    """
+    Optional watch mode (needs the `watchdog` package): file events mark repos
+    dirty so listings skip the per-repo mtime checks entirely.
+    """
+    global _watcher
+    if _watcher is not None: return True
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        print("Cache watch unavailable: pip install watchdog")
+        return False
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            _mark_dirty(event.src_path)
+            if getattr(event, "dest_path", None): _mark_dirty(event.dest_path)
+
+    cache_root = hub_cache_root()
+    if not os.path.isdir(cache_root): return False
+    refresh_inventory() # Start from a consistent inventory
+    observer = Observer()
+    observer.schedule(_Handler(), cache_root, recursive=True)
+    observer.daemon = True
+    observer.start()
+    _watcher = observer
+    return True
+
 def _get_dir_size(path):
     """Calculates total size of a directory."""
     total = 0
@@ -152,7 +504,7 @@ def _get_dir_size(path):
 
 def delete_local_file(repo_id=None, revision=None, filename=None, path=None):
     """
-    Handles deletion of both Valid Models (via scan_cache_dir) 
+    Handles deletion of both Valid Models (via the inventory)
     and Junk Files (via direct path).
     """
     try:
@@ -162,29 +514,22 @@ def delete_local_file(repo_id=None, revision=None, filename=None, path=None):
                 shutil.rmtree(path)
             else:
                 os.remove(path)
+            folder = _repo_folder(path)
+            if folder: _refresh_repo(folder)
             return True, "Junk file deleted"
 
         # CASE 2: Delete Official Model Blob
         if repo_id and revision and filename:
-            report = scan_cache_dir()
-            target_file = None
-            # Find the specific file object
-            for repo in report.repos:
-                if repo.repo_id == repo_id:
-                    for rev in repo.revisions:
-                        if rev.commit_hash == revision:
-                            for f in rev.files:
-                                if f.file_name == filename:
-                                    target_file = f
-                                    break
-            
+            target_file = _find_local_file(repo_id, revision, filename)
+
             if target_file:
                 # Delete actual data blob
-                if os.path.exists(target_file.blob_path):
-                    os.remove(target_file.blob_path)
+                if os.path.exists(target_file["_blob_path"]):
+                    os.remove(target_file["_blob_path"])
                 # Delete symlink pointer
-                if os.path.exists(target_file.file_path):
-                    os.remove(target_file.file_path)
+                if os.path.lexists(target_file["_file_path"]):
+                    os.remove(target_file["_file_path"])
+                _refresh_repo(_repo_folder(target_file["_file_path"]))
                 return True, f"Deleted {filename}"
 
         return False, "File not found"
@@ -193,12 +538,15 @@ def delete_local_file(repo_id=None, revision=None, filename=None, path=None):
 
 # --- LEADERBOARD SUBMISSION ---
 
-def submit_result_to_leaderboard(json_path):
-    """Pushes the local JSON result to the Cloud Submission API."""
-    if not json_path: return "No file"
-    try:
-        client = Client(SUBMISSION_API_ID)
-        # This calls the 'handle_upload' function on your Gradio Space
-        return client.predict(file_path=handle_file(json_path), api_name="/handle_upload")
-    except Exception as e: 
-        return f"Upload Failed: {e}"
\ No newline at end of file
+def get_submission_client():
+    """Gradio client for the Cloud Submission API (a Space id or a local URL)."""
+    from gradio_client import Client
+    return Client(SUBMISSION_API_ID)
+
+def submit_result_to_leaderboard(json_path, client=None):
+    """Pushes the local JSON result to the Cloud Submission API. Raises on failure."""
+    if not json_path: raise ValueError("No file")
+    from gradio_client import handle_file
+    client = client or get_submission_client()
+    # This calls the 'handle_upload' function on your Gradio Space
+    return client.predict(file_path=handle_file(json_path), api_name="/handle_upload")
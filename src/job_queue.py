@@ -0,0 +1,601 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from . import agents, backend, eval_worker, log_index
+from .hf_utils import get_file_size
+from .log_store import compress_log, reopen_for_append
+from .storage import save_result, get_unique_name
+from .uploader import enqueue_upload
+
+QUEUE_DB = "pocketbench_queue.db"
+
+# Job states that still need work (running jobs are re-run after a restart)
+OPEN_STATES = ("pending", "running")
+MAX_STREAM_EVENTS = 5000
+MAX_FRAME_BYTES = 64 * 1024
+MAX_FINISHED_STREAMS = 20
+
+# Columns added after the first release
+MIGRATED_COLUMNS = (("agent", "TEXT"), ("attempts", "INTEGER DEFAULT 0"))
+
+_db_lock = threading.Lock()
+_wake = threading.Event()
+_worker = None
+
+# Batch handed out to worker agents: {"batch_id", "settings", "stopped"} while it runs
+_dispatching = None
+_dispatch_lock = threading.Lock()
+
+# Live progress per batch: batch_id -> {"events", "base", "done", "cond"}
+_streams = {}
+_streams_lock = threading.Lock()
+
+# --- DATABASE ---
+
+def _connect():
+    conn = sqlite3.connect(QUEUE_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_db():
+    with _db_lock, _connect() as conn:
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                created TEXT,
+                settings TEXT,
+                status TEXT
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                batch_id TEXT,
+                idx INTEGER,
+                payload TEXT,
+                status TEXT,
+                claimed INTEGER DEFAULT 0,
+                updated TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id, idx);
+        """)
+        columns = [r["name"] for r in conn.execute("PRAGMA table_info(jobs)")]
+        for column, decl in MIGRATED_COLUMNS:
+            if column not in columns:
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {decl}")
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def _insert_jobs(conn, batch_id, jobs):
+    start = conn.execute("SELECT COUNT(*) FROM jobs WHERE batch_id = ?", (batch_id,)).fetchone()[0]
+    job_ids = []
+    for i, job in enumerate(jobs, start=start):
+        job_id = f"{batch_id}_{i}"
+        conn.execute(
+            "INSERT INTO jobs (job_id, batch_id, idx, payload, status, updated) VALUES (?, ?, ?, ?, 'pending', ?)",
+            (job_id, batch_id, i, json.dumps(job), _now())
+        )
+        job_ids.append(job_id)
+    return job_ids
+
+def enqueue_batch(jobs, settings, batch_id=None):
+    """
+    Persists jobs and wakes the worker. Passing the id of an unfinished
+    batch appends to it (picked up live if that batch is running).
+    Returns (batch_id, job_ids).
+    """
+    init_db()
+    with _db_lock, _connect() as conn:
+        row = None
+        if batch_id:
+            row = conn.execute("SELECT status FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+        if not (row and row["status"] in OPEN_STATES):
+            batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+            n = 1
+            while conn.execute("SELECT 1 FROM batches WHERE batch_id = ?", (batch_id,)).fetchone():
+                n += 1
+                batch_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{n}"
+            conn.execute(
+                "INSERT INTO batches (batch_id, created, settings, status) VALUES (?, ?, ?, 'pending')",
+                (batch_id, _now(), json.dumps(settings))
+            )
+        job_ids = _insert_jobs(conn, batch_id, jobs)
+
+    _get_stream(batch_id)
+    _publish(batch_id, f"[QUEUE] {len(job_ids)} job(s) queued in batch {batch_id}.\n")
+    ensure_worker()
+    _wake.set()
+    return batch_id, job_ids
+
+def _set_job_status(job_id, status):
+    with _db_lock, _connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE job_id = ?", (status, _now(), job_id))
+
+def _set_batch_status(batch_id, status):
+    with _db_lock, _connect() as conn:
+        conn.execute("UPDATE batches SET status = ? WHERE batch_id = ?", (status, batch_id))
+
+def _next_batch():
+    """Oldest batch that still has unfinished jobs."""
+    with _db_lock, _connect() as conn:
+        return conn.execute(
+            "SELECT * FROM batches WHERE status IN ('pending', 'running') ORDER BY created, batch_id LIMIT 1"
+        ).fetchone()
+
+def _claim_jobs(batch_id):
+    """Marks unclaimed pending jobs of a batch as handed to the runner and returns them."""
+    with _db_lock, _connect() as conn:
+        rows = conn.execute(
+            "SELECT job_id, payload FROM jobs WHERE batch_id = ? AND status = 'pending' AND claimed = 0 ORDER BY idx",
+            (batch_id,)
+        ).fetchall()
+        conn.executemany("UPDATE jobs SET claimed = 1 WHERE job_id = ?", [(r["job_id"],) for r in rows])
+    return [dict(json.loads(r["payload"]), job_id=r["job_id"]) for r in rows]
+
+def list_batches(limit=50):
+    init_db()
+    with _db_lock, _connect() as conn:
+        batches = conn.execute("SELECT * FROM batches ORDER BY created DESC, batch_id DESC LIMIT ?", (limit,)).fetchall()
+        result = []
+        for b in batches:
+            jobs = conn.execute(
+                "SELECT job_id, idx, payload, status, updated FROM jobs WHERE batch_id = ? ORDER BY idx", (b["batch_id"],)
+            ).fetchall()
+            result.append({
+                "batch_id": b["batch_id"],
+                "created": b["created"],
+                "status": b["status"],
+                "settings": json.loads(b["settings"] or "{}"),
+                "log_file": f"BATCH_{b['batch_id']}.log",
+                "jobs": [{
+                    "job_id": j["job_id"],
+                    "filename": json.loads(j["payload"]).get("filename"),
+                    "status": j["status"],
+                    "updated": j["updated"]
+                } for j in jobs]
+            })
+    return result
+
+def find_batch_for_job(job_id):
+    init_db()
+    with _db_lock, _connect() as conn:
+        row = conn.execute("SELECT batch_id FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return row["batch_id"] if row else None
+
+# --- PROGRESS STREAMS ---
+
+def _get_stream(batch_id):
+    with _streams_lock:
+        if batch_id not in _streams:
+            # Forget the oldest finished streams; their logs stay on disk
+            finished = [b for b, st in _streams.items() if st["done"]]
+            for b in finished[:max(0, len(finished) - MAX_FINISHED_STREAMS)]:
+                del _streams[b]
+            _streams[batch_id] = {"events": [], "base": 0, "done": False, "cond": threading.Condition()}
+        return _streams[batch_id]
+
+def get_batch_status(batch_id):
+    init_db()
+    with _db_lock, _connect() as conn:
+        row = conn.execute("SELECT status FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+    return row["status"] if row else None
+
+def _publish(batch_id, log, results=None, path=None, start_info=None, telemetry=None, done=False):
+    stream = _get_stream(batch_id)
+    with stream["cond"]:
+        if log or start_info or telemetry or results is not None:
+            stream["events"].append({"log": log, "results": results, "path": path, "start_info": start_info,
+                                     "telemetry": telemetry})
+        # Bounded replay buffer: late subscribers can re-read the log file
+        overflow = len(stream["events"]) - MAX_STREAM_EVENTS
+        if overflow > 0:
+            del stream["events"][:overflow]
+            stream["base"] += overflow
+        if done: stream["done"] = True
+        stream["cond"].notify_all()
+
+def _merge_events(events):
+    """Coalesces consecutive events into one SSE frame."""
+    frame = {"log": "".join(e["log"] for e in events), "results": None, "path": None, "start_info": None, "telemetry": None}
+    for e in events:
+        for key in ("results", "path", "start_info"):
+            if e[key] is not None: frame[key] = e[key]
+        # Latest resource sample per job
+        if e.get("telemetry"): frame["telemetry"] = {**(frame["telemetry"] or {}), **e["telemetry"]}
+    return frame
+
+def subscribe(batch_id, since=0, timeout=15):
+    """
+    Yields (index, frame) from `since` onward until the batch finishes, where
+    a frame coalesces every event published since the last one (capped at
+    MAX_FRAME_BYTES), so slow clients get fewer, larger frames.
+    Yields (index, None) as a keep-alive when idle. Closing the generator
+    detaches without affecting the running batch.
+    """
+    with _streams_lock: known = batch_id in _streams
+    if not known and get_batch_status(batch_id) not in OPEN_STATES:
+        return # Finished before this server started: nothing live to attach to
+    stream = _get_stream(batch_id)
+    cursor = since
+    while True:
+        with stream["cond"]:
+            skipped = stream["base"] - cursor
+            cursor = max(cursor, stream["base"])
+            if cursor - stream["base"] >= len(stream["events"]) and not stream["done"]:
+                stream["cond"].wait(timeout)
+            pending = stream["events"][cursor - stream["base"]:]
+            done = stream["done"]
+
+        batch, size = [], 0
+        for event in pending:
+            if batch and size + len(event["log"]) > MAX_FRAME_BYTES: break
+            batch.append(event)
+            size += len(event["log"])
+
+        if skipped > 0:
+            # Client fell behind the replay buffer: say so instead of blocking the batch
+            notice = {"log": f"\n[... {skipped} updates skipped, see log file ...]\n", "results": None, "path": None, "start_info": None, "telemetry": None}
+            batch.insert(0, notice)
+        if not batch:
+            if done: return
+            yield cursor, None
+            continue
+        cursor += len(batch) - (1 if skipped > 0 else 0)
+        yield cursor, _merge_events(batch)
+
+# --- WORKER ---
+
+def _run_batch(batch):
+    batch_id = batch["batch_id"]
+    settings = json.loads(batch["settings"] or "{}")
+    if _dispatch_to_agents(batch_id, settings):
+        _run_agent_batch(batch_id, settings)
+        return
+
+    # Resume: jobs left 'running' by a crash/restart start over from scratch
+    with _db_lock, _connect() as conn:
+        conn.execute("UPDATE jobs SET status = 'pending', claimed = 0, agent = NULL WHERE batch_id = ? AND status = 'running'", (batch_id,))
+        conn.execute("UPDATE jobs SET claimed = 0 WHERE batch_id = ? AND status = 'pending'", (batch_id,))
+    _set_batch_status(batch_id, "running")
+
+    jobs = _claim_jobs(batch_id)
+    if not jobs:
+        _set_batch_status(batch_id, "done")
+        _publish(batch_id, "", done=True)
+        return
+
+    for job in jobs: _set_job_status(job["job_id"], "running")
+
+    def fetch_jobs():
+        new_jobs = _claim_jobs(batch_id)
+        for job in new_jobs: _set_job_status(job["job_id"], "running")
+        return new_jobs
+
+    for log_chunk, results, path, start_info, telemetry in backend.run_batch_process(
+        jobs, settings.get("batch", 1), settings.get("device", "auto"), settings.get("verbosity", "INFO"),
+        max_parallel=settings.get("parallel", "auto"), batch_id=batch_id,
+        on_job_done=_set_job_status, fetch_jobs=fetch_jobs, options=settings
+    ):
+        _publish(batch_id, log_chunk, results, path, start_info, telemetry)
+
+    _finish_batch(batch_id)
+
+def _finish_batch(batch_id):
+    """Sets the final batch status once its runner returns."""
+    with _db_lock, _connect() as conn:
+        stopped = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE batch_id = ? AND status = 'stopped'", (batch_id,)
+        ).fetchone()[0]
+        leftover = conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE batch_id = ? AND status = 'pending'", (batch_id,)
+        ).fetchone()[0]
+        if stopped:
+            # Jobs appended after the stop are cancelled with the batch
+            conn.execute("UPDATE jobs SET status = 'stopped' WHERE batch_id = ? AND status = 'pending'", (batch_id,))
+            status = "stopped"
+        else:
+            # Jobs appended just as the batch finished get another pass
+            status = "pending" if leftover else "done"
+        conn.execute("UPDATE batches SET status = ? WHERE batch_id = ?", (status, batch_id))
+    if status != "pending": _publish(batch_id, "", done=True)
+
+# --- WORKER AGENTS ---
+
+def _dispatch_to_agents(batch_id, settings):
+    """Per the batch `dispatch` setting, or when agents still hold its jobs (server restart)."""
+    if str(settings.get("dispatch") or "auto").lower() == "local": return False
+    if agents.use_agents(settings): return True
+    with _db_lock, _connect() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM jobs WHERE batch_id = ? AND status = 'running' AND agent IS NOT NULL LIMIT 1", (batch_id,)
+        ).fetchone()
+    return row is not None
+
+def _job_rows(batch_id):
+    with _db_lock, _connect() as conn:
+        return conn.execute("SELECT * FROM jobs WHERE batch_id = ? ORDER BY idx", (batch_id,)).fetchall()
+
+def _vet_job(row, settings):
+    """Readies a queued job for the agents: fully cached jobs are skipped, and the model
+    size and predicted peak RAM (agents are matched on free RAM) are filled in. Returns a log line."""
+    job = json.loads(row["payload"])
+    tasks = job.get('tasks', ['mmlu'])
+    if not backend.job_missing_tasks(job, tasks, settings):
+        _set_job_status(row["job_id"], "cached")
+        return f"\n[CACHED] JOB {row['idx']+1}: {job['filename']} - all {len(tasks)} tasks already evaluated. Skipping.\n"
+    if not job.get('size_bytes'): job['size_bytes'] = get_file_size(job['repo_id'], job['filename'])
+    job['memory_bytes'], _ = backend.predict_job_memory(job, backend.get_job_backend(job, settings),
+                                                        job.get('batch_size') or settings.get('batch', 1),
+                                                        job.get('n_ctx') or settings.get('n_ctx'))
+    with _db_lock, _connect() as conn:
+        conn.execute("UPDATE jobs SET payload = ?, claimed = 1, updated = ? WHERE job_id = ?",
+                     (json.dumps(job), _now(), row["job_id"]))
+    return ""
+
+def _requeue(row):
+    """Takes a job back from an agent that stopped sending heartbeats. Returns a log line."""
+    job = json.loads(row["payload"])
+    name = (agents.get(row["agent"]) or {}).get("name", row["agent"])
+    if agents.is_stop_requested(row["job_id"]): status = "stopped"
+    elif row["attempts"] >= agents.MAX_JOB_ATTEMPTS: status = "failed"
+    else: status = "pending"
+    with _db_lock, _connect() as conn:
+        updated = conn.execute(
+            "UPDATE jobs SET status = ?, agent = CASE WHEN ? = 'pending' THEN NULL ELSE agent END, updated = ? "
+            "WHERE job_id = ? AND agent = ? AND status = 'running'",
+            (status, status, _now(), row["job_id"], row["agent"])
+        ).rowcount
+    if not updated: return "" # Finished just now
+    agents.clear_stop(row["job_id"])
+    if status == "pending":
+        return f"[RETRY] JOB {row['idx']+1}: {job['filename']} lost with agent {name}. Requeued.\n"
+    if status == "stopped": return f"[STOPPED] JOB {row['idx']+1}: {job['filename']} (agent {name} went offline).\n"
+    return (f"[FAILURE] JOB {row['idx']+1}: {job['filename']} lost its agent {row['attempts']} times "
+            f"(latest: {name}). Giving up.\n")
+
+def _run_agent_batch(batch_id, settings):
+    """
+    Runs a batch on worker agents (agent.py), which claim its jobs themselves (claim_for_agent).
+    This thread vets queued jobs, relays agent output into the batch log and stream,
+    and requeues the jobs of agents that stop sending heartbeats.
+    """
+    global _dispatching
+    with _db_lock, _connect() as conn:
+        # Resume: local jobs start over, agent jobs wait for their agent to re-attach
+        conn.execute("UPDATE jobs SET status = 'pending', claimed = 0 WHERE batch_id = ? AND status = 'running' AND agent IS NULL", (batch_id,))
+        conn.execute("UPDATE jobs SET claimed = 0 WHERE batch_id = ? AND status = 'pending'", (batch_id,))
+    _set_batch_status(batch_id, "running")
+
+    log_filename = f"BATCH_{batch_id}.log"
+    log_path = os.path.join(backend.LOGS_DIR, log_filename)
+    os.makedirs(backend.LOGS_DIR, exist_ok=True)
+    reopen_for_append(log_path)
+    log_file = open(log_path, "a", encoding="utf-8")
+    rows = _job_rows(batch_id)
+    log_index.begin(log_filename, batch_id, [json.loads(r["payload"]) for r in rows])
+
+    def log(text, telemetry=None, start_info=None):
+        if text:
+            log_file.write(text)
+            log_file.flush()
+            log_index.append(log_filename, text)
+        _publish(batch_id, text, start_info=start_info, telemetry=telemetry)
+
+    dispatch = {"batch_id": batch_id, "settings": settings, "stopped": False}
+    with _dispatch_lock: _dispatching = dispatch
+    known = {r["job_id"] for r in rows}
+    online, too_big = {}, set()
+    finished = False
+    try:
+        log(f"--- BATCH STARTED: {len(rows)} Models Scheduled on worker agents ---\n"
+            f"Device: {settings.get('device', 'auto')} | Batch Size: {settings.get('batch', 1)}\n\n",
+            start_info={"log_file": log_filename, "batch_id": batch_id, "job_ids": [r["job_id"] for r in rows]})
+        if not agents.get_alive(): log("[AGENTS] Waiting for worker agents (python agent.py --server <this server>).\n")
+
+        # --- DISPATCH LOOP ---
+        while True:
+            rows = _job_rows(batch_id)
+            if not any(r["status"] in OPEN_STATES for r in rows): break
+
+            # A. Vet queued jobs, including ones appended to the running batch
+            for row in rows:
+                if row["status"] != "pending" or row["claimed"]: continue
+                if row["job_id"] not in known:
+                    known.add(row["job_id"])
+                    job = json.loads(row["payload"])
+                    log_index.add_jobs(log_filename, [job])
+                    log(f"\n[QUEUE] Added {job['filename']} (Job {row['idx']+1}).\n")
+                if dispatch["stopped"]: _set_job_status(row["job_id"], "stopped")
+                else: log(_vet_job(row, settings))
+
+            # B. Agents joining and leaving
+            alive = {a["agent_id"]: a for a in agents.get_alive()}
+            for agent_id in alive.keys() - online.keys():
+                log(f"[AGENTS] {alive[agent_id]['name']} online: {alive[agent_id]['specs'].get('display', '?')}\n")
+            for agent_id in online.keys() - alive.keys():
+                log(f"[AGENTS] {online[agent_id]['name']} offline (no heartbeat for {agents.AGENT_TIMEOUT}s).\n")
+            online = alive
+
+            # C. Reassign the jobs of dead agents
+            for row in rows:
+                if row["status"] == "running" and row["agent"] and not agents.is_alive(row["agent"]):
+                    log(_requeue(row))
+
+            # D. Say so once when a job fits none of the online agents
+            for row in rows:
+                if row["status"] != "pending" or not row["claimed"] or row["job_id"] in too_big or not online: continue
+                job = json.loads(row["payload"])
+                if any(agents.fits(a, job, settings) for a in online.values()): continue
+                too_big.add(row["job_id"])
+                need = agents.job_memory(job, settings)
+                log(f"[AGENTS] JOB {row['idx']+1}: {job['filename']} needs ~{need / (1024 ** 3):.1f} GB RAM; "
+                    f"waiting for an agent with that much free.\n")
+
+            # E. Forward agent output
+            text, samples = agents.drain_events(batch_id)
+            if text or samples: log(text, samples)
+
+        text, samples = agents.drain_events(batch_id, timeout=0)
+        if text or samples: log(text, samples)
+        if dispatch["stopped"]: log("\n[STOPPED] Batch Cancelled.\n")
+        else: log(f"\n{'='*40}\nBATCH COMPLETE\n{'='*40}\n")
+        finished = True
+    finally:
+        with _dispatch_lock: _dispatching = None
+        log_file.close()
+        if finished:
+            try: compress_log(log_path)
+            except Exception as e: print(f"Log compression failed: {e}")
+        log_index.finish(log_filename, "finished" if finished else "interrupted")
+        agents.close_events(batch_id)
+    _finish_batch(batch_id)
+
+def claim_for_agent(agent_id):
+    """
+    Hands an agent the next vetted job that fits its free RAM, marked running on it.
+    Returns (job, settings), or (None, None) when there is nothing for it.
+    """
+    agent = agents.get(agent_id)
+    with _dispatch_lock: dispatch = _dispatching
+    if not agent or not dispatch or dispatch["stopped"]: return None, None
+    batch_id, settings = dispatch["batch_id"], dispatch["settings"]
+    notes = []
+    with _db_lock, _connect() as conn:
+        rows = conn.execute(
+            "SELECT job_id, idx, payload, attempts FROM jobs WHERE batch_id = ? AND status = 'pending' "
+            "AND claimed = 1 AND agent IS NULL ORDER BY idx", (batch_id,)
+        ).fetchall()
+        total = conn.execute("SELECT COUNT(*) FROM jobs WHERE batch_id = ?", (batch_id,)).fetchone()[0]
+        for row in rows:
+            job = json.loads(row["payload"])
+            if not agents.fits(agent, job, settings): continue
+            # Results saved since the job was vetted (same model, other agent) aren't rerun
+            tasks = backend.job_missing_tasks(job, job.get('tasks', ['mmlu']), settings)
+            if not tasks:
+                conn.execute("UPDATE jobs SET status = 'cached', updated = ? WHERE job_id = ?", (_now(), row["job_id"]))
+                notes.append(f"\n[CACHED] JOB {row['idx']+1}: {job['filename']} - all tasks already evaluated. Skipping.\n")
+                continue
+            claimed = conn.execute(
+                "UPDATE jobs SET status = 'running', agent = ?, attempts = attempts + 1, updated = ? "
+                "WHERE job_id = ? AND status = 'pending' AND agent IS NULL", (agent_id, _now(), row["job_id"])
+            ).rowcount
+            if claimed: break
+        else:
+            row = None
+
+    for note in notes: agents.push_event(batch_id, note)
+    if not row: return None, None
+    free_gb = agents.free_ram(agent) / (1024 ** 3)
+    header = f"\n{'='*40}\nJOB {row['idx']+1}/{total}: {job['filename']} -> {agent['name']} ({free_gb:.1f} GB free)\n{'='*40}\n"
+    if row["attempts"]: header += f"[RETRY] Attempt {row['attempts'] + 1}/{agents.MAX_JOB_ATTEMPTS} after losing an agent.\n"
+    agents.push_event(batch_id, header)
+    return dict(job, job_id=row["job_id"], tasks=tasks), settings
+
+def _agent_job(agent_id, job_id):
+    """The job row if it is running on this agent, else None (e.g. reassigned after missed heartbeats)."""
+    init_db()
+    with _db_lock, _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if row and row["status"] == "running" and row["agent"] == agent_id: return row
+    return None
+
+def agent_log(agent_id, job_id, text="", telemetry=None):
+    """Relays an agent's job output into its batch log and stream. False if the job isn't the agent's."""
+    row = _agent_job(agent_id, job_id)
+    if not row: return False
+    index = row["idx"] + 1
+    # Agents run side by side, so every line says which job it belongs to
+    if text: text = "".join(f"[J{index}] " + l if l.strip() else l for l in text.splitlines(True))
+    sample = (telemetry or {}).get(job_id)
+    if sample:
+        name = (agents.get(agent_id) or {}).get("name", agent_id)
+        sample = {job_id: dict(sample, job=index, agent=name)}
+    if text or sample: agents.push_event(row["batch_id"], text, sample)
+    return True
+
+def agent_result(agent_id, job_id, status, records=None):
+    """
+    Ingests a finished agent job: each result record the agent saved is merged through
+    save_result (and queued for upload). Returns the number of records saved,
+    or None if the job isn't the agent's.
+    """
+    row = _agent_job(agent_id, job_id)
+    if not row: return None
+    with _db_lock, _connect() as conn:
+        batch = conn.execute("SELECT settings FROM batches WHERE batch_id = ?", (row["batch_id"],)).fetchone()
+    settings = json.loads(batch["settings"] or "{}") if batch else {}
+    job = json.loads(row["payload"])
+    job_backend = backend.get_job_backend(job, settings)
+    unique_name = get_unique_name(job['repo_id'], job['filename'], job_backend)
+
+    saved = []
+    for record in records or []:
+        data = dict(record.get("data") or {})
+        data.pop("task_index", None) # Rebuilt from `tasks` for this server's store
+        usage = data.pop("telemetry", None)
+        saved.append(save_result(
+            unique_name, data, repo_id=job['repo_id'], gguf_file=job['filename'], tasks=record.get("tasks"),
+            limit=record.get("limit", 0), backend=job_backend, telemetry=usage, screen=bool(record.get("screen"))
+        ))
+
+    # The agent may report success while its records were lost: without results the job failed
+    if status in ("done", "cached"): status = "done" if saved else "failed"
+    with _db_lock, _connect() as conn:
+        conn.execute("UPDATE jobs SET status = ?, updated = ? WHERE job_id = ? AND agent = ? AND status = 'running'",
+                     (status, _now(), job_id, agent_id))
+    agents.clear_stop(job_id)
+
+    name = (agents.get(agent_id) or {}).get("name", agent_id)
+    text = f"[AGENTS] JOB {row['idx']+1}: {job['filename']} {status} on {name} ({len(saved)} result record(s) ingested).\n"
+    if status == "done":
+        for path in dict.fromkeys(saved): depth = enqueue_upload(path)
+        text += f"[UPLOAD] Queued for leaderboard upload (outbox: {depth} pending).\n"
+    agents.push_event(row["batch_id"], text)
+    return len(saved)
+
+def stop_agent_jobs(job_id=None):
+    """
+    Stops one job (by job_id) or every job of the batch running on agents. Queued jobs
+    are cancelled here; running ones via their agent's next heartbeat.
+    """
+    with _dispatch_lock: dispatch = _dispatching
+    if not dispatch: return False
+    with _db_lock, _connect() as conn:
+        if job_id is None:
+            dispatch["stopped"] = True
+            conn.execute("UPDATE jobs SET status = 'stopped', updated = ? WHERE batch_id = ? AND status = 'pending'",
+                         (_now(), dispatch["batch_id"]))
+            running = conn.execute("SELECT job_id FROM jobs WHERE batch_id = ? AND status = 'running'",
+                                   (dispatch["batch_id"],)).fetchall()
+        else:
+            queued = conn.execute("UPDATE jobs SET status = 'stopped', updated = ? WHERE job_id = ? AND batch_id = ? "
+                                  "AND status = 'pending'", (_now(), job_id, dispatch["batch_id"])).rowcount
+            if queued: return True
+            running = conn.execute("SELECT job_id FROM jobs WHERE job_id = ? AND status = 'running' AND agent IS NOT NULL",
+                                   (job_id,)).fetchall()
+    for r in running: agents.request_stop(r["job_id"])
+    return job_id is None or bool(running)
+
+def _worker_loop():
+    while True:
+        batch = _next_batch()
+        if not batch:
+            eval_worker.shutdown_idle() # Give resident models' RAM back once the queue goes quiet
+            _wake.wait(5)
+            _wake.clear()
+            continue
+        try:
+            _run_batch(batch)
+        except Exception as e:
+            print(f"Queue worker error: {e}")
+            _set_batch_status(batch["batch_id"], "failed")
+            _publish(batch["batch_id"], f"\n[CRITICAL] Batch Exception: {e}\n", done=True)
+
+def ensure_worker():
+    """Starts the long-lived queue worker (once). Unfinished batches resume first."""
+    global _worker
+    if _worker and _worker.is_alive(): return
+    init_db()
+    _worker = threading.Thread(target=_worker_loop, name="pocketbench-queue", daemon=True)
+    _worker.start()
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+import urllib.request
+
+from .log_pump import pump_output
+
+# A llama.cpp server binary (llama-server) can be used instead of the llama-cpp-python bindings.
+# It returns no prompt logprobs (echo), so it can only run generation tasks.
+LLAMA_SERVER_BIN = os.environ.get("POCKETBENCH_LLAMA_SERVER")
+GENERATE_ONLY = "generate_until"
+
+DEFAULT_N_CTX = 2048
+STARTUP_TIMEOUT = 180
+
+# Quantized weights are mmapped as-is: RAM is roughly the file plus KV cache / scratch
+MEMORY_FACTOR = 1.2
+MEMORY_OVERHEAD = 1 * (1024 ** 3)
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _server_command(model_path, port, threads, n_ctx):
+    if LLAMA_SERVER_BIN:
+        return [LLAMA_SERVER_BIN, "-m", model_path, "-t", str(threads), "-c", str(n_ctx),
+                "--host", "127.0.0.1", "--port", str(port)]
+    # lm_eval scores prompts with echoed logprobs, which the bindings only keep with logits_all
+    return [sys.executable, "-m", "llama_cpp.server", "--model", model_path,
+            "--n_threads", str(threads), "--n_ctx", str(n_ctx), "--logits_all", "true",
+            "--host", "127.0.0.1", "--port", str(port)]
+
+def unsupported_tasks(tasks):
+    """
+    Tasks the configured server can't score: with llama-server, every task that isn't
+    generate_until only (loglikelihood / multiple choice need echoed prompt logprobs) or
+    whose output type can't be resolved. Empty for the llama-cpp-python server.
+    """
+    if not LLAMA_SERVER_BIN: return []
+    from .storage import get_task_output_types
+    return [t for t in tasks if get_task_output_types(t) != {GENERATE_ONLY}]
+
+def _is_ready(base_url):
+    try:
+        with urllib.request.urlopen(f"{base_url}/v1/models", timeout=2) as r: return r.status == 200
+    except Exception:
+        return False
+
+def start_server(repo_id, filename, threads, n_ctx, emit, should_stop=None):
+    """
+    Serves the GGUF from the HF cache with llama.cpp and waits until it answers.
+    Returns {"proc", "base_url"} or None (the reason is sent to `emit`).
+    """
+    emit(f"[LLAMA.CPP] Resolving {filename} in the HF cache...\n")
+    from huggingface_hub import hf_hub_download
+    model_path = hf_hub_download(repo_id=repo_id, filename=filename)
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        proc = subprocess.Popen(
+            _server_command(model_path, port, threads, n_ctx),
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0
+        )
+    except OSError as e:
+        emit(f"[LLAMA.CPP] Could not start the server: {e}\n")
+        return None
+    threading.Thread(target=pump_output, args=(proc.stdout, emit), daemon=True).start()
+    emit(f"[LLAMA.CPP] Server starting on {base_url} ({threads} threads, ctx {n_ctx})...\n")
+
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            emit(f"[LLAMA.CPP] Server exited during startup (Code {proc.returncode}). "
+                 "Is llama-cpp-python[server] installed (or POCKETBENCH_LLAMA_SERVER set)?\n")
+            return None
+        if should_stop and should_stop(): break
+        if _is_ready(base_url): return {"proc": proc, "base_url": base_url}
+        time.sleep(0.5)
+
+    stop_server({"proc": proc})
+    if not (should_stop and should_stop()):
+        emit(f"[LLAMA.CPP] Server not ready after {STARTUP_TIMEOUT}s.\n")
+    return None
+
+def stop_server(server):
+    if not server: return
+    proc = server["proc"]
+    if proc.poll() is None:
+        proc.terminate()
+        try: proc.wait(timeout=10)
+        except subprocess.TimeoutExpired: proc.kill()
+
+def is_alive(server):
+    return bool(server) and server["proc"].poll() is None
+
+def model_args(server, n_ctx):
+    """--model_args for lm_eval's gguf (OpenAI-compatible completions) model."""
+    return f"base_url={server['base_url']},max_length={n_ctx}"
@@ -0,0 +1,290 @@
+import os
+import re
+import json
+import glob
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from . import log_store
+
+LOG_INDEX_DB = os.path.join(log_store.LOGS_DIR, "log_index.db")
+
+FTS_CHUNK_BYTES = 64 * 1024   # Log text goes into the full-text index in chunks of about this size
+MAX_PAGE = 500
+
+# Outcome codes counted per log ("[FAILURE] Crashed (Code 1)" -> FAILURE)
+OUTCOME_CODES = ("SUCCESS", "FAILURE", "STOPPED", "CRITICAL", "ERROR", "CACHED", "OOM", "RETRY")
+OUTCOME_RE = re.compile(r"\[(" + "|".join(OUTCOME_CODES) + r")\]")
+# Job headers, for logs indexed after the fact: "JOB 2/5: model.Q4_K_M.gguf"
+JOB_RE = re.compile(r"JOB \d+/\d+: (\S+)")
+SORT_COLUMNS = ("started", "ended", "duration", "size_bytes", "filename")
+
+_db_lock = threading.Lock()
+_initialized = False
+_imported = False
+_live = {}  # filename -> {"buffer": [...], "buffered": chars, "counts": {code: n}} of running batches
+
+# --- DATABASE ---
+
+def _connect():
+    os.makedirs(log_store.LOGS_DIR, exist_ok=True)
+    conn = sqlite3.connect(LOG_INDEX_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_db():
+    global _initialized
+    if _initialized: return
+    with _db_lock, _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS logs (
+                filename TEXT PRIMARY KEY,
+                batch_id TEXT,
+                started REAL,
+                ended REAL,
+                duration REAL,
+                size_bytes INTEGER,
+                compressed INTEGER DEFAULT 0,
+                status TEXT,
+                tasks TEXT,
+                mtime REAL
+            );
+            CREATE TABLE IF NOT EXISTS log_models (
+                filename TEXT,
+                model TEXT,
+                repo_id TEXT,
+                PRIMARY KEY (filename, model)
+            );
+            CREATE TABLE IF NOT EXISTS log_outcomes (
+                filename TEXT,
+                code TEXT,
+                count INTEGER,
+                PRIMARY KEY (filename, code)
+            );
+            CREATE TABLE IF NOT EXISTS log_chunks (
+                chunk_id INTEGER PRIMARY KEY,
+                filename TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_logs_started ON logs (started);
+            CREATE INDEX IF NOT EXISTS idx_log_chunks_file ON log_chunks (filename);
+            CREATE INDEX IF NOT EXISTS idx_log_models_model ON log_models (model);
+            CREATE INDEX IF NOT EXISTS idx_log_outcomes_code ON log_outcomes (code, count);
+            CREATE VIRTUAL TABLE IF NOT EXISTS log_text USING fts5(filename UNINDEXED, content);
+        """)
+    _initialized = True
+
+def _batch_start(filename, fallback):
+    """Start time from the log name (BATCH_20240101_120000.log), else `fallback`."""
+    try: return datetime.strptime(log_store.logical_name(filename)[len("BATCH_"):].split(".")[0], "%Y%m%d_%H%M%S").timestamp()
+    except ValueError: return fallback
+
+def _count_outcomes(text, counts):
+    for code in OUTCOME_RE.findall(text):
+        counts[code] = counts.get(code, 0) + 1
+
+def _add_outcomes(conn, filename, counts):
+    for code, n in counts.items():
+        conn.execute("INSERT INTO log_outcomes VALUES (?, ?, ?) ON CONFLICT (filename, code) "
+                     "DO UPDATE SET count = count + excluded.count", (filename, code, n))
+
+def _add_models(conn, filename, jobs):
+    conn.executemany("INSERT OR IGNORE INTO log_models VALUES (?, ?, ?)",
+                     [(filename, j['filename'], j.get('repo_id')) for j in jobs if j.get('filename')])
+    tasks = set(json.loads(conn.execute("SELECT tasks FROM logs WHERE filename = ?", (filename,)).fetchone()["tasks"] or "[]"))
+    for j in jobs: tasks.update(j.get('tasks') or [])
+    conn.execute("UPDATE logs SET tasks = ? WHERE filename = ?", (json.dumps(sorted(tasks)), filename))
+
+def _add_text(conn, filename, text):
+    # The FTS table can't index `filename`: log_chunks maps its rowids back for cheap deletes
+    chunk_id = conn.execute("INSERT INTO log_chunks (filename) VALUES (?)", (filename,)).lastrowid
+    conn.execute("INSERT INTO log_text (rowid, filename, content) VALUES (?, ?, ?)", (chunk_id, filename, text))
+
+def _remove(conn, filename):
+    conn.execute("DELETE FROM log_text WHERE rowid IN (SELECT chunk_id FROM log_chunks WHERE filename = ?)", (filename,))
+    for table in ("logs", "log_models", "log_outcomes", "log_chunks"):
+        conn.execute(f"DELETE FROM {table} WHERE filename = ?", (filename,))
+
+# --- LIVE BATCHES ---
+
+def begin(filename, batch_id, jobs):
+    """Registers a batch log as it starts (a resumed batch keeps its original start time)."""
+    try:
+        init_db()
+        with _db_lock, _connect() as conn:
+            conn.execute("INSERT INTO logs (filename, batch_id, started, status, tasks) VALUES (?, ?, ?, 'running', '[]') "
+                         "ON CONFLICT (filename) DO UPDATE SET status = 'running', ended = NULL",
+                         (filename, batch_id, _batch_start(filename, time.time())))
+            _add_models(conn, filename, jobs)
+            _live[filename] = {"buffer": [], "buffered": 0, "counts": {}}
+    except Exception as e: print(f"Log index error: {e}")
+
+def add_jobs(filename, jobs):
+    """Jobs queued into a running batch."""
+    try:
+        with _db_lock, _connect() as conn: _add_models(conn, filename, jobs)
+    except Exception as e: print(f"Log index error: {e}")
+
+def _flush(conn, filename, live):
+    if live["buffer"]:
+        _add_text(conn, filename, "".join(live["buffer"]))
+    _add_outcomes(conn, filename, live["counts"])
+    live["buffer"], live["buffered"], live["counts"] = [], 0, {}
+
+def append(filename, text):
+    """Feeds log text as it is written; indexed in FTS_CHUNK_BYTES chunks."""
+    live = _live.get(filename)
+    if live is None or not text: return
+    live["buffer"].append(text)
+    live["buffered"] += len(text)
+    _count_outcomes(text, live["counts"])
+    if live["buffered"] < FTS_CHUNK_BYTES: return
+    try:
+        with _db_lock, _connect() as conn: _flush(conn, filename, live)
+    except Exception as e: print(f"Log index error: {e}")
+
+def finish(filename, status):
+    """Closes a batch log: flushes the text and records end time, duration, size and status."""
+    live = _live.pop(filename, None)
+    try:
+        path, compressed = log_store.resolve_log(filename)
+        size = log_store.get_size(path, compressed) if path else 0
+        with _db_lock, _connect() as conn:
+            if live: _flush(conn, filename, live)
+            now = time.time()
+            conn.execute("UPDATE logs SET ended = ?, duration = ? - started, size_bytes = ?, compressed = ?, "
+                         "status = ?, mtime = ? WHERE filename = ?",
+                         (now, now, size, 1 if compressed else 0, status, os.path.getmtime(path) if path else None, filename))
+    except Exception as e: print(f"Log index error: {e}")
+
+def remove(filename):
+    try:
+        init_db()
+        with _db_lock, _connect() as conn: _remove(conn, log_store.logical_name(filename))
+    except Exception as e: print(f"Log index error: {e}")
+
+# --- BACKFILL ---
+
+def _index_file(conn, filename, path, compressed, known):
+    """Indexes a finished log from its contents (logs written before the index existed)."""
+    text = log_store.read_all(filename) or ""
+    mtime = os.path.getmtime(path)
+    if known: _remove(conn, filename)
+    conn.execute("INSERT INTO logs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+        filename, filename[len("BATCH_"):-len(".log")] if filename.startswith("BATCH_") else None,
+        _batch_start(filename, mtime), mtime, None, len(text.encode("utf-8")), 1 if compressed else 0,
+        "finished" if compressed else "unknown", "[]", mtime
+    ))
+    conn.execute("UPDATE logs SET duration = ended - started WHERE filename = ?", (filename,))
+    conn.executemany("INSERT OR IGNORE INTO log_models VALUES (?, ?, NULL)",
+                     [(filename, m) for m in set(JOB_RE.findall(text))])
+    counts = {}
+    _count_outcomes(text, counts)
+    _add_outcomes(conn, filename, counts)
+    start = 0
+    while start < len(text):
+        # Chunks end on line boundaries so a line is never split across two index rows
+        end = text.rfind("\n", start, start + FTS_CHUNK_BYTES) + 1 if len(text) - start > FTS_CHUNK_BYTES else len(text)
+        if end <= start: end = start + FTS_CHUNK_BYTES
+        _add_text(conn, filename, text[start:end])
+        start = end
+
+def import_logs(force=False):
+    """Indexes logs that are new or changed on disk and drops entries of deleted ones."""
+    global _imported
+    init_db()
+    paths = glob.glob(os.path.join(log_store.LOGS_DIR, "*.log")) + glob.glob(os.path.join(log_store.LOGS_DIR, "*.log.gz"))
+    on_disk = {log_store.logical_name(p): p for p in paths}
+    imported = 0
+    with _db_lock, _connect() as conn:
+        known = dict(conn.execute("SELECT filename, mtime FROM logs").fetchall())
+        for filename, path in on_disk.items():
+            if filename in _live: continue # Still being written: indexed as it runs
+            if not force and filename in known and known[filename] == os.path.getmtime(path): continue
+            try: _index_file(conn, filename, path, path.endswith(log_store.GZ_SUFFIX), filename in known)
+            except Exception as e:
+                print(f"Log index error ({filename}): {e}")
+                continue
+            imported += 1
+        for filename in set(known) - set(on_disk) - set(_live):
+            _remove(conn, filename)
+    _imported = True
+    return {"scanned": len(on_disk), "imported": imported}
+
+def ensure_imported():
+    """The first listing after startup picks up logs the index hasn't seen."""
+    if not _imported: import_logs()
+
+# --- QUERIES ---
+
+def _fts_query(text):
+    """User text as an FTS5 phrase, so brackets and operators are matched literally."""
+    return '"' + text.replace('"', '""') + '"'
+
+def _where(filters):
+    clauses, params = [], []
+    if filters.get("model"):
+        clauses.append("filename IN (SELECT filename FROM log_models WHERE model LIKE ? OR repo_id LIKE ?)")
+        params.extend([f"%{filters['model']}%"] * 2)
+    if filters.get("task"):
+        clauses.append("tasks LIKE ?")
+        params.append(f'%"{filters["task"]}"%')
+    if filters.get("outcome"):
+        clauses.append("filename IN (SELECT filename FROM log_outcomes WHERE code = ? AND count > 0)")
+        params.append(filters["outcome"].strip("[]").upper())
+    if filters.get("status"):
+        clauses.append("status = ?")
+        params.append(filters["status"])
+    if filters.get("batch_id"):
+        clauses.append("batch_id = ?")
+        params.append(filters["batch_id"])
+    if filters.get("since"):
+        clauses.append("started >= ?")
+        params.append(float(filters["since"]))
+    if filters.get("until"):
+        clauses.append("started < ?")
+        params.append(float(filters["until"]))
+    if filters.get("q"):
+        clauses.append("filename IN (SELECT filename FROM log_chunks WHERE chunk_id IN "
+                       "(SELECT rowid FROM log_text WHERE log_text MATCH ?))")
+        params.append(_fts_query(filters["q"]))
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def _row(conn, row):
+    item = dict(row)
+    filename = item["filename"]
+    item["models"] = [r["model"] for r in conn.execute("SELECT model FROM log_models WHERE filename = ? ORDER BY model", (filename,))]
+    item["outcomes"] = {r["code"]: r["count"] for r in conn.execute("SELECT code, count FROM log_outcomes WHERE filename = ?", (filename,))}
+    item["tasks"] = json.loads(item["tasks"] or "[]")
+    item["compressed"] = bool(item["compressed"])
+    if filename in _live: # Still growing: size and duration so far
+        path, compressed = log_store.resolve_log(filename)
+        if path: item["size_bytes"] = log_store.get_size(path, compressed)
+        item["duration"] = time.time() - item["started"] if item["started"] else None
+    item["date"] = datetime.fromtimestamp(item["started"]).strftime("%Y-%m-%d %H:%M") if item["started"] else "Unknown"
+    return item
+
+def list_logs(filters, sort="started", order="desc", limit=50, offset=0):
+    """Filtered, paginated log metadata. Returns {"total", "rows"} (rows carry a match snippet for `q`)."""
+    ensure_imported()
+    sort = sort if sort in SORT_COLUMNS else "started"
+    order = "ASC" if str(order).lower() == "asc" else "DESC"
+    limit = max(1, min(int(limit or 50), MAX_PAGE))
+    where, params = _where(filters)
+    with _db_lock, _connect() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM logs {where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT * FROM logs {where} ORDER BY {sort} {order}, filename DESC LIMIT ? OFFSET ?",
+                            params + [limit, int(offset or 0)]).fetchall()
+        items = [_row(conn, r) for r in rows]
+        if filters.get("q") and items:
+            # First matching chunk per log on this page
+            ids = conn.execute(f"SELECT MIN(chunk_id) FROM log_chunks WHERE filename IN ({','.join('?' * len(items))}) "
+                               "AND chunk_id IN (SELECT rowid FROM log_text WHERE log_text MATCH ?) GROUP BY filename",
+                               [i["filename"] for i in items] + [_fts_query(filters["q"])]).fetchall()
+            snippets = dict(conn.execute(
+                f"SELECT filename, snippet(log_text, 1, '[[', ']]', '...', 16) FROM log_text "
+                f"WHERE log_text MATCH ? AND rowid IN ({','.join('?' * len(ids))})",
+                [_fts_query(filters["q"])] + [r[0] for r in ids]).fetchall()) if ids else {}
+            for item in items: item["snippet"] = snippets.get(item["filename"])
+    return {"total": total, "rows": items}
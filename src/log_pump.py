@@ -0,0 +1,77 @@
+import os
+import time
+import codecs
+import selectors
+
+# Coalescing limits for forwarded output
+FLUSH_INTERVAL = 0.25      # Max seconds a line waits before being forwarded
+FLUSH_BYTES = 16 * 1024    # Forward early once this much text is buffered
+READ_SIZE = 64 * 1024
+
+# Selectors can't watch pipes on Windows; fall back to blocking reads there
+USE_SELECTOR = os.name != "nt"
+
+def is_noise(line):
+    """tqdm progress bars and per-request spam that would flood the terminal."""
+    return "%|" in line or "Running loglikelihood" in line
+
+def _split_lines(text):
+    """Splits on \\n and \\r (tqdm redraws with \\r). Returns (lines, trailing partial)."""
+    lines = text.splitlines(keepends=True)
+    partial = ""
+    if lines and not lines[-1].endswith(("\n", "\r")):
+        partial = lines.pop()
+    return lines, partial
+
+def pump_output(stream, emit, keep=None):
+    """
+    Forwards a subprocess pipe to `emit` until EOF.
+    Blocks on readiness (no polling), drops noise lines (except those `keep(line)`
+    accepts, e.g. control messages) and hands `emit` coalesced chunks bounded by
+    FLUSH_INTERVAL / FLUSH_BYTES.
+    """
+    fd = stream.fileno()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    partial = ""
+    buf, buf_size = [], 0
+    last_flush = time.monotonic()
+
+    sel = None
+    if USE_SELECTOR:
+        sel = selectors.DefaultSelector()
+        sel.register(fd, selectors.EVENT_READ)
+
+    def flush():
+        nonlocal buf, buf_size, last_flush
+        if buf: emit("".join(buf))
+        buf, buf_size = [], 0
+        last_flush = time.monotonic()
+
+    try:
+        while True:
+            if sel:
+                # Sleep until output arrives, or until buffered lines are due
+                timeout = None if not buf else max(0, FLUSH_INTERVAL - (time.monotonic() - last_flush))
+                if not sel.select(timeout):
+                    flush()
+                    continue
+
+            data = os.read(fd, READ_SIZE)
+            if not data: break # EOF
+
+            lines, partial = _split_lines(partial + decoder.decode(data))
+            for line in lines:
+                if is_noise(line) and not (keep and keep(line)): continue
+                if line.endswith("\r"): line = line[:-1] + "\n"
+                buf.append(line)
+                buf_size += len(line)
+
+            # Blocking reads can't time out, so forward whatever one read produced
+            if not sel or buf_size >= FLUSH_BYTES or time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                flush()
+
+        tail = partial + decoder.decode(b"", final=True)
+        if tail and (not is_noise(tail) or (keep and keep(tail))): buf.append(tail)
+        flush()
+    finally:
+        if sel: sel.close()
@@ -0,0 +1,224 @@
+import os
+import gzip
+import json
+import shutil
+import threading
+
+LOGS_DIR = "logs"
+GZ_SUFFIX = ".gz"
+INDEX_SUFFIX = ".idx"
+
+# Finished logs are gzipped in independently compressed blocks (one gzip member each, so the
+# file is still a plain .gz); a sidecar index of their offsets lets a page decompress only
+# the blocks it covers
+BLOCK_SIZE = 256 * 1024
+
+# Default window for tail / range reads
+DEFAULT_READ_BYTES = 256 * 1024
+MAX_READ_BYTES = 4 * 1024 * 1024
+
+# --- PATHS ---
+
+def logical_name(filename):
+    """Name clients use for a log, whether or not it is stored compressed."""
+    name = os.path.basename(filename or "")
+    return name[:-len(GZ_SUFFIX)] if name.endswith(GZ_SUFFIX) else name
+
+def resolve_log(filename):
+    """Returns (path, compressed) for a log name, or (None, False) if missing."""
+    name = logical_name(filename)
+    if not name: return None, False
+    plain = os.path.join(LOGS_DIR, name)
+    if os.path.exists(plain): return plain, False
+    if os.path.exists(plain + GZ_SUFFIX): return plain + GZ_SUFFIX, True
+    return None, False
+
+# --- COMPRESSION ---
+
+def _write_blocks(src, gz_path):
+    """Writes `src` to gz_path as gzip blocks plus their index; returns the uncompressed size."""
+    offsets, size = [0], 0
+    tmp_path, tmp_index = gz_path + ".tmp", gz_path + INDEX_SUFFIX + ".tmp"
+    with open(tmp_path, "wb") as dst:
+        while True:
+            block = src.read(BLOCK_SIZE)
+            if not block: break
+            dst.write(gzip.compress(block, compresslevel=6))
+            offsets.append(dst.tell())
+            size += len(block)
+    with open(tmp_index, "w") as f: json.dump({"size": size, "block_size": BLOCK_SIZE, "offsets": offsets}, f)
+    os.replace(tmp_path, gz_path)
+    os.replace(tmp_index, gz_path + INDEX_SUFFIX)
+    return size
+
+def compress_log(path):
+    """Gzips a finished log in place (BATCH_x.log -> BATCH_x.log.gz + its block index)."""
+    if not os.path.exists(path): return None
+    gz_path = path + GZ_SUFFIX
+    with open(path, "rb") as src: _write_blocks(src, gz_path)
+    os.remove(path)
+    return gz_path
+
+def reopen_for_append(path):
+    """A resumed batch appends to its log, so restore a compressed one first."""
+    gz_path = path + GZ_SUFFIX
+    if os.path.exists(path) or not os.path.exists(gz_path): return
+    tmp_path = path + ".tmp"
+    with gzip.open(gz_path, "rb") as src, open(tmp_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp_path, path)
+    os.remove(gz_path)
+    _remove_index(gz_path)
+
+def _remove_index(gz_path):
+    try: os.remove(gz_path + INDEX_SUFFIX)
+    except FileNotFoundError: pass
+
+# --- READS ---
+
+_index_lock = threading.Lock()
+_last_block = (None, b"") # ((path, mtime_ns, block number), data): a page and its boundary check share a block
+
+def _load_index(gz_path):
+    """Block index of a compressed log; a .gz without one (older releases) is rewritten in blocks once."""
+    try:
+        with open(gz_path + INDEX_SUFFIX) as f: return json.load(f)
+    except (OSError, ValueError): pass
+    with _index_lock:
+        try:
+            with open(gz_path + INDEX_SUFFIX) as f: return json.load(f)
+        except (OSError, ValueError): pass
+        with gzip.open(gz_path, "rb") as src: _write_blocks(src, gz_path)
+        with open(gz_path + INDEX_SUFFIX) as f: return json.load(f)
+
+def get_size(path, compressed):
+    """Uncompressed size in bytes (recorded in the block index when the log was compressed)."""
+    if not compressed: return os.path.getsize(path)
+    return _load_index(path)["size"]
+
+def _read_block(path, index, n):
+    global _last_block
+    key = (path, os.stat(path).st_mtime_ns, n)
+    cached_key, data = _last_block
+    if cached_key == key: return data
+    offsets = index["offsets"]
+    with open(path, "rb") as f:
+        f.seek(offsets[n])
+        data = gzip.decompress(f.read(offsets[n + 1] - offsets[n]))
+    _last_block = (key, data)
+    return data
+
+def _read_bytes(path, compressed, start, length):
+    if not compressed:
+        with open(path, "rb") as f:
+            f.seek(start)
+            return f.read(length)
+    index = _load_index(path)
+    end = min(start + length, index["size"])
+    if start >= end: return b""
+    block = index["block_size"]
+    first, last = start // block, (end - 1) // block
+    data = b"".join(_read_block(path, index, n) for n in range(first, last + 1))
+    return data[start - first * block:end - first * block]
+
+def _align_start(path, compressed, start, data):
+    """Drops a partial first line unless `start` already sits on a line boundary."""
+    if start <= 0 or _read_bytes(path, compressed, start - 1, 1) == b"\n": return start, data
+    cut = data.find(b"\n")
+    if cut < 0: return start, data
+    return start + cut + 1, data[cut + 1:]
+
+def _clamp(length):
+    return max(1, min(int(length or DEFAULT_READ_BYTES), MAX_READ_BYTES))
+
+def read_tail(filename, offset=None, max_bytes=None):
+    """
+    Returns bytes written after `offset` (a previous response's 'offset').
+    Without an offset, returns the last `max_bytes`. Only whole lines are
+    returned, so the next offset always lands on a line boundary.
+    """
+    path, compressed = resolve_log(filename)
+    if not path: return None
+    size = get_size(path, compressed)
+    max_bytes = _clamp(max_bytes)
+
+    from_end = offset is None or offset < 0
+    if from_end: offset = max(0, size - max_bytes)
+    offset = min(offset, size)
+    data = _read_bytes(path, compressed, offset, min(size - offset, max_bytes))
+
+    # Tail windows start at the next whole line
+    if from_end: offset, data = _align_start(path, compressed, offset, data)
+
+    # A live log may end mid-line (or mid UTF-8 sequence): hold it back
+    if not compressed and data and not data.endswith(b"\n"):
+        cut = data.rfind(b"\n")
+        data = data[:cut + 1] if cut >= 0 else b""
+
+    new_offset = offset + len(data)
+    return {
+        "filename": logical_name(filename),
+        "data": data.decode("utf-8", errors="replace"),
+        "start": offset,
+        "offset": new_offset,
+        "size": size,
+        "more": new_offset < size,
+        "finished": compressed
+    }
+
+def read_range(filename, start=None, length=None, end=None):
+    """
+    Pages through history. `start` (+length) reads forward: the page stops after
+    its last whole line, so the next page starts at this page's `end`. `end`
+    (+length) reads the window before it, from its first whole line, so the
+    previous page ends at this page's `start`.
+    """
+    path, compressed = resolve_log(filename)
+    if not path: return None
+    size = get_size(path, compressed)
+    length = _clamp(length)
+
+    if start is None:
+        end = size if end is None else min(max(0, end), size)
+        start = max(0, end - length)
+        data = _read_bytes(path, compressed, start, end - start)
+    else:
+        start = min(max(0, start), size)
+        end = min(start + length if end is None else min(end, start + length), size)
+        if end < start: raise ValueError("end is before start")
+        data = _read_bytes(path, compressed, start, end - start)
+        # Hold back a partial last line (a live log may also end mid-line); a line
+        # longer than the window is returned whole, up to MAX_READ_BYTES
+        if end < size or not compressed:
+            cut = data.rfind(b"\n")
+            if cut < 0 and end < size:
+                data = _read_bytes(path, compressed, start, MAX_READ_BYTES)
+                cut = data.find(b"\n")
+            if cut >= 0: data = data[:cut + 1]
+            elif end >= size: data = b"" # The live log's last line is still being written
+            end = start + len(data)
+
+    start, data = _align_start(path, compressed, start, data)
+
+    return {
+        "filename": logical_name(filename),
+        "data": data.decode("utf-8", errors="replace"),
+        "start": start,
+        "end": end,
+        "size": size,
+        "finished": compressed
+    }
+
+def read_all(filename):
+    path, compressed = resolve_log(filename)
+    if not path: return None
+    opener = gzip.open if compressed else open
+    with opener(path, "rb") as f:
+        return f.read().decode("utf-8", errors="replace")
+
+def delete_log(filename):
+    path, compressed = resolve_log(filename)
+    if not path: return False
+    os.remove(path)
+    if compressed: _remove_index(path)
+    return True
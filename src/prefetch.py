@@ -0,0 +1,121 @@
+import os
+import queue
+import shutil
+import threading
+from . import hf_utils
+
+# Jobs looked at ahead of the running ones
+PREFETCH_AHEAD = 2
+# Free disk that prefetching never eats into
+DISK_HEADROOM = 10 * (1024 ** 3)
+
+_requests = queue.Queue()
+_states = {}   # (repo_id, filename) -> queued / downloading / ready / skipped / failed
+_lock = threading.Lock()
+_worker = None
+
+def is_cached(repo_id, filename):
+    try:
+        return hf_utils.cached_path(repo_id, filename) is not None
+    except Exception:
+        return False
+
+def get_state(repo_id, filename):
+    with _lock: return _states.get((repo_id, filename))
+
+def get_cache_usage():
+    """Bytes used by complete GGUFs in the HF cache (from the local model inventory)."""
+    return sum(i.get("size_bytes", 0) for i in hf_utils.get_local_models() if i["type"] == "valid")
+
+def _check_space(size_bytes, budget_bytes):
+    """Returns None if the file fits, else the reason it does not."""
+    cache_root = hf_utils.hub_cache_root()
+    os.makedirs(cache_root, exist_ok=True)
+    free = shutil.disk_usage(cache_root).free
+    if free - size_bytes < DISK_HEADROOM:
+        return f"only {free / (1024 ** 3):.1f} GB free on disk"
+    if budget_bytes:
+        used = get_cache_usage()
+        if used + size_bytes > budget_bytes:
+            return f"cache budget {budget_bytes / (1024 ** 3):.1f} GB reached ({used / (1024 ** 3):.1f} GB used)"
+    return None
+
+def request_prefetch(repo_id, filename, size_bytes=0, emit=None, budget_bytes=None):
+    """Queues a background download into the HF cache. Repeated requests are ignored."""
+    key = (repo_id, filename)
+    # A "ready" file may have been deleted since (model manager, eviction): fetch it again
+    stale = get_state(repo_id, filename) == "ready" and not is_cached(repo_id, filename)
+    with _lock:
+        state = _states.get(key)
+        if state and state != "failed" and not (stale and state == "ready"): return
+        _states[key] = "queued"
+    _requests.put((repo_id, filename, size_bytes, emit, budget_bytes))
+    ensure_worker()
+
+def cancel_pending():
+    """Drops queued (not yet started) prefetches, e.g. when a batch is stopped."""
+    while True:
+        try: repo_id, filename, _, _, _ = _requests.get_nowait()
+        except queue.Empty: return
+        with _lock: _states.pop((repo_id, filename), None)
+
+def forget(repo_id, filename=None):
+    """Drops the prefetch state of a deleted file (every file of the repo without `filename`)."""
+    with _lock:
+        for key in [k for k in _states if k[0] == repo_id and (filename is None or k[1] == filename)]:
+            del _states[key]
+
+def _set_state(key, state):
+    with _lock: _states[key] = state
+
+def _download(repo_id, filename, size_bytes, emit, budget_bytes):
+    key = (repo_id, filename)
+    def log(text):
+        # The batch that asked may have finished; its log is best effort
+        try:
+            if emit: emit(text)
+        except Exception: pass
+
+    if is_cached(repo_id, filename):
+        _set_state(key, "ready")
+        return
+
+    reason = _check_space(size_bytes, budget_bytes)
+    if reason:
+        _set_state(key, "skipped")
+        log(f"[PREFETCH] Skipped {filename}: {reason}. It will download when its job starts.\n")
+        return
+
+    _set_state(key, "downloading")
+    log(f"[PREFETCH] Downloading {filename} ({size_bytes / (1024 ** 3):.2f} GB) in the background...\n")
+    try:
+        from huggingface_hub import hf_hub_download
+        hf_hub_download(repo_id=repo_id, filename=filename)
+        _set_state(key, "ready")
+        log(f"[PREFETCH] Ready: {filename}\n")
+    except Exception as e:
+        _set_state(key, "failed")
+        log(f"[PREFETCH] Failed for {filename}: {e}\n")
+
+def _worker_loop():
+    # One download at a time: the point is to overlap with evaluation, not to saturate the link
+    while True:
+        repo_id, filename, size_bytes, emit, budget_bytes = _requests.get()
+        try: _download(repo_id, filename, size_bytes, emit, budget_bytes)
+        except Exception as e: print(f"Prefetch error: {e}")
+
+def ensure_worker():
+    global _worker
+    if _worker and _worker.is_alive(): return
+    _worker = threading.Thread(target=_worker_loop, name="pocketbench-prefetch", daemon=True)
+    _worker.start()
+
+def evict_model(repo_id, filename):
+    """Deletes every cached revision of a benchmarked GGUF. Returns True if anything was removed."""
+    removed = False
+    for item in hf_utils.get_local_models():
+        if item["type"] == "valid" and item["repo_id"] == repo_id and item["filename"] == filename:
+            ok, _ = hf_utils.delete_local_file(repo_id, item["revision"], filename)
+            removed = removed or ok
+    forget(repo_id, filename)
+    return removed
@@ -0,0 +1,112 @@
+import os
+import re
+import json
+import glob
+import threading
+from datetime import datetime
+from . import hf_utils
+
+# lm_eval's request-level cache (--use_cache): one SQLite file per model file + backend
+CACHE_DIR = "response_cache"
+INDEX_FILE = os.path.join(CACHE_DIR, "index.json")
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+# Logged by lm_eval's CachingLM before each request type is evaluated
+COUNTS_RE = re.compile(r"Cached requests: (\d+), Requests remaining: (\d+)")
+
+_lock = threading.Lock()
+
+def _load_index():
+    if not os.path.exists(INDEX_FILE): return {}
+    try:
+        with open(INDEX_FILE, 'r') as f: return json.load(f)
+    except: return {}
+
+def _save_index(index):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = INDEX_FILE + ".tmp"
+    with open(tmp_path, 'w') as f: json.dump(index, f, indent=2)
+    os.replace(tmp_path, INDEX_FILE)
+
+def _local_hash(repo_id, filename, revision=None):
+    """LFS blobs in the HF cache are named by the sha256 of their content."""
+    try:
+        path = hf_utils.cached_path(repo_id, filename, revision)
+        if path:
+            name = os.path.basename(os.path.realpath(path))
+            if SHA256_RE.match(name): return name
+    except Exception: pass
+    return None
+
+def get_model_hash(repo_id, filename):
+    """sha256 of the GGUF: from the local blob, else from the Hub's LFS metadata."""
+    local = _local_hash(repo_id, filename)
+    if local: return local
+    for f in hf_utils.list_repo_files_rich(repo_id):
+        if f["name"] == filename and f.get("sha256"): return f["sha256"]
+    return None
+
+def get_cache_base(repo_id, filename, backend="hf"):
+    """
+    Path prefix for lm_eval --use_cache (it appends _rank0.db), or None when the
+    file's hash is unknown: replaying another file's responses would be wrong.
+    """
+    model_hash = get_model_hash(repo_id, filename)
+    if not model_hash: return None
+    key = f"{model_hash[:16]}_{backend or 'hf'}"
+    with _lock:
+        index = _load_index()
+        if key not in index:
+            index[key] = {"repo_id": repo_id, "filename": filename, "backend": backend or "hf",
+                          "sha256": model_hash, "created": datetime.now().isoformat(timespec="seconds")}
+            _save_index(index)
+    return os.path.abspath(os.path.join(CACHE_DIR, key))
+
+def parse_counts(text):
+    """(cached, computed) request counts reported in a chunk of lm_eval output."""
+    hits = misses = 0
+    for cached, remaining in COUNTS_RE.findall(text or ""):
+        hits += int(cached)
+        misses += int(remaining)
+    return hits, misses
+
+def _entry_files(key):
+    return glob.glob(os.path.join(CACHE_DIR, f"{key}_rank*.db*"))
+
+def _local_hashes():
+    hashes = set()
+    for item in hf_utils.get_local_models():
+        if item["type"] != "valid": continue
+        h = _local_hash(item["repo_id"], item["filename"], item["revision"])
+        if h: hashes.add(h)
+    return hashes
+
+def prune(repo_id=None, filename=None):
+    """
+    Evicts cached responses of model files no longer in the HF cache
+    (optionally only for one repo/file, e.g. right after deleting it).
+    """
+    with _lock:
+        index = _load_index()
+        candidates = [k for k, e in index.items()
+                      if (not repo_id or e["repo_id"] == repo_id) and (not filename or e["filename"] == filename)]
+        if not candidates: return 0
+        present = _local_hashes()
+        evicted = 0
+        for key in candidates:
+            if index[key]["sha256"] in present: continue
+            for path in _entry_files(key):
+                try: os.remove(path)
+                except OSError: pass
+            del index[key]
+            evicted += 1
+        if evicted: _save_index(index)
+    return evicted
+
+def get_stats():
+    with _lock: index = _load_index()
+    entries = []
+    for key, entry in index.items():
+        size = sum(os.path.getsize(p) for p in _entry_files(key) if os.path.exists(p))
+        entries.append(dict(entry, key=key, size_bytes=size))
+    return {"entries": entries, "total_bytes": sum(e["size_bytes"] for e in entries)}
@@ -0,0 +1,227 @@
+import os
+import re
+import glob
+import json
+import sqlite3
+import threading
+from .hf_utils import get_tags
+
+RESULTS_DIR = "local_results_db"
+RESULTS_INDEX_DB = os.path.join(RESULTS_DIR, "results_index.db")
+
+# Metric keys in lm_eval output look like "acc,none" / "acc_stderr,none"
+SKIP_KEYS = ("alias", "sample_len", "samples")
+
+SORT_COLUMNS = ("value", "repo_id", "gguf_file", "quant", "family", "task", "metric", "backend", "updated")
+GROUP_COLUMNS = ("family", "repo_id", "gguf_file", "quant", "task", "backend")
+AGGREGATES = {"avg": "AVG", "max": "MAX", "min": "MIN", "count": "COUNT"}
+
+# Columns added after the first release, in table order
+MIGRATED_COLUMNS = (("backend", "TEXT DEFAULT 'hf'"), ("screened", "INTEGER DEFAULT 0"),
+                    ("samples", "INTEGER"), ("ci_low", "REAL"), ("ci_high", "REAL"))
+
+_db_lock = threading.Lock()
+_initialized = False
+_imported = False   # Result files on disk were reconciled with the index this run
+
+# --- DATABASE ---
+
+def _connect():
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    conn = sqlite3.connect(RESULTS_INDEX_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_db():
+    global _initialized
+    if _initialized: return
+    with _db_lock, _connect() as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS records (
+                record_path TEXT PRIMARY KEY,
+                mtime REAL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                record_path TEXT,
+                repo_id TEXT,
+                gguf_file TEXT,
+                quant TEXT,
+                family TEXT,
+                task TEXT,
+                metric TEXT,
+                filter TEXT,
+                value REAL,
+                stderr REAL,
+                sample_limit INTEGER,
+                updated TEXT,
+                backend TEXT DEFAULT 'hf',
+                screened INTEGER DEFAULT 0,
+                samples INTEGER,
+                ci_low REAL,
+                ci_high REAL,
+                PRIMARY KEY (record_path, task, metric, filter)
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_task ON results (task, metric, value);
+            CREATE INDEX IF NOT EXISTS idx_results_model ON results (repo_id, gguf_file);
+            CREATE INDEX IF NOT EXISTS idx_results_family ON results (family, quant);
+        """)
+        # Indexes created before results were tagged with their backend / screening outcome
+        columns = [r["name"] for r in conn.execute("PRAGMA table_info(results)")]
+        for column, decl in MIGRATED_COLUMNS:
+            if column not in columns:
+                conn.execute(f"ALTER TABLE results ADD COLUMN {column} {decl}")
+    _initialized = True
+
+def get_family(repo_id):
+    """Model family from the repo name: 'TheBloke/Llama-2-7B-GGUF' -> 'Llama-2-7B'."""
+    name = (repo_id or "").split("/")[-1]
+    return re.sub(r"[-_.]gguf$", "", name, flags=re.IGNORECASE) or name
+
+def _to_float(value):
+    try: return float(value)
+    except (TypeError, ValueError): return None
+
+def _record_limit(data):
+    index = data.get("task_index", {})
+    if index: return max(int(e.get("limit") or 0) for e in index.values())
+    return int(data.get("config", {}).get("limit") or 0)
+
+def _extract_rows(record_path, data):
+    repo_id = data.get("custom_repo_id")
+    gguf_file = data.get("custom_gguf_file")
+    if not repo_id or not gguf_file: return []
+    quant = get_tags(gguf_file)
+    family = get_family(repo_id)
+    limit = _record_limit(data)
+    updated = data.get("date") or data.get("end_time")
+    backend = data.get("custom_backend") or "hf"
+    screened = 1 if data.get("custom_screened") else 0
+    screening = data.get("screening", {})
+
+    rows = []
+    for task, metrics in data.get("results", {}).items():
+        if not isinstance(metrics, dict): continue
+        for key, value in metrics.items():
+            if key in SKIP_KEYS or "_stderr" in key: continue
+            value = _to_float(value)
+            if value is None: continue
+            metric, _, filt = key.partition(",")
+            stderr = _to_float(metrics.get(f"{metric}_stderr,{filt}" if filt else f"{metric}_stderr"))
+            # Screened tasks carry the sample count + interval of the metric they were stopped on
+            screen = screening.get(task) if screening.get(task, {}).get("metric") == key else {}
+            rows.append((record_path, repo_id, gguf_file, quant, family, task, metric, filt or "none",
+                         value, stderr, limit, str(updated) if updated else None, backend,
+                         screened, screen.get("samples"), screen.get("ci_low"), screen.get("ci_high")))
+    return rows
+
+def _index(conn, record_path, data, mtime):
+    conn.execute("DELETE FROM results WHERE record_path = ?", (record_path,))
+    conn.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     _extract_rows(record_path, data))
+    conn.execute("INSERT OR REPLACE INTO records VALUES (?, ?)", (record_path, mtime))
+
+def index_record(record_path, data):
+    """Called by save_result: replaces the indexed rows of one result file."""
+    init_db()
+    mtime = os.path.getmtime(record_path) if os.path.exists(record_path) else 0
+    with _db_lock, _connect() as conn:
+        _index(conn, record_path, data, mtime)
+
+def import_json_dir(force=False):
+    """Bulk-imports result JSON files that are new or changed since the last import."""
+    global _imported
+    init_db()
+    paths = glob.glob(os.path.join(RESULTS_DIR, "*.json"))
+    imported = 0
+    with _db_lock, _connect() as conn:
+        known = dict(conn.execute("SELECT record_path, mtime FROM records").fetchall())
+        for path in paths:
+            mtime = os.path.getmtime(path)
+            if not force and known.get(path) == mtime: continue
+            try:
+                with open(path, 'r') as f: data = json.load(f)
+            except Exception: continue
+            _index(conn, path, data, mtime)
+            imported += 1
+        # Drop rows of result files deleted from disk
+        for path in set(known) - set(paths):
+            conn.execute("DELETE FROM results WHERE record_path = ?", (path,))
+            conn.execute("DELETE FROM records WHERE record_path = ?", (path,))
+    _imported = True
+    return {"scanned": len(paths), "imported": imported}
+
+def ensure_imported():
+    """
+    The first query after startup reconciles the index with the files on disk (path +
+    mtime), so records saved before the index existed, or copied in, are picked up.
+    """
+    if not _imported: import_json_dir()
+
+# --- QUERIES ---
+
+def _where(filters):
+    """Builds a WHERE clause from the supported query filters."""
+    clauses, params = [], []
+    for col in ("repo_id", "gguf_file", "task", "metric", "family", "backend"):
+        if filters.get(col):
+            clauses.append(f"{col} = ?")
+            params.append(filters[col])
+    if filters.get("quant"):
+        # 'Q4' matches Q4_0, Q4_K_M, ...
+        clauses.append("quant LIKE ?")
+        params.append(filters["quant"].upper() + "%")
+    if filters.get("filter"):
+        clauses.append("filter = ?")
+        params.append(filters["filter"])
+    if filters.get("search"):
+        clauses.append("(repo_id LIKE ? OR gguf_file LIKE ?)")
+        params.extend([f"%{filters['search']}%"] * 2)
+    if not filters.get("include_limited"):
+        clauses.append("sample_limit = 0")
+    if not filters.get("include_screened"):
+        clauses.append("screened = 0")
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def query_results(filters, sort="value", order="desc", limit=100, offset=0):
+    """Filtered, sorted, paginated result rows. Returns {"total", "rows"}."""
+    ensure_imported()
+    sort = sort if sort in SORT_COLUMNS else "value"
+    order = "ASC" if str(order).lower() == "asc" else "DESC"
+    where, params = _where(filters)
+    with _db_lock, _connect() as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM results {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT * FROM results {where} ORDER BY {sort} {order}, repo_id, gguf_file LIMIT ? OFFSET ?",
+            params + [int(limit), int(offset)]
+        ).fetchall()
+    return {"total": total, "rows": [dict(r) for r in rows]}
+
+def best_per_group(filters, group_by="family", order="desc", limit=100):
+    """Top row per group, e.g. best Q4 variant per family on gsm8k."""
+    ensure_imported()
+    group_by = group_by if group_by in GROUP_COLUMNS else "family"
+    order = "ASC" if str(order).lower() == "asc" else "DESC"
+    where, params = _where(filters)
+    with _db_lock, _connect() as conn:
+        rows = conn.execute(f"""
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY {group_by}, task, metric ORDER BY value {order}) AS rank
+                FROM results {where}
+            ) WHERE rank = 1 ORDER BY value {order} LIMIT ?
+        """, params + [int(limit)]).fetchall()
+    return [dict(r) for r in rows]
+
+def aggregate(filters, group_by="family", agg="avg", limit=100):
+    """Aggregates metric values per group (avg / max / min / count)."""
+    ensure_imported()
+    group_by = group_by if group_by in GROUP_COLUMNS else "family"
+    fn = AGGREGATES.get(str(agg).lower(), "AVG")
+    where, params = _where(filters)
+    with _db_lock, _connect() as conn:
+        rows = conn.execute(f"""
+            SELECT {group_by} AS grp, task, metric, {fn}(value) AS value, COUNT(*) AS n
+            FROM results {where}
+            GROUP BY {group_by}, task, metric ORDER BY value DESC LIMIT ?
+        """, params + [int(limit)]).fetchall()
+    return [dict(r) for r in rows]
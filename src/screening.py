@@ -0,0 +1,148 @@
+import random
+from statistics import NormalDist
+
+# Quick-screen mode: evaluate in growing increments, stop once the accuracy CI is narrow enough.
+# Each increment takes N documents per subtask from a seeded shuffle of that subtask (lm_eval
+# `samples=`), so the interval describes a random sample and increments nest. Where lm_eval
+# can't take explicit samples (the CLI runner, older releases) it falls back to --limit, the
+# first N documents in dataset order, and the record says so.
+SAMPLING = "seeded_shuffle"
+FIRST_N = "first_n"
+DEFAULTS = {
+    "ci_half_width": 0.03,  # Target half-width of the interval (0.03 = +/-3 points)
+    "confidence": 0.95,
+    "start": 16,            # Samples per subtask in the first increment
+    "growth": 2,            # Each increment multiplies the samples per subtask by this
+    "max_limit": 0,         # Cap on samples per subtask (0: keep going until the task is exhausted)
+    "seed": 1234            # Shuffle seed: reruns screen the same documents
+}
+
+# Preferred headline metric per task; otherwise the first metric lm_eval reports a stderr for
+PRIMARY_METRICS = ("acc", "exact_match", "acc_norm", "mc2", "f1")
+
+def get_config(job, options=None):
+    """Screening settings for a job (job `screen` field over the batch option), or None when off."""
+    raw = job.get("screen", (options or {}).get("screen"))
+    if not raw: return None
+    config = dict(DEFAULTS)
+    if isinstance(raw, dict): config.update({k: v for k, v in raw.items() if v is not None})
+    return config
+
+def get_limits(config):
+    """
+    Per-subtask sample limits of each increment. lm_eval applies --limit to every
+    subtask of a group, so each increment covers every subtask (e.g. each MMLU subject).
+    None means the whole task.
+    """
+    limit, cap = max(1, int(config["start"])), int(config["max_limit"] or 0)
+    while not cap or limit < cap:
+        yield limit
+        limit = max(limit + 1, int(limit * float(config["growth"])))
+    yield cap or None
+
+def _shuffled(subtask, n_docs, seed):
+    order = list(range(n_docs))
+    random.Random(f"{seed}:{subtask}").shuffle(order)
+    return order
+
+def get_samples(doc_counts, limit, seed):
+    """
+    lm_eval `samples` for an increment: {subtask: document indices}, the first `limit` of a
+    seeded shuffle of each subtask, so a larger increment extends the previous one.
+    None means the whole task.
+    """
+    if limit is None: return None
+    return {name: sorted(_shuffled(name, n, seed)[:limit]) for name, n in doc_counts.items()}
+
+def _leaves(data, task):
+    subtasks = data.get("group_subtasks", {}).get(task)
+    if not subtasks: return [task]
+    return [leaf for sub in subtasks for leaf in _leaves(data, sub)]
+
+def _to_float(value):
+    try: return float(value)
+    except (TypeError, ValueError): return None
+
+def _primary_metric(metrics):
+    keys = [k for k in metrics if "," in k and "_stderr" not in k]
+    for name in PRIMARY_METRICS:
+        for k in keys:
+            if k.split(",")[0] == name: return k
+    for k in keys:
+        metric, _, filt = k.partition(",")
+        if _to_float(metrics.get(f"{metric}_stderr,{filt}")) is not None: return k
+    return keys[0] if keys else None
+
+def measure(data, task, config):
+    """Headline metric, its confidence interval and the sample counts of one lm_eval result."""
+    metrics = data.get("results", {}).get(task, {})
+    key = _primary_metric(metrics)
+    counts = [data.get("n-samples", {}).get(leaf, {}) for leaf in _leaves(data, task)]
+    samples = sum(int(c.get("effective") or 0) for c in counts)
+    total = sum(int(c.get("original") or 0) for c in counts)
+
+    value = _to_float(metrics.get(key)) if key else None
+    stderr = None
+    if key:
+        metric, _, filt = key.partition(",")
+        stderr = _to_float(metrics.get(f"{metric}_stderr,{filt}"))  # "N/A" below two samples
+    z = NormalDist().inv_cdf(0.5 + float(config["confidence"]) / 2)
+    half = z * stderr if stderr is not None else None
+    return {
+        "metric": key, "value": value, "stderr": stderr, "confidence": float(config["confidence"]),
+        "ci_half_width": round(half, 5) if half is not None else None,
+        "ci_low": round(value - half, 5) if half is not None and value is not None else None,
+        "ci_high": round(value + half, 5) if half is not None and value is not None else None,
+        "samples": samples, "total_samples": total
+    }
+
+def is_exhausted(m):
+    return bool(m["total_samples"]) and m["samples"] >= m["total_samples"]
+
+def is_converged(m, config):
+    return m["ci_half_width"] is not None and m["ci_half_width"] <= float(config["ci_half_width"])
+
+def describe(task, m):
+    if m["value"] is None: return f"{task}: no metric reported ({m['samples']} samples)"
+    ci = f"+/-{m['ci_half_width']:.3f}" if m["ci_half_width"] is not None else "+/-?"
+    return (f"{task}: {m['metric']} {m['value']:.4f} {ci} ({m['confidence']:.0%} CI) "
+            f"on {m['samples']}/{m['total_samples'] or '?'} samples")
+
+def annotate(data, task, m, config, steps, sampling=SAMPLING):
+    """Stores the screening outcome next to the results, so it is never mistaken for a full run."""
+    data.setdefault("screening", {})[task] = dict(
+        m, target_ci_half_width=float(config["ci_half_width"]), steps=steps, sampling=sampling,
+        converged=is_converged(m, config), exhausted=is_exhausted(m)
+    )
+    if sampling == SAMPLING: data["screening"][task]["seed"] = config["seed"]
+    return data
+
+def run(evaluate, task, config, log=print, doc_counts=None):
+    """
+    Screens one task: `evaluate(limit, samples=None)` returns the lm_eval results of an
+    increment (None on failure). With `doc_counts` ({subtask: documents}) increments are
+    seeded random samples, else the first N documents. Returns the annotated results of
+    the last increment, or None.
+    """
+    sampling = SAMPLING if doc_counts else FIRST_N
+    steps, data, m = [], None, None
+    for limit in get_limits(config):
+        if not limit: log(f"[SCREEN] {task}: all documents...")
+        elif doc_counts: log(f"[SCREEN] {task}: {limit} random documents per subtask (seed {config['seed']})...")
+        else: log(f"[SCREEN] {task}: first {limit} documents per subtask...")
+        samples = get_samples(doc_counts, limit, config["seed"]) if doc_counts else None
+        data = evaluate(None, samples) if samples else evaluate(limit)
+        if data is None: return None
+        if samples:
+            # lm_eval's counts assume --limit: report the sampled documents
+            counts = data.setdefault("n-samples", {})
+            for name, indices in samples.items():
+                counts[name] = {"effective": len(indices), "original": doc_counts[name]}
+        previous = steps[-1]["samples"] if steps else None
+        m = measure(data, task, config)
+        steps.append({"limit": limit, "samples": m["samples"], "ci_half_width": m["ci_half_width"]})
+        # No new samples means the task ran out of documents (or lm_eval didn't report counts)
+        done = is_converged(m, config) or is_exhausted(m) or limit is None or m["samples"] == previous
+        log(f"[SCREEN] {describe(task, m)}" + (" - stopping." if done else " - continuing."))
+        if done: break
+    return annotate(data, task, m, config, steps, sampling)
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import statistics
+
+# Selectable next to the lm_eval tasks; handled by PocketBench itself
+SPEED_TASK = "pocketbench_speed"
+SPEED_VERSION = 1
+
+DEFAULT_SWEEP = {
+    "prompt_lengths": [128, 512],
+    "gen_tokens": 128,
+    "threads": [],          # Empty: the job's thread share
+    "batch_sizes": [512],   # llama.cpp n_batch (prompt processing chunk)
+    "warmup": 1,
+    "trials": 5
+}
+
+# Exit code of the speed process when llama-cpp-python is missing (retrying won't help)
+EXIT_UNAVAILABLE = 3
+
+def get_sweep(job, options, default_threads):
+    """Sweep settings: job `speed` field over batch `speed` option over defaults."""
+    sweep = dict(DEFAULT_SWEEP)
+    sweep.update((options or {}).get("speed") or {})
+    sweep.update(job.get("speed") or {})
+    if not sweep["threads"]: sweep["threads"] = [default_threads]
+    return sweep
+
+def build_command(repo_id, filename, sweep, output_file):
+    return [sys.executable, "-u", "-m", "src.speed_bench", "--repo", repo_id, "--file", filename,
+            "--sweep", json.dumps(sweep), "--output", output_file]
+
+# --- MEASUREMENT (speed process) ---
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+def _stats(values):
+    return {"median": round(statistics.median(values), 2), "p95": round(_percentile(values, 95), 2)}
+
+def _make_prompt(llm, n_tokens):
+    """Exactly n_tokens of filler text, as token ids."""
+    text = "The quick brown fox jumps over the lazy dog while the curious cat watches from the window. "
+    ids = llm.tokenize(text.encode("utf-8"), add_bos=False)
+    ids = (ids * (n_tokens // max(1, len(ids)) + 1))[:n_tokens - 1]
+    return [llm.token_bos()] + ids
+
+def _trial(llm, prompt, gen_tokens):
+    """One streamed completion: TTFT, prompt tok/s (prompt / TTFT) and generation tok/s."""
+    llm.reset() # No prefix-cache reuse between trials
+    start = time.perf_counter()
+    first, count = None, 0
+    for _ in llm.create_completion(prompt, max_tokens=gen_tokens, temperature=0.0, stream=True,
+                                   logit_bias={llm.token_eos(): float("-inf")}):
+        count += 1
+        if first is None: first = time.perf_counter()
+    end = time.perf_counter()
+    ttft = first - start
+    return {
+        "ttft_ms": ttft * 1000,
+        "pp_tps": len(prompt) / ttft,
+        "tg_tps": (count - 1) / (end - first) if count > 1 and end > first else 0.0
+    }
+
+def run_sweep(model_path, sweep, log=print):
+    from llama_cpp import Llama
+
+    results, configs = {}, []
+    max_prompt = max(sweep["prompt_lengths"])
+    for threads in sweep["threads"]:
+        for n_batch in sweep["batch_sizes"]:
+            llm = Llama(model_path=model_path, n_ctx=max_prompt + sweep["gen_tokens"] + 16,
+                        n_threads=int(threads), n_threads_batch=int(threads), n_batch=int(n_batch), verbose=False)
+            for n_prompt in sweep["prompt_lengths"]:
+                label = f"pl{n_prompt}_t{threads}_b{n_batch}"
+                prompt = _make_prompt(llm, int(n_prompt))
+                for _ in range(int(sweep["warmup"])): _trial(llm, prompt, sweep["gen_tokens"])
+                trials = [_trial(llm, prompt, sweep["gen_tokens"]) for _ in range(max(1, int(sweep["trials"])))]
+
+                # lm_eval-style "metric,filter" keys: the filter names the sweep point
+                for metric in ("pp_tps", "tg_tps", "ttft_ms"):
+                    for stat, value in _stats([t[metric] for t in trials]).items():
+                        results[f"{metric}_{stat},{label}"] = value
+                configs.append({"label": label, "prompt_tokens": int(n_prompt), "threads": int(threads),
+                                "n_batch": int(n_batch), "trials": len(trials)})
+                log(f"[SPEED] {label}: pp {results[f'pp_tps_median,{label}']:.1f} tok/s | "
+                    f"tg {results[f'tg_tps_median,{label}']:.1f} tok/s | TTFT {results[f'ttft_ms_median,{label}']:.0f} ms (median of {len(trials)})")
+            del llm
+
+    return {
+        "results": {SPEED_TASK: dict(results, alias=SPEED_TASK)},
+        "configs": {SPEED_TASK: {"sweep": sweep, "points": configs}},
+        "versions": {SPEED_TASK: SPEED_VERSION},
+        "higher_is_better": {SPEED_TASK: {"pp_tps": True, "tg_tps": True, "ttft_ms": False}}
+    }
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="PocketBench llama.cpp speed suite")
+    parser.add_argument("--repo", required=True)
+    parser.add_argument("--file", required=True)
+    parser.add_argument("--sweep", required=True)
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    try: import llama_cpp # noqa: F401
+    except ImportError:
+        print("[SPEED] The speed suite needs llama-cpp-python (pip install llama-cpp-python).", flush=True)
+        sys.exit(EXIT_UNAVAILABLE)
+
+    from huggingface_hub import hf_hub_download
+    model_path = hf_hub_download(repo_id=args.repo, filename=args.file)
+    sweep = json.loads(args.sweep)
+    print(f"[SPEED] {args.file}: prompts {sweep['prompt_lengths']} x threads {sweep['threads']} x n_batch "
+          f"{sweep['batch_sizes']}, {sweep['gen_tokens']} generated tokens, {sweep['warmup']} warmup + {sweep['trials']} trials", flush=True)
+    data = run_sweep(model_path, sweep, log=lambda text: print(text, flush=True))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f: json.dump(data, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import os
+import re
+import sys
+import time
+import tempfile
+import subprocess
+from contextlib import contextmanager
+
+# Cold-start accounting for the server. server.py imports this module first, so the
+# clock starts with the process; a summarised `-X importtime` profile is one call away.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Loaded on first use (Hub access, downloads, uploads); listed so /api/ready shows what is resident
+HEAVY_MODULES = ("huggingface_hub.hf_api", "huggingface_hub.file_download", "gradio_client", "requests")
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+_started = time.perf_counter()
+_started_at = time.time()
+_phases = []   # (name, ms) in startup order
+_ready = None
+
+@contextmanager
+def phase(name):
+    """Times one step of startup (imports, app setup, background workers)."""
+    start = time.perf_counter()
+    try: yield
+    finally: _phases.append((name, round((time.perf_counter() - start) * 1000, 1)))
+
+def mark_ready():
+    global _ready
+    if _ready is None: _ready = time.perf_counter()
+
+def is_ready():
+    return _ready is not None
+
+def report():
+    """Startup phases, time from process start to ready, and which heavy libraries are loaded by now."""
+    return {
+        "ready": is_ready(),
+        "ready_ms": round((_ready - _started) * 1000, 1) if _ready else None,
+        "uptime_s": round(time.time() - _started_at, 1),
+        "phases": [{"name": name, "ms": ms} for name, ms in _phases],
+        "loaded": [m for m in HEAVY_MODULES if m in sys.modules]
+    }
+
+def format_report(rep):
+    steps = ", ".join(f"{p['name']} {p['ms']:.0f} ms" for p in rep["phases"])
+    return f"Startup: ready in {rep['ready_ms']:.0f} ms ({steps})"
+
+# --- IMPORT PROFILE ---
+
+def import_profile(target="server", top=12):
+    """
+    Imports `target` in a fresh interpreter under `-X importtime` (in an empty temp dir)
+    and summarises it: total import time, self time per top-level package and the
+    slowest imports of the target's own modules.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    with tempfile.TemporaryDirectory(prefix="pb_importtime_") as work:
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {target}"],
+                              cwd=work, env=env, capture_output=True, text=True, timeout=300)
+        wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {target} failed: {proc.stderr.strip().splitlines()[-1:]}")
+
+    entries = []   # (depth, module, self_us, cumulative_us), children before their parent
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m: entries.append((len(m.group(3)) // 2, m.group(4), int(m.group(1)), int(m.group(2))))
+
+    packages = {}
+    for _, module, self_us, _ in entries:
+        name = module.split(".")[0]
+        packages[name] = packages.get(name, 0) + self_us
+    total_us = sum(cumulative for depth, _, _, cumulative in entries if depth == 0)
+    own = (target.split(".")[0], "src")
+    slowest = sorted((e for e in entries if e[1].split(".")[0] in own), key=lambda e: -e[3])
+    ms = lambda us: round(us / 1000, 1)
+    return {
+        "target": target,
+        "process_ms": round(wall_ms, 1),
+        "imports_ms": ms(total_us),
+        "modules": len(entries),
+        "packages": [{"package": name, "self_ms": ms(us)}
+                     for name, us in sorted(packages.items(), key=lambda kv: -kv[1])[:top]],
+        "slowest_own": [{"module": module, "cumulative_ms": ms(cumulative), "self_ms": ms(self_us)}
+                        for _, module, self_us, cumulative in slowest[:top]]
+    }
+
+def format_profile(profile):
+    lines = [f"import {profile['target']}: {profile['imports_ms']:.0f} ms in imports "
+             f"({profile['modules']} modules), {profile['process_ms']:.0f} ms for the whole process",
+             "", "Self time by package:"]
+    lines += [f"  {p['self_ms']:8.1f} ms  {p['package']}" for p in profile["packages"]]
+    lines += ["", f"Slowest {profile['target']} / src modules (cumulative, self):"]
+    lines += [f"  {m['cumulative_ms']:8.1f} ms {m['self_ms']:7.1f} ms  {m['module']}" for m in profile["slowest_own"]]
+    return "\n".join(lines)
@@ -0,0 +1,73 @@
+import os
+import gzip
+import hashlib
+import mimetypes
+import threading
+from flask import Response, abort, request, send_file
+from werkzeug.security import safe_join
+from werkzeug.http import http_date
+
+HTML_CACHE_CONTROL = "no-cache"                       # Pages always revalidate (a cheap 304 via the ETag)
+ASSET_CACHE_CONTROL = "public, max-age=3600"          # Asset URLs aren't fingerprinted: keep this short
+COMPRESSIBLE = (".html", ".js", ".css", ".svg", ".json", ".txt", ".map")
+MIN_COMPRESS_BYTES = 1024
+MAX_CACHED_BYTES = 4 * 1024 * 1024                    # Bigger files are streamed from disk as-is
+
+# path -> {"key", "body", "gzip", "etag", "mimetype", "mtime"}, rebuilt when the file changes
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _load(path, stat):
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _cache_lock: entry = _cache.get(path)
+    if entry and entry["key"] == key: return entry
+
+    with open(path, "rb") as f: body = f.read()
+    compress = path.endswith(COMPRESSIBLE) and len(body) >= MIN_COMPRESS_BYTES
+    entry = {
+        "key": key, "body": body, "mtime": stat.st_mtime,
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0) if compress else None, # Compressed once, not per request
+        "etag": hashlib.md5(body).hexdigest()[:16],
+        "mimetype": mimetypes.guess_type(path)[0] or "application/octet-stream"
+    }
+    with _cache_lock: _cache[path] = entry
+    return entry
+
+def preload(static_dir):
+    """Reads and gzips every cacheable file up front (server start); returns how many were loaded."""
+    count = 0
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            if stat.st_size > MAX_CACHED_BYTES: continue
+            _load(path, stat)
+            count += 1
+    return count
+
+def serve(static_dir, filename):
+    """
+    Serves a static file with Cache-Control, ETag / Last-Modified (304 on a match)
+    and a gzip body for clients that accept it. Bodies are compressed once per file
+    version: at startup by preload(), or on the first request for a changed file.
+    """
+    path = safe_join(static_dir, filename)
+    if not path or not os.path.isfile(path): abort(404)
+    stat = os.stat(path)
+    if stat.st_size > MAX_CACHED_BYTES: return send_file(path, conditional=True, max_age=3600)
+
+    entry = _load(path, stat)
+    use_gzip = entry["gzip"] is not None and "gzip" in request.headers.get("Accept-Encoding", "")
+    etag = entry["etag"] + ("-gz" if use_gzip else "")
+    headers = {
+        "Cache-Control": HTML_CACHE_CONTROL if path.endswith(".html") else ASSET_CACHE_CONTROL,
+        "ETag": f'"{etag}"',
+        "Last-Modified": http_date(entry["mtime"]),
+        "Vary": "Accept-Encoding"
+    }
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    response = Response(entry["gzip"] if use_gzip else entry["body"], mimetype=entry["mimetype"], headers=headers)
+    if use_gzip: response.headers["Content-Encoding"] = "gzip"
+    return response
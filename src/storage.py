@@ -1,35 +1,233 @@
 import os
 import json
+import time
 import hashlib
+import threading
+from . import results_db
 
 RESULTS_DIR = "local_results_db"
-os.makedirs(RESULTS_DIR, exist_ok=True)
+
+# Guards the read-merge-write cycle so concurrent saves never drop tasks
+_save_lock = threading.Lock()
 
 def get_model_id_hash(model_name):
     return hashlib.md5(model_name.encode()).hexdigest()[:8]
 
-def check_cache(unique_name, tasks):
-    model_hash = get_model_id_hash(unique_name)
-    filename = os.path.join(RESULTS_DIR, f"{model_hash}.json")
+def get_unique_name(repo_id, gguf_file, backend="hf"):
+    """Each evaluation backend gets its own record: llama.cpp and HF scores differ."""
+    name = f"{repo_id}_{gguf_file}"
+    return name if (backend or "hf") == "hf" else f"{name}__{backend}"
+
+def get_record_name(unique_name, limit=0, screen=False):
+    """Limited (smoke) and screened runs live in their own record so they never count as full runs."""
+    if screen: return f"{unique_name}__screen"
+    limit = int(limit or 0)
+    return unique_name if limit <= 0 else f"{unique_name}__limit{limit}"
+
+def get_result_path(unique_name, limit=0, screen=False):
+    model_hash = get_model_id_hash(get_record_name(unique_name, limit, screen))
+    return os.path.join(RESULTS_DIR, f"{model_hash}.json")
+
+def get_task_key(task, limit=0):
+    """Cache key for a single task run: task name + sample limit."""
+    return f"{task}|limit={int(limit or 0)}"
+
+def _load_record(filename):
     if not os.path.exists(filename): return None
     try:
-        with open(filename, 'r') as f: data = json.load(f)
-        saved_results = data.get("results", {})
-        missing = [t for t in tasks if t not in saved_results]
-        if not missing: return data
+        with open(filename, 'r') as f: return json.load(f)
     except: return None
+
+# --- TASK DEFINITIONS ---
+# A cached task is re-run when lm_eval's definition of it changed (YAML edits, new version)
+
+_task_manager = None   # lm_eval TaskManager, False when lm_eval is not importable here
+_task_signatures = {}  # task -> (time, {"version", "task_hash"} or None)
+SIGNATURE_TTL = 5 * 60  # YAML edits are picked up within this long
+
+def _get_task_manager():
+    global _task_manager
+    if _task_manager is None:
+        try:
+            from lm_eval.tasks import TaskManager
+            _task_manager = TaskManager()
+        except Exception as e:
+            print(f"Task definitions unavailable ({e}): cached tasks are not re-validated")
+            _task_manager = False
+    return _task_manager
+
+def get_task_signature(task):
+    """Version and definition hash of a task from its lm_eval YAML (no dataset is loaded). None if unknown."""
+    cached = _task_signatures.get(task)
+    if cached and time.time() - cached[0] < SIGNATURE_TTL: return cached[1]
+    signature = None
+    config = _load_task_config(task)
+    if config is not None: # Python-defined or unknown tasks have nothing to compare against
+        signature = {"version": (config.get("metadata") or {}).get("version"), "task_hash": _config_hash(config)}
+    _task_signatures[task] = (time.time(), signature)
+    return signature
+
+def _load_task_config(task):
+    """The task's (or group's) lm_eval YAML config, None if it has none or lm_eval isn't here."""
+    manager = _get_task_manager()
+    if not manager: return None
+    try:
+        from lm_eval.utils import load_yaml_config
+        yaml_path = manager.task_index[task]["yaml_path"]
+        if yaml_path and yaml_path != -1: return load_yaml_config(yaml_path, mode="simple")
+    except Exception: pass
+    return None
+
+def _members(task):
+    """(config, member entries) of a task; members is None for a plain task (not a group or tag)."""
+    entry = _get_task_manager().task_index.get(task) or {}
+    config = _load_task_config(task)
+    if entry.get("type") == "tag": return config, entry.get("task") or []
+    if config is not None and "group" in config and isinstance(config.get("task"), list): return config, config["task"]
+    return config, None
+
+def get_task_output_types(task, _depth=0):
+    """
+    lm_eval output types (generate_until, loglikelihood, multiple_choice...) a task runs,
+    with groups and tags expanded. None when any part of it can't be resolved from YAML.
+    """
+    manager = _get_task_manager()
+    if not manager or not isinstance(task, str) or _depth > 5: return None
+    config, members = _members(task)
+    if members is None:
+        return {config.get("output_type", "generate_until")} if config is not None else None # lm_eval's default
+
+    types = set()
+    for sub in members:
+        if isinstance(sub, dict) and sub.get("output_type"): found = {sub["output_type"]}
+        else: found = get_task_output_types(sub.get("task") if isinstance(sub, dict) else sub, _depth + 1)
+        if not found: return None
+        types |= found
+    return types or None
+
+def get_first_leaf(task, _depth=0):
+    """One evaluated subtask of a group or tag (e.g. an MMLU subject), the task itself if it is plain. None if unknown."""
+    manager = _get_task_manager()
+    if not manager or not isinstance(task, str) or _depth > 5: return None
+    config, members = _members(task)
+    if members is None: return task if config is not None or task in manager.task_index else None
+    for sub in members:
+        leaf = get_first_leaf(sub.get("task") if isinstance(sub, dict) else sub, _depth + 1)
+        if leaf: return leaf
     return None
 
-def save_result(unique_name, data, repo_id=None, gguf_file=None):
-    """Saves results locally AND adds metadata for the leaderboard."""
-    model_hash = get_model_id_hash(unique_name)
-    filename = os.path.join(RESULTS_DIR, f"{model_hash}.json")
-    
-    # Inject Metadata
-    if repo_id and gguf_file:
-        data["custom_repo_id"] = repo_id
-        data["custom_gguf_file"] = gguf_file
-    
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=4)
-    return filename
\ No newline at end of file
+def _same_version(a, b):
+    try: return float(a) == float(b)
+    except (TypeError, ValueError): return str(a) == str(b)
+
+def is_entry_current(entry, signature):
+    """False when the task's definition or version changed since its result was stored."""
+    if not signature: return True
+    if entry.get("task_hash") and signature.get("task_hash") and entry["task_hash"] != signature["task_hash"]: return False
+    if entry.get("version") is not None and signature.get("version") is not None:
+        return _same_version(entry["version"], signature["version"])
+    return True
+
+# --- CACHE LOOKUPS ---
+
+def get_cached_tasks(unique_name, tasks, limit=0, screen=False):
+    """
+    Returns the subset of `tasks` that already have stored results for this limit (or
+    screening), made with the task definition lm_eval has now.
+    """
+    if screen: limit = 0 # Screening picks its own sample counts
+    data = _load_record(get_result_path(unique_name, limit, screen))
+    if not data: return []
+    index = data.get("task_index", {})
+    saved_results = data.get("results", {})
+    # Legacy records have no index: trust them only when they were full runs
+    legacy_ok = not index and not data.get("config", {}).get("limit")
+    cached = []
+    for t in tasks:
+        entry = index.get(get_task_key(t, limit))
+        if entry is not None:
+            if is_entry_current(entry, get_task_signature(t)): cached.append(t)
+        elif legacy_ok and int(limit or 0) <= 0 and t in saved_results: cached.append(t)
+    return cached
+
+def get_missing_tasks(unique_name, tasks, limit=0, screen=False):
+    cached = set(get_cached_tasks(unique_name, tasks, limit, screen))
+    return [t for t in tasks if t not in cached]
+
+def check_cache(unique_name, tasks, limit=0, screen=False):
+    """Returns the stored record if every task is already evaluated, else None."""
+    if get_missing_tasks(unique_name, tasks, limit, screen): return None
+    return _load_record(get_result_path(unique_name, 0 if screen else limit, screen))
+
+def _config_hash(config):
+    if not config: return None
+    raw = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.md5(raw.encode()).hexdigest()[:8]
+
+# Per-task sections of an lm_eval output (everything else is run-level)
+TASK_SECTIONS = ("results", "groups", "group_subtasks", "configs", "versions",
+                 "n-shot", "higher_is_better", "n-samples", "screening")
+
+def _merge_results(old, new):
+    """Merges per-task sections of an lm_eval output into an existing record."""
+    merged = dict(old)
+    for k, v in new.items():
+        if k in TASK_SECTIONS and isinstance(v, dict):
+            merged[k] = {**old.get(k, {}), **v}
+        else:
+            # Run-level fields (config, timings, git hash...) reflect the latest run
+            merged[k] = v
+    merged["task_index"] = dict(old.get("task_index", {}))
+    return merged
+
+def save_result(unique_name, data, repo_id=None, gguf_file=None, tasks=None, limit=0, backend=None, telemetry=None,
+                screen=False):
+    """Merges results into the local record AND adds metadata for the leaderboard."""
+    if screen: limit = 0
+    filename = get_result_path(unique_name, limit, screen)
+
+    with _save_lock:
+        old = _load_record(filename) or {}
+        merged = _merge_results(old, data)
+
+        # Legacy full-run records predate the index: keep their tasks cached
+        if old and "task_index" not in old and not old.get("config", {}).get("limit") and int(limit or 0) <= 0:
+            for t in old.get("results", {}):
+                merged["task_index"][get_task_key(t)] = {"task": t, "limit": 0, "version": None, "config_hash": None}
+
+        # Index the tasks this run covered so later batches can skip them
+        configs = data.get("configs", {})
+        versions = data.get("versions", {})
+        for t in (tasks or data.get("results", {}).keys()):
+            signature = get_task_signature(t) or {}
+            merged["task_index"][get_task_key(t, limit)] = {
+                "task": t,
+                "limit": int(limit or 0),
+                "version": versions.get(t, signature.get("version")),
+                "config_hash": _config_hash(configs.get(t)),
+                "task_hash": signature.get("task_hash")
+            }
+
+        # Inject Metadata
+        if repo_id and gguf_file:
+            merged["custom_repo_id"] = repo_id
+            merged["custom_gguf_file"] = gguf_file
+        if backend:
+            merged["custom_backend"] = backend
+        if screen:
+            merged["custom_screened"] = True
+        # Resource usage per task ({task: summary}), kept across runs like the results
+        if telemetry:
+            merged["telemetry"] = {**old.get("telemetry", {}), **telemetry}
+
+        # Atomic write: readers never see a half-written record
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        tmp_path = f"{filename}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(merged, f, indent=4)
+        os.replace(tmp_path, filename)
+
+        # Keep the query index in step (the JSON file stays the source of truth)
+        try: results_db.index_record(filename, merged)
+        except Exception as e: print(f"Results index error: {e}")
+    return filename
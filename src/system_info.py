@@ -20,12 +20,27 @@ def get_device_info():
     except Exception:
         return {"display": "System Info Unavailable", "ram_total": 0}
 
-def check_memory_compatibility(file_size_bytes):
+def get_free_resources():
+    """Returns currently available RAM (bytes) and logical cores, used for job admission."""
     try:
+        return {
+            "ram_available": psutil.virtual_memory().available,
+            "cpu_logical": psutil.cpu_count(logical=True) or 1
+        }
+    except Exception:
+        return {"ram_available": 0, "cpu_logical": 1}
+
+def check_memory_compatibility(file_size_bytes, required_bytes=None):
+    """Label + color for a model: its predicted peak RAM (when known) or its file size against total RAM."""
+    try:
+        sys_ram = psutil.virtual_memory().total / (1024 ** 3)
+        if required_bytes:
+            need_gb = required_bytes / (1024 ** 3)
+            if need_gb > (sys_ram - 2): return f"Needs ~{need_gb:.1f} GB RAM", "red"
+            return f"Compatible (~{need_gb:.1f} GB peak)", "green"
+
         if not file_size_bytes: return "", "gray"
         size_gb = file_size_bytes / (1024 ** 3)
-        sys_ram = psutil.virtual_memory().total / (1024 ** 3)
-        
         if size_gb > (sys_ram - 2):
             return f"High Memory Usage ({size_gb:.1f} GB)", "red"
         else:
@@ -0,0 +1,129 @@
+import time
+import threading
+import psutil
+
+SAMPLE_INTERVAL = 2.0   # Seconds between process-tree samples
+
+def _new_window():
+    return {"start": time.time(), "samples": 0, "cpu_sum": 0.0, "cpu_peak": 0.0,
+            "rss_sum": 0, "rss_peak": 0, "read_bytes": 0}
+
+def _summary(window):
+    n = window["samples"]
+    return {
+        "wall_seconds": round(time.time() - window["start"], 2),
+        "cpu_percent_avg": round(window["cpu_sum"] / n, 1) if n else None,  # 100 = one core
+        "cpu_percent_peak": round(window["cpu_peak"], 1),
+        "rss_avg_bytes": int(window["rss_sum"] / n) if n else None,
+        "rss_peak_bytes": window["rss_peak"],
+        "disk_read_bytes": window["read_bytes"],
+        "samples": n
+    }
+
+def _collect(sampler):
+    """One sample of every process the job currently owns (roots + descendants)."""
+    procs = sampler["procs"]
+    roots = set(pid for pid in sampler["get_pids"]() if pid)
+    live = {}
+    for pid in roots:
+        try:
+            root = procs.get(pid) or psutil.Process(pid)
+            live[pid] = root
+            for child in root.children(recursive=True):
+                live[child.pid] = procs.get(child.pid) or child
+        except psutil.Error:
+            continue
+
+    cpu, rss, reads = 0.0, 0, {}
+    for pid, p in live.items():
+        try:
+            cpu += p.cpu_percent(None)  # First call for a process primes the counter (returns 0)
+            rss += p.memory_info().rss
+            counters = p.io_counters() if hasattr(p, "io_counters") else None
+        except psutil.Error:
+            reads[pid] = sampler["read_last"].get(pid, 0)
+            continue
+        if counters is None: continue
+        # Long-lived roots (e.g. a reused worker) carry earlier jobs' reads: count from first sight
+        if pid not in sampler["read_base"]:
+            sampler["read_base"][pid] = counters.read_bytes if pid in roots else 0
+        reads[pid] = counters.read_bytes - sampler["read_base"][pid]
+
+    # Processes that exited keep the reads measured before they went away
+    sampler["read_done"] += sum(v for pid, v in sampler["read_last"].items() if pid not in reads)
+    sampler["read_last"] = reads
+    sampler["procs"] = live
+    return cpu, rss, sum(reads.values())
+
+def _record(sampler, cpu, rss, read):
+    total_read = sampler["read_done"] + read
+    with sampler["lock"]:
+        for window in (sampler["job"], sampler["task"]):
+            window["samples"] += 1
+            window["cpu_sum"] += cpu
+            window["cpu_peak"] = max(window["cpu_peak"], cpu)
+            window["rss_sum"] += rss
+            window["rss_peak"] = max(window["rss_peak"], rss)
+        sampler["task"]["read_bytes"] += total_read - sampler["job"]["read_bytes"]
+        sampler["job"]["read_bytes"] = total_read
+
+def _loop(sampler, interval):
+    while not sampler["stop"].wait(interval):
+        try: cpu, rss, read = _collect(sampler)
+        except Exception as e:
+            print(f"Telemetry sample error: {e}")
+            continue
+        if not sampler["procs"]: continue # Between retries: nothing to measure
+        _record(sampler, cpu, rss, read)
+        if sampler["on_sample"]:
+            sampler["on_sample"]({
+                "elapsed": round(time.time() - sampler["job"]["start"], 1),
+                "cpu_percent": round(cpu, 1),
+                "rss_bytes": rss,
+                "disk_read_bytes": sampler["job"]["read_bytes"],
+                "processes": len(sampler["procs"])
+            })
+
+def start(get_pids, on_sample=None, interval=None):
+    """
+    Samples the process trees rooted at `get_pids()` every `interval` seconds.
+    `on_sample(sample)` receives each live sample; `stop()` returns the summary.
+    """
+    sampler = {
+        "get_pids": get_pids, "on_sample": on_sample, "procs": {},
+        "read_base": {}, "read_last": {}, "read_done": 0,
+        "job": _new_window(), "task": _new_window(), "tasks": {},
+        "lock": threading.Lock(), "stop": threading.Event()
+    }
+    sampler["thread"] = threading.Thread(target=_loop, args=(sampler, interval or SAMPLE_INTERVAL), daemon=True)
+    sampler["thread"].start()
+    return sampler
+
+def begin_task(sampler):
+    """Restarts the current task window, e.g. when a retry starts over."""
+    with sampler["lock"]: sampler["task"] = _new_window()
+
+def mark_task(sampler, task):
+    """Closes the current task window (wall time + usage since the last mark) and returns it."""
+    with sampler["lock"]:
+        summary = _summary(sampler["task"])
+        sampler["tasks"][task] = summary
+        sampler["task"] = _new_window()
+    return summary
+
+def stop(sampler):
+    sampler["stop"].set()
+    sampler["thread"].join(timeout=5)
+    with sampler["lock"]:
+        summary = _summary(sampler["job"])
+        summary["tasks"] = dict(sampler["tasks"])
+    return summary
+
+def format_summary(summary):
+    gb = 1024 ** 3
+    parts = [f"wall {summary['wall_seconds']:.0f}s"]
+    if summary["samples"]:
+        parts.append(f"CPU avg {summary['cpu_percent_avg']:.0f}% (peak {summary['cpu_percent_peak']:.0f}%)")
+        parts.append(f"RSS avg {summary['rss_avg_bytes'] / gb:.2f} GB (peak {summary['rss_peak_bytes'] / gb:.2f} GB)")
+        parts.append(f"disk read {summary['disk_read_bytes'] / gb:.2f} GB")
+    return " | ".join(parts)
@@ -0,0 +1,165 @@
+import os
+import time
+import random
+import sqlite3
+import threading
+from datetime import datetime
+from . import hf_utils
+
+OUTBOX_DB = "upload_outbox.db"
+
+# Backoff: BASE * 2**attempt seconds (capped), scaled by 50-150% jitter
+BACKOFF_BASE = 5
+BACKOFF_MAX = 30 * 60
+MAX_ATTEMPTS = 8
+DRAIN_BATCH = 20   # Due uploads per pass: the Space takes one file per call, all over one client
+
+_db_lock = threading.Lock()
+_wake = threading.Event()
+_worker = None
+_client = None
+
+# --- DATABASE ---
+
+def _connect():
+    conn = sqlite3.connect(OUTBOX_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def init_db():
+    with _db_lock, _connect() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                path TEXT PRIMARY KEY,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                next_attempt REAL,
+                last_error TEXT,
+                response TEXT,
+                created TEXT,
+                updated TEXT
+            )
+        """)
+        # Bumped on every enqueue: an upload only settles the version it sent
+        columns = [r["name"] for r in conn.execute("PRAGMA table_info(outbox)")]
+        if "version" not in columns: conn.execute("ALTER TABLE outbox ADD COLUMN version INTEGER DEFAULT 0")
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+def enqueue_upload(json_path):
+    """Adds a saved result to the outbox (re-queues it if it was already sent)."""
+    init_db()
+    path = os.path.abspath(json_path)
+    with _db_lock, _connect() as conn:
+        conn.execute("""
+            INSERT INTO outbox (path, status, attempts, next_attempt, created, updated)
+            VALUES (?, 'pending', 0, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET status = 'pending', attempts = 0, version = version + 1,
+                next_attempt = excluded.next_attempt, last_error = NULL, updated = excluded.updated
+        """, (path, time.time(), _now(), _now()))
+    ensure_worker()
+    _wake.set()
+    return get_depth()
+
+def retry_failed(json_path=None):
+    """Moves failed uploads (or one of them) back to pending."""
+    init_db()
+    with _db_lock, _connect() as conn:
+        if json_path:
+            cur = conn.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = ? WHERE path = ?",
+                               (time.time(), os.path.abspath(json_path)))
+        else:
+            cur = conn.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = ? WHERE status = 'failed'",
+                               (time.time(),))
+        count = cur.rowcount
+    ensure_worker()
+    _wake.set()
+    return count
+
+def get_depth():
+    init_db()
+    with _db_lock, _connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM outbox WHERE status = 'pending'").fetchone()[0]
+
+def get_status(limit=50):
+    init_db()
+    with _db_lock, _connect() as conn:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        items = conn.execute(
+            "SELECT path, status, attempts, next_attempt, last_error, response, updated FROM outbox ORDER BY updated DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+    return {
+        "depth": counts.get("pending", 0),
+        "counts": counts,
+        "worker_alive": bool(_worker and _worker.is_alive()),
+        "items": [dict(r) for r in items]
+    }
+
+def _backoff(attempts):
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempts)) * random.uniform(0.5, 1.5)
+
+# --- WORKER ---
+
+def _get_client():
+    """One Gradio client for the whole process; rebuilt only after a failure."""
+    global _client
+    if _client is None: _client = hf_utils.get_submission_client()
+    return _client
+
+def _due_items():
+    with _db_lock, _connect() as conn:
+        return conn.execute(
+            "SELECT path, attempts, version FROM outbox WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+            (time.time(), DRAIN_BATCH)
+        ).fetchall()
+
+def _next_due_in():
+    with _db_lock, _connect() as conn:
+        row = conn.execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'pending'").fetchone()
+    return None if row[0] is None else max(0, row[0] - time.time())
+
+def _upload_one(path, attempts, version=0):
+    """Sends one record. Returns True once it is done (False if it failed or changed meanwhile)."""
+    global _client
+    if not os.path.exists(path):
+        status, error, response, next_attempt = "failed", "Result file missing", None, None
+    else:
+        try:
+            response = str(hf_utils.submit_result_to_leaderboard(path, client=_get_client()))
+            status, error, next_attempt = "done", None, None
+        except Exception as e:
+            _client = None # Reconnect on the next attempt
+            attempts += 1
+            response, error = None, str(e)
+            if attempts >= MAX_ATTEMPTS: status, next_attempt = "failed", None
+            else: status, next_attempt = "pending", time.time() + _backoff(attempts)
+            print(f"Upload failed ({os.path.basename(path)}, attempt {attempts}): {e}")
+
+    with _db_lock, _connect() as conn:
+        # Re-enqueued while in flight (e.g. another task merged into the record): keep the newer one pending
+        cur = conn.execute(
+            "UPDATE outbox SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, response = ?, updated = ? "
+            "WHERE path = ? AND version = ?",
+            (status, attempts, next_attempt, error, response, _now(), path, version)
+        )
+    return status == "done" and cur.rowcount == 1
+
+def _worker_loop():
+    while True:
+        items = _due_items()
+        for row in items:
+            _upload_one(row["path"], row["attempts"], row["version"])
+        if items: continue
+        wait = _next_due_in()
+        _wake.wait(60 if wait is None else min(wait, 60))
+        _wake.clear()
+
+def ensure_worker():
+    """Starts the background uploader (once). Pending uploads from earlier runs drain first."""
+    global _worker
+    if _worker and _worker.is_alive(): return
+    init_db()
+    _worker = threading.Thread(target=_worker_loop, name="pocketbench-uploader", daemon=True)
+    _worker.start()
@@ -70,7 +70,9 @@ function startBenchmark() {
     const jobs = batchQueue.map(item => ({
         repo_id: item.repo_id,
         filename: item.filename,
+        size_bytes: item.size_bytes || 0,
         tasks: Array.from(selectedTasks),
+        backend: settings.backend,
         limit: 0 
     }));
 
@@ -79,28 +81,39 @@ function startBenchmark() {
         headers: {'Content-Type': 'application/json'},
         body: JSON.stringify({
             jobs: jobs,
-            batch: parseInt(settings.batch_size),
+            batch: settings.batch_size === 'auto' ? 'auto' : parseInt(settings.batch_size),
             device: settings.device,
+            parallel: settings.parallel,
+            prefetch: settings.cache !== 'off',
+            evict_after: settings.cache === 'evict',
+            threads: settings.threads,
+            n_ctx: parseInt(settings.n_ctx),
+            screen: settings.screen === 'off' ? null : {ci_half_width: parseFloat(settings.screen)},
+            dispatch: settings.dispatch,
             verbosity: settings.verbosity
         })
     }).then(response => {
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        let pendingText = ''; // Frames can span several network chunks
         function read() {
             reader.read().then(({done, value}) => {
                 if (done) { stopBenchmarkUI(); return; }
-                const text = decoder.decode(value);
-                const lines = text.split('\n\n');
+                pendingText += decoder.decode(value, {stream: true});
+                const lines = pendingText.split('\n\n');
+                pendingText = lines.pop();
                 lines.forEach(line => {
                     if(line.startsWith('data: ')) {
                         try {
                             const data = JSON.parse(line.substring(6));
+                            if (data.batch_id) activeBatchId = data.batch_id;
                             if (data.start_info && data.start_info.log_file) activeLogFilename = data.start_info.log_file;
                             if(data.log) { 
                                 logsEl.innerText += data.log; 
                                 // Smart scroll
                                 if(logsEl.scrollHeight - logsEl.scrollTop < 600) logsEl.scrollTop = logsEl.scrollHeight; 
                             }
+                            if(data.telemetry) renderTelemetry(data.telemetry);
                             if(data.done) stopBenchmarkUI();
                         } catch(e) {}
                     }
@@ -112,6 +125,15 @@ function startBenchmark() {
     });
 }
 
+// Live resource usage of running jobs (separate from the log text)
+function renderTelemetry(samples) {
+    const el = document.getElementById('term-telemetry');
+    el.innerText = Object.values(samples).filter(s => !s.final).map(s =>
+        `J${s.job}: CPU ${Math.round(s.cpu_percent)}% | RSS ${(s.rss_bytes / 1073741824).toFixed(2)} GB` +
+        (s.cache ? ` | Cache ${Math.round(s.cache.hit_ratio * 100)}%` : '')
+    ).join('   ');
+}
+
 function stopBenchmark() {
     fetch('/api/stop', {method: 'POST'}).then(r => r.json()).then(d => { showToast(d.msg, d.status); stopBenchmarkUI(); });
 }
@@ -128,8 +150,7 @@ async function syncTerminal() {
     if (!activeLogFilename) { showToast("No active log file", "error"); return; }
     logsEl.innerText += "\n[SYSTEM] Syncing with server logs...\n";
     try {
-        const res = await fetch(`/api/logs_content?filename=${activeLogFilename}`);
-        const text = await res.text();
+        const text = await syncLogTail(activeLogFilename);
         if (text) { logsEl.innerText = text; logsEl.scrollTop = logsEl.scrollHeight; showToast("Terminal Synced", "success"); }
     } catch (e) { logsEl.innerText += "\n[ERROR] Sync failed.\n"; }
 }
\ No newline at end of file
@@ -4,6 +4,13 @@ var selectedTasks = new Set(['mmlu']);
 var isRunning = false;
 var availableTasks = [];
 var activeLogFilename = null;
+var activeBatchId = null; // Queue batch the terminal is attached to
+
+// Log tailing: only bytes after the last synced offset are fetched
+var syncedLogFile = null;
+var syncedLogOffset = null;
+var syncedLogText = '';
+var historyLog = null; // {filename, start} of the log page shown from History
 
 // The Cart
-var batchQueue = []; // Array of {repo_id, filename, tags, size}
\ No newline at end of file
+var batchQueue = []; // Array of {repo_id, filename, tags, size, size_bytes}
\ No newline at end of file
@@ -3,15 +3,29 @@ function openLogHistory() {
     fetchLogHistory();
 }
 
-async function fetchLogHistory() {
+// Paged listing from the log index; the search box filters by log contents
+const historyPage = { offset: 0, limit: 50 };
+
+async function fetchLogHistory(append = false) {
     const container = document.getElementById('history-list');
-    container.innerHTML = '<div style="padding:20px;text-align:center;color:#666">Loading history...</div>';
+    const query = document.getElementById('history-search').value.trim();
+    if (!append) {
+        historyPage.offset = 0;
+        container.innerHTML = '<div style="padding:20px;text-align:center;color:#666">Loading history...</div>';
+    }
     try {
-        const res = await fetch('/api/logs_list');
-        const logs = await res.json();
-        container.innerHTML = '';
-        if (logs.length === 0) { container.innerHTML = '<div class="empty-state">No logs found.</div>'; return; }
-        logs.forEach(log => {
+        const params = new URLSearchParams({ offset: historyPage.offset, limit: historyPage.limit });
+        if (query) params.set('q', query);
+        const res = await fetch('/api/logs_list?' + params);
+        const page = await res.json();
+        if (page.status !== 'success') throw new Error(page.msg);
+        if (!append) container.innerHTML = '';
+        const more = document.getElementById('history-more');
+        if (more) more.remove();
+        if (page.total === 0) { container.innerHTML = '<div class="empty-state">No logs found.</div>'; return; }
+        page.rows.forEach(log => {
+            const failures = (log.outcomes.FAILURE || 0) + (log.outcomes.CRITICAL || 0);
+            const badge = log.status === 'running' ? 'Running' : failures ? `${failures} failed` : '';
             const div = document.createElement('div');
             div.className = 'list-item';
             div.style.flexDirection = 'column'; div.style.alignItems = 'flex-start'; div.style.gap = '8px';
@@ -25,11 +39,30 @@ async function fetchLogHistory() {
                         <button class="small-btn" style="background:rgba(255,46,46,0.15); color:#ff2e2e; padding:4px 8px;" onclick="deleteLog('${log.filename}')">×</button>
                     </div>
                 </div>
+                <div style="width:100%; font-size:11px; color:#888; overflow:hidden; text-overflow:ellipsis; white-space:nowrap;">
+                    ${log.models.length} model(s): ${log.models.slice(0, 3).join(', ')}${log.models.length > 3 ? '...' : ''}
+                </div>
                 <div style="width:100%; display:flex; justify-content:space-between; font-size:11px; color:#666;">
-                    <span>${log.date}</span><span>${log.size}</span>
+                    <span>${log.date}${badge ? ' · ' + badge : ''}</span><span>${log.size}</span>
                 </div>`;
+            if (log.snippet) {
+                const snip = document.createElement('div');
+                snip.style.cssText = 'width:100%; font-size:11px; color:#aaa; font-family:monospace; white-space:pre-wrap;';
+                snip.innerText = log.snippet; // Matches are wrapped in [[ ]]
+                div.appendChild(snip);
+            }
             container.appendChild(div);
         });
+        historyPage.offset += page.rows.length;
+        if (historyPage.offset < page.total) {
+            const btn = document.createElement('button');
+            btn.id = 'history-more';
+            btn.className = 'small-btn';
+            btn.style.margin = '10px auto';
+            btn.innerText = `Load more (${page.total - historyPage.offset} left)`;
+            btn.onclick = () => fetchLogHistory(true);
+            container.appendChild(btn);
+        }
     } catch (e) { container.innerHTML = '<div class="empty-state">Error loading history.</div>'; }
 }
 
@@ -47,12 +80,34 @@ async function viewLog(filename) {
     logsEl.innerText = "Fetching content...";
     
     try {
-        const res = await fetch(`/api/logs_content?filename=${filename}`);
-        logsEl.innerText = await res.text();
+        // Last page only; older pages load when scrolling to the top
+        const res = await fetch(`/api/logs_range?filename=${encodeURIComponent(filename)}`);
+        const page = await res.json();
+        if (page.status !== 'success') { logsEl.innerText = "Error reading log."; return; }
+        historyLog = { filename: filename, start: page.start, loading: false };
+        logsEl.innerText = page.data;
         logsEl.scrollTop = logsEl.scrollHeight;
+        logsEl.onscroll = loadEarlierLog;
     } catch (e) { logsEl.innerText = "Error reading log."; }
 }
 
+// Paging back through history
+async function loadEarlierLog() {
+    const logsEl = document.getElementById('logs');
+    if (!historyLog || historyLog.loading || historyLog.start <= 0 || logsEl.scrollTop > 0) return;
+    historyLog.loading = true;
+    try {
+        const res = await fetch(`/api/logs_range?filename=${encodeURIComponent(historyLog.filename)}&end=${historyLog.start}`);
+        const page = await res.json();
+        if (page.status === 'success') {
+            const prevHeight = logsEl.scrollHeight;
+            logsEl.innerText = page.data + logsEl.innerText;
+            logsEl.scrollTop = logsEl.scrollHeight - prevHeight; // Keep the reader's place
+            historyLog.start = page.start;
+        }
+    } finally { historyLog.loading = false; }
+}
+
 async function deleteLog(filename) {
     if (!confirm("Delete this log?")) return;
     try {
@@ -35,7 +35,8 @@ function renderUnifiedRow(item) {
     const safeSize = (item.size_str || '').replace(/'/g, "\\'");
     
     // Click on text adds to queue (if valid)
-    const clickAction = !isJunk ? `addToQueue('${safeRepo}', '${safeFile}', '${safeTags}', '${safeSize}', null)` : '';
+    const sizeBytes = item.size_bytes || 0;
+    const clickAction = !isJunk ? `addToQueue('${safeRepo}', '${safeFile}', '${safeTags}', '${safeSize}', null, ${sizeBytes})` : '';
 
     // Generate unique ID for button to ensure we can find it later
     const btnId = `btn-${safeFile.replace(/[^a-zA-Z0-9]/g, '_')}`;
@@ -58,7 +59,7 @@ function renderUnifiedRow(item) {
             ${!isJunk ? `
                 <button id="${btnId}" class="icon-btn add-btn" 
                     style="${inQueue ? 'color:var(--bg-color); background:var(--accent); border-color:var(--accent);' : ''}"
-                    onclick="event.stopPropagation(); addToQueue('${safeRepo}', '${safeFile}', '${safeTags}', '${safeSize}', this)">
+                    onclick="event.stopPropagation(); addToQueue('${safeRepo}', '${safeFile}', '${safeTags}', '${safeSize}', this, ${sizeBytes})">
                     ${inQueue ? '✓' : '+'}
                 </button>
             ` : ''}
@@ -127,6 +128,7 @@ async function selectRepo(repoId) {
                 filename: f.name,
                 tags: f.tags,
                 size_str: f.size_str,
+                size_bytes: f.size_bytes,
                 revision: null,
                 path: null
             };
@@ -161,7 +163,7 @@ async function fetchLocalModels() {
 
 // --- CART / QUEUE LOGIC ---
 
-function addToQueue(repoId, filename, tags, size, btnElement) {
+function addToQueue(repoId, filename, tags, size, btnElement, sizeBytes) {
     // 1. Check if exists in queue
     const index = batchQueue.findIndex(item => item.filename === filename && item.repo_id === repoId);
     
@@ -181,7 +183,7 @@ function addToQueue(repoId, filename, tags, size, btnElement) {
         showToast("Removed from Cart");
     } else {
         // ADD to Queue
-        batchQueue.push({ repo_id: repoId, filename: filename, tags: tags, size: size });
+        batchQueue.push({ repo_id: repoId, filename: filename, tags: tags, size: size, size_bytes: sizeBytes || 0 });
         if(btn) {
             btn.innerText = "✓";
             btn.style.color = "var(--bg-color)"; 
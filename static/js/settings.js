@@ -1,7 +1,14 @@
 // Default Settings
 const defaultSettings = {
     device: 'auto',      // auto, cuda, mps, cpu
-    batch_size: '1',     // 1, 2, 4, 8, 16
+    batch_size: '1',     // auto, 1, 2, 4, 8, 16
+    parallel: 'auto',    // auto, 1, 2, 4, 8
+    cache: 'prefetch',   // prefetch, evict, off
+    backend: 'hf',       // hf, llamacpp
+    threads: 'auto',     // llama.cpp threads
+    n_ctx: '2048',       // llama.cpp context size
+    screen: 'off',       // off, or the target CI half-width of a quick screen
+    dispatch: 'auto',    // auto, local, agents
     verbosity: 'INFO'    // INFO, WARNING, ERROR
 };
 
@@ -17,6 +24,13 @@ function saveSettings() {
     const settings = {
         device: document.getElementById('setting-device').value,
         batch_size: document.getElementById('setting-batch').value,
+        parallel: document.getElementById('setting-parallel').value,
+        cache: document.getElementById('setting-cache').value,
+        backend: document.getElementById('setting-backend').value,
+        threads: document.getElementById('setting-threads').value,
+        n_ctx: document.getElementById('setting-nctx').value,
+        screen: document.getElementById('setting-screen').value,
+        dispatch: document.getElementById('setting-dispatch').value,
         verbosity: document.getElementById('setting-verbosity').value
     };
     localStorage.setItem('pocketbench_settings', JSON.stringify(settings));
@@ -29,6 +43,13 @@ function loadSettingsUI() {
     const current = getSettings();
     document.getElementById('setting-device').value = current.device;
     document.getElementById('setting-batch').value = current.batch_size;
+    document.getElementById('setting-parallel').value = current.parallel;
+    document.getElementById('setting-cache').value = current.cache;
+    document.getElementById('setting-backend').value = current.backend;
+    document.getElementById('setting-threads').value = current.threads;
+    document.getElementById('setting-nctx').value = current.n_ctx;
+    document.getElementById('setting-screen').value = current.screen;
+    document.getElementById('setting-dispatch').value = current.dispatch;
     document.getElementById('setting-verbosity').value = current.verbosity;
 }
 
@@ -31,6 +31,23 @@ function fetchSystemInfo() {
 
 // --- TERMINAL LOGIC ---
 
+// Fetches only new log bytes since the last sync and returns the full text
+async function syncLogTail(filename) {
+    if (syncedLogFile !== filename) { syncedLogFile = filename; syncedLogOffset = null; syncedLogText = ''; }
+    let more = true;
+    while (more) {
+        const offsetParam = syncedLogOffset === null ? '' : `&offset=${syncedLogOffset}`;
+        const res = await fetch(`/api/logs_tail?filename=${encodeURIComponent(filename)}${offsetParam}`);
+        const chunk = await res.json();
+        if (chunk.status !== 'success') break;
+        if (syncedLogOffset === null && chunk.start > 0) syncedLogText = '[... earlier output: open this log from History ...]\n';
+        syncedLogText += chunk.data;
+        syncedLogOffset = chunk.offset;
+        more = chunk.more;
+    }
+    return syncedLogText;
+}
+
 async function toggleTerminal() {
     const modal = document.getElementById('terminal-modal');
     const overlay = document.getElementById('terminal-overlay');
@@ -46,15 +63,15 @@ async function toggleTerminal() {
         modal.classList.add('open');
         if(overlay) overlay.classList.add('visible');
         
-        // Reset title
+        // Reset title (and leave History paging mode)
         if(headerTitle) headerTitle.innerText = "Terminal Output";
+        historyLog = null;
 
         // Auto-Refresh Logic
         if (window.activeLogFilename) {
             logsEl.innerText = "Syncing latest logs...\n";
             try {
-                const res = await fetch(`/api/logs_content?filename=${window.activeLogFilename}`);
-                const text = await res.text();
+                const text = await syncLogTail(window.activeLogFilename);
                 if (text) {
                     logsEl.innerText = text;
                     logsEl.scrollTop = logsEl.scrollHeight;
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src import log_index, results_db, storage
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """PocketBench keeps its state files relative to the working directory: start each test empty."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(results_db, "_initialized", False)
+    monkeypatch.setattr(results_db, "_imported", False)
+    monkeypatch.setattr(log_index, "_initialized", False)
+    monkeypatch.setattr(log_index, "_imported", False)
+    monkeypatch.setattr(storage, "_task_signatures", {})
+    monkeypatch.setattr(storage, "_task_manager", False) # No lm_eval here: tests set signatures themselves
+    return tmp_path
@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+import socket
+import subprocess
+
+import pytest
+import requests
+
+from conftest import ROOT
+import server
+from src import agents, system_info, backend
+
+TOKEN = "s3cret"
+
+STUB = r'''#!/usr/bin/env python3
+import sys, os, json, time
+args = sys.argv
+out = args[args.index("--output_path") + 1]
+tasks = args[args.index("--tasks") + 1].split(",")
+print("stub evaluating", flush=True)
+time.sleep(float(os.environ.get("STUB_SECONDS", "2")))
+os.makedirs(os.path.join(out, "stub"), exist_ok=True)
+with open(os.path.join(out, "stub", "results.json"), "w") as f:
+    json.dump({"results": {t: {"acc,none": 0.5} for t in tasks}, "config": {"limit": None}}, f)
+'''
+
+@pytest.fixture
+def client(workdir, monkeypatch):
+    monkeypatch.setattr(server, "AGENT_TOKEN", TOKEN)
+    monkeypatch.setattr(agents, "_agents", {})
+    monkeypatch.setattr(server, "_workers_started", True) # No queue or upload workers behind these requests
+    return server.app.test_client()
+
+def _auth(token=TOKEN):
+    return {"Authorization": f"Bearer {token}"}
+
+# --- AUTH AND VALIDATION ---
+
+def test_agent_routes_require_the_token(client):
+    for path in ("/api/agents/register", "/api/agents/heartbeat", "/api/agents/claim", "/api/agents/log", "/api/agents/result"):
+        assert client.post(path, json={"agent_id": "a1"}).status_code == 401
+        assert client.post(path, json={"agent_id": "a1"}, headers=_auth("wrong")).status_code == 403
+    assert agents.list_agents() == []
+
+def test_register_with_the_token(client):
+    r = client.post("/api/agents/register", json={"agent_id": "a1", "name": "box1"}, headers=_auth())
+    assert r.status_code == 200 and r.get_json()["status"] == "success"
+    assert [a["name"] for a in agents.list_agents()] == ["box1"]
+
+def test_missing_agent_id_is_a_bad_request(client):
+    for body in ({}, {"agent_id": ""}, {"agent_id": 7}, ["a1"]):
+        assert client.post("/api/agents/claim", json=body, headers=_auth()).status_code == 400
+    assert client.post("/api/agents/claim", data="not json", headers=_auth()).status_code == 400
+    assert client.post("/api/agents/log", json={"agent_id": "a1"}, headers=_auth()).status_code == 400
+
+def test_unknown_job_is_a_conflict(client):
+    for path in ("/api/agents/log", "/api/agents/result"):
+        r = client.post(path, json={"agent_id": "a1", "job_id": "nope", "status": "done"}, headers=_auth())
+        assert r.status_code == 409
+        assert r.get_json()["msg"] == "Job is not assigned to this agent"
+
+def test_without_a_token_only_local_agents_are_accepted(client, monkeypatch):
+    monkeypatch.setattr(server, "AGENT_TOKEN", None)
+    body = {"agent_id": "a1"}
+    assert client.post("/api/agents/register", json=body).status_code == 200
+    r = client.post("/api/agents/register", json=body, environ_base={"REMOTE_ADDR": "10.0.0.8"})
+    assert r.status_code == 403
+
+# --- END TO END ---
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait(check, timeout):
+    end = time.time() + timeout
+    while time.time() < end:
+        try:
+            value = check()
+            if value: return value
+        except requests.ConnectionError: pass
+        time.sleep(0.3)
+    return None
+
+def test_agents_on_localhost_drain_a_batch(tmp_path):
+    # The agents share this machine's free RAM, which must fit a job's fixed overhead plus the OS headroom
+    needed = backend.MEMORY_OVERHEAD + backend.RAM_HEADROOM
+    if system_info.get_free_resources()["ram_available"] < needed: pytest.skip("not enough free RAM for an agent job")
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "lm_eval").write_text(STUB)
+    (bin_dir / "lm_eval").chmod(0o755)
+    env = dict(os.environ, PATH=str(bin_dir) + os.pathsep + os.environ["PATH"], HF_HUB_OFFLINE="1",
+               POCKETBENCH_AGENT_TOKEN=TOKEN, STUB_SECONDS="2")
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    procs = [subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--port", str(port)],
+                              cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+    try:
+        assert _wait(lambda: requests.get(base + "/api/ready", timeout=1).ok, 60)
+        for name in ("a1", "a2"):
+            procs.append(subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "agent.py"), "--server", base, "--name", name,
+                 "--workdir", str(tmp_path / "agents" / name)],
+                cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        assert _wait(lambda: len(requests.get(base + "/api/agents", timeout=5).json()) == 2, 60)
+
+        jobs = [{"repo_id": "test/stub", "filename": f"stub{i}.Q4_K_M.gguf", "size_bytes": 1, "tasks": ["stub_task"]}
+                for i in range(3)]
+        batch = requests.post(base + "/api/queue", json={
+            "jobs": jobs, "batch": 1, "device": "cpu", "prefetch": False, "runner": "subprocess",
+            "response_cache": False, "dispatch": "agents"
+        }, timeout=10).json()
+
+        def finished():
+            listed = {b["batch_id"]: b for b in requests.get(base + "/api/queue", timeout=5).json()}
+            statuses = [j["status"] for j in listed[batch["batch_id"]]["jobs"]]
+            return statuses if all(s not in ("pending", "running") for s in statuses) else None
+        assert _wait(finished, 120) == ["done", "done", "done"]
+
+        # Every agent's records were merged into the server's own result store
+        stored = os.listdir(tmp_path / "local_results_db")
+        assert sum(f.endswith(".json") for f in stored) == 3
+        log = requests.get(base + "/api/logs_content", params={"filename": f"BATCH_{batch['batch_id']}.log"}, timeout=5).text
+        assert "stub evaluating" in log
+    finally:
+        for proc in reversed(procs):
+            proc.terminate()
+            try: proc.wait(timeout=10)
+            except subprocess.TimeoutExpired: proc.kill()
+
+def test_agent_with_a_wrong_token_exits(tmp_path):
+    env = dict(os.environ, POCKETBENCH_AGENT_TOKEN=TOKEN)
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    server_proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"), "--port", str(port)],
+                                   cwd=tmp_path, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        assert _wait(lambda: requests.get(base + "/api/ready", timeout=1).ok, 60)
+        agent = subprocess.run([sys.executable, os.path.join(ROOT, "agent.py"), "--server", base, "--name", "a1",
+                                "--token", "wrong", "--workdir", str(tmp_path / "a1")],
+                               cwd=tmp_path, capture_output=True, text=True, timeout=60)
+        assert agent.returncode != 0
+        assert "Check --token" in agent.stderr
+    finally:
+        server_proc.terminate()
+        try: server_proc.wait(timeout=10)
+        except subprocess.TimeoutExpired: server_proc.kill()
@@ -0,0 +1,56 @@
+import time
+import threading
+
+from src import backend
+
+def _run(jobs, monkeypatch, run_job, log=None, prefetch=False):
+    """Runs a batch in the background with a fake _run_job; returns (thread, statuses)."""
+    statuses = {}
+    monkeypatch.setattr(backend, "_run_job", run_job)
+    monkeypatch.setattr(backend, "job_missing_tasks", lambda job, tasks, options: list(tasks))
+    def consume():
+        for text, *_ in backend.run_batch_process(jobs, 1, device="cpu", max_parallel=2, batch_id="test",
+                                                  on_job_done=statuses.__setitem__, options={"prefetch": prefetch}):
+            if log is not None: log.append(text)
+    thread = threading.Thread(target=consume, daemon=True)
+    thread.start()
+    return thread, statuses
+
+def test_waiting_jobs_are_planned_once_and_can_be_stopped(workdir, monkeypatch):
+    planned = []
+    def predict(job, *args):
+        planned.append(job['job_id'])
+        return 10 ** 15, None # Never fits beside another job
+    monkeypatch.setattr(backend, "predict_job_memory", predict)
+    started, release = threading.Event(), threading.Event()
+    def run_job(job_id, job, tasks, ctx, emit, emit_telemetry):
+        started.set()
+        release.wait(10)
+        return "done"
+    jobs = [{"job_id": f"j{i}", "repo_id": "org/m", "filename": f"m{i}.gguf", "tasks": ["gsm8k"]} for i in range(2)]
+    thread, statuses = _run(jobs, monkeypatch, run_job)
+
+    assert started.wait(10)
+    time.sleep(1.5) # A few scheduler passes with j1 waiting for RAM
+    assert planned == ["j0", "j1"]
+    assert backend.kill_current_process("j1") # Waiting for admission, not running yet
+    release.set()
+    thread.join(10)
+    assert statuses == {"j1": "stopped", "j0": "done"}
+
+def test_prefetch_lines_wait_for_room_in_a_full_stream(workdir, monkeypatch):
+    monkeypatch.setattr(backend, "EVENT_QUEUE_SIZE", 2)
+    monkeypatch.setattr(backend, "predict_job_memory", lambda job, *args: (10 ** 15, None))
+    def request_prefetch(repo_id, filename, size_bytes, emit, budget_bytes):
+        threading.Thread(target=lambda: [emit(f"[PREFETCH] line {i}\n") for i in range(50)], daemon=True).start()
+    monkeypatch.setattr(backend.prefetch, "request_prefetch", request_prefetch)
+    def run_job(job_id, job, tasks, ctx, emit, emit_telemetry):
+        time.sleep(1)
+        return "done"
+    jobs = [{"job_id": f"j{i}", "repo_id": "org/m", "filename": f"m{i}.gguf", "size_bytes": 1, "tasks": ["gsm8k"]}
+            for i in range(2)]
+    log = []
+    thread, statuses = _run(jobs, monkeypatch, run_job, log=log, prefetch=True)
+    thread.join(15)
+    assert statuses == {"j0": "done", "j1": "done"}
+    assert "".join(log).count("[PREFETCH] line") == 50
@@ -0,0 +1,8 @@
+from src import batch_tuner
+
+def test_cached_sizes_are_per_repo(workdir):
+    batch_tuner.record("org/Llama-3-8B-GGUF", "ggml-model-q4_0.gguf", "cpu", 8, "calibrated")
+    assert batch_tuner.get_cached("org/Llama-3-8B-GGUF", "ggml-model-q4_0.gguf", "cpu") == 8
+    # Same generic file name in another repo is a different model
+    assert batch_tuner.get_cached("org/Qwen2-7B-GGUF", "ggml-model-q4_0.gguf", "cpu") is None
+    assert batch_tuner.get_cached("org/Llama-3-8B-GGUF", "ggml-model-q4_0.gguf", "cpu", reason="oom_backoff") is None
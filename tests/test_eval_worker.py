@@ -0,0 +1,49 @@
+import sys
+import json
+import queue
+import subprocess
+
+from src import eval_worker
+
+def _worker(code):
+    proc = subprocess.Popen([sys.executable, "-c", code], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, bufsize=0)
+    return {"proc": proc, "key": None, "busy": True, "control": queue.Queue(), "emit": None}
+
+def _marker(event, **data):
+    return eval_worker.MARKER + json.dumps(dict(data, event=event))
+
+def test_markers_pass_the_noise_filter():
+    error = _marker("error", error="OOM while Running loglikelihood requests")
+    worker = _worker(f"print('Running loglikelihood requests'); print({error!r})")
+    logged = []
+    worker["emit"] = logged.append
+    eval_worker._pump(worker)
+    assert worker["control"].get_nowait()["event"] == "error"
+    assert worker["control"].get_nowait()["event"] == "exit"
+    assert "".join(logged) == "" # The progress line itself is still dropped
+
+def test_run_tasks_returns_when_the_worker_dies(monkeypatch):
+    monkeypatch.setattr(eval_worker, "CONTROL_POLL", 0.05)
+    # Exits without its stdout reaching EOF for the pump (nothing reads it here)
+    worker = _worker("import sys; sys.stdin.readline()")
+    status = eval_worker.run_tasks(worker, {"tasks": []}, emit=lambda text: None, on_result=lambda *a: None)
+    assert status == "crashed"
+
+def test_run_tasks_reads_results_left_in_the_pipe(monkeypatch):
+    monkeypatch.setattr(eval_worker, "CONTROL_POLL", 0.05)
+    worker = _worker("import sys; sys.stdin.readline()")
+    worker["control"].put({"event": "task_done", "task": "gsm8k", "path": "r.json"})
+    worker["control"].put({"event": "done"})
+    results = []
+    status = eval_worker.run_tasks(worker, {"tasks": ["gsm8k"]}, emit=lambda text: None,
+                                   on_result=lambda task, path: results.append(task))
+    assert status == "done" and results == ["gsm8k"]
+
+def test_auto_batch_size_reaches_the_model():
+    from types import SimpleNamespace
+    lm = SimpleNamespace(batch_size_per_gpu=1)
+    eval_worker._set_batch_size(lm, "auto")
+    assert lm.batch_size_per_gpu == "auto"
+    eval_worker._set_batch_size(lm, "8")
+    assert lm.batch_size_per_gpu == 8
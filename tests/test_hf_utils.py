@@ -0,0 +1,206 @@
+import os
+import time
+import struct
+from types import SimpleNamespace
+
+import pytest
+from huggingface_hub import constants
+
+from src import hf_utils
+
+def _gguf(file_type):
+    key = b"general.file_type"
+    return b"GGUF" + struct.pack("<IQQ", 3, 0, 1) + struct.pack("<Q", len(key)) + key + struct.pack("<II", 4, file_type)
+
+def _add_model(cache, repo_id, filename, file_type=15, rev="r1"):
+    repo = cache / ("models--" + repo_id.replace("/", "--"))
+    (repo / "blobs").mkdir(parents=True, exist_ok=True)
+    (repo / "snapshots" / rev).mkdir(parents=True, exist_ok=True)
+    (repo / "refs").mkdir(exist_ok=True)
+    (repo / "refs" / "main").write_text(rev)
+    blob = repo / "blobs" / f"blob-{filename}"
+    blob.write_bytes(_gguf(file_type))
+    os.symlink(os.path.join("..", "..", "blobs", blob.name), repo / "snapshots" / rev / filename)
+    return repo
+
+@pytest.fixture
+def cache(workdir, monkeypatch):
+    root = workdir / "hf_cache"
+    root.mkdir()
+    monkeypatch.setattr(constants, "HF_HUB_CACHE", str(root))
+    monkeypatch.setattr(hf_utils, "_inventory", None)
+    monkeypatch.setattr(hf_utils, "_dirty_repos", set())
+    return root
+
+def _valid(models):
+    return sorted((m["repo_id"], m["filename"], m["tags"]) for m in models if m["type"] == "valid")
+
+def test_inventory_lists_models_with_header_quant(cache):
+    _add_model(cache, "a/one-GGUF", "one.Q4_K_M.gguf")
+    _add_model(cache, "b/two-GGUF", "two.gguf", file_type=7) # Quant only in the header
+    (cache / "models--c--ghost").mkdir()
+    assert _valid(hf_utils.get_local_models()) == [("a/one-GGUF", "one.Q4_K_M.gguf", "Q4_K_M"),
+                                                   ("b/two-GGUF", "two.gguf", "Q8_0")]
+    assert [m["type"] for m in hf_utils.get_local_models()].count("ghost") == 1
+
+    _add_model(cache, "a/one-GGUF", "one.Q8_0.gguf", file_type=7)
+    assert len(_valid(hf_utils.get_local_models())) == 3
+
+def test_delete_rechecks_only_its_repo(cache, monkeypatch):
+    for i in range(5): _add_model(cache, f"org/m{i}-GGUF", f"m{i}.Q4_K_M.gguf")
+    hf_utils.get_local_models()
+
+    checked = []
+    signature = hf_utils._repo_signature
+    monkeypatch.setattr(hf_utils, "_repo_signature", lambda root, folder: checked.append(folder) or signature(root, folder))
+    ok, _ = hf_utils.delete_local_file("org/m2-GGUF", "r1", "m2.Q4_K_M.gguf")
+    assert ok and set(checked) == {"models--org--m2-GGUF"}
+    assert not os.path.lexists(cache / "models--org--m2-GGUF" / "snapshots" / "r1" / "m2.Q4_K_M.gguf")
+    # The inventory already reflects the delete
+    items = hf_utils._load_inventory()["repos"]["models--org--m2-GGUF"]["items"]
+    assert [i for i in items if i["type"] == "valid"] == []
+
+    assert hf_utils.delete_local_file("org/m2-GGUF", "r1", "m2.Q4_K_M.gguf") == (False, "File not found")
+
+def test_junk_delete_drops_the_repo_from_the_inventory(cache):
+    _add_model(cache, "a/one-GGUF", "one.Q4_K_M.gguf")
+    ghost = cache / "models--c--ghost"
+    ghost.mkdir()
+    assert any(m["type"] == "ghost" for m in hf_utils.get_local_models())
+    ok, _ = hf_utils.delete_local_file(path=str(ghost))
+    assert ok and "models--c--ghost" not in hf_utils._load_inventory()["repos"]
+    assert not any(m["type"] == "ghost" for m in hf_utils.get_local_models())
+
+def test_quant_tags_from_filenames():
+    assert hf_utils.get_tags("m.Q4_K_M.gguf") == "Q4_K_M"
+    assert hf_utils.get_tags("qwen2-7b-instruct-q8_0.gguf") == "Q8_0"
+    assert hf_utils.get_tags("model-IQ3_XXS-00001-of-00002.gguf") == "IQ3_XXS"
+    assert hf_utils.get_tags("model-fp16.gguf") == "F16"
+    assert hf_utils.get_tags("model.gguf") == "GGUF"
+
+# --- METADATA CACHE (against a stub HfApi) ---
+
+class StubHfApi:
+    def __init__(self):
+        self.calls, self.down = [], False
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.down: raise ConnectionError("Hub unreachable")
+
+    def list_models(self, search, **kwargs):
+        self._call("list_models")
+        return [SimpleNamespace(modelId=f"org/{search.split()[0]}-GGUF", author="org", likes=3, downloads=10,
+                                lastModified="2024-05-01T00:00:00")]
+
+    def model_info(self, repo_id, files_metadata):
+        self._call("model_info")
+        lfs = SimpleNamespace(sha256="ab" * 32)
+        return SimpleNamespace(siblings=[SimpleNamespace(rfilename="m.Q4_K_M.gguf", size=2 * 1024 ** 3, lfs=lfs),
+                                         SimpleNamespace(rfilename="README.md", size=10, lfs=None)])
+
+@pytest.fixture
+def hub(workdir, monkeypatch):
+    stub = StubHfApi()
+    monkeypatch.setattr(hf_utils, "_api", stub)
+    monkeypatch.setattr(hf_utils, "_meta_cache", None)
+    monkeypatch.setattr(hf_utils, "_meta_save_timer", None)
+    monkeypatch.setattr(hf_utils, "_meta_refreshing", set())
+    monkeypatch.setattr(hf_utils, "_offline", False)
+    return stub
+
+def test_fresh_metadata_is_served_from_the_cache(hub):
+    first = hf_utils.list_repo_files_rich("org/m-GGUF")
+    assert [f["name"] for f in first] == ["m.Q4_K_M.gguf"] and first[0]["tags"] == "Q4_K_M"
+    assert first[0]["sha256"] == "ab" * 32
+    assert hf_utils.list_repo_files_rich("org/m-GGUF") == first
+    assert hf_utils.search_hf_models_rich("llama")[0]["id"] == "org/llama-GGUF"
+    assert hub.calls == ["model_info", "list_models"]
+
+def test_stale_metadata_is_served_while_it_refreshes(hub, monkeypatch):
+    hf_utils.list_repo_files_rich("org/m-GGUF")
+    hf_utils._meta_cache["files:org/m-GGUF"]["time"] -= hf_utils.METADATA_TTL + 1
+    started = []
+    monkeypatch.setattr(hf_utils.threading, "Thread", lambda target, args, daemon: SimpleNamespace(
+        start=lambda: started.append(target(*args))))
+    assert hf_utils.list_repo_files_rich("org/m-GGUF")[0]["name"] == "m.Q4_K_M.gguf"
+    assert started and hub.calls == ["model_info", "model_info"]
+    assert hf_utils._meta_cache["files:org/m-GGUF"]["time"] > time.time() - 5
+
+def test_offline_and_outages_fall_back_to_the_last_known_answer(hub):
+    hf_utils.list_repo_files_rich("org/m-GGUF")
+    hf_utils._meta_cache["files:org/m-GGUF"]["time"] -= hf_utils.METADATA_STALE_TTL + 1
+    hub.down = True
+    assert len(hf_utils.list_repo_files_rich("org/m-GGUF")) == 1   # Expired, but the Hub is down
+    assert hf_utils.list_repo_files_rich("org/other-GGUF") == []    # Nothing known, errors aren't cached
+    hf_utils.set_offline_mode(True)
+    calls = len(hub.calls)
+    assert len(hf_utils.list_repo_files_rich("org/m-GGUF")) == 1
+    assert hf_utils.search_hf_models_rich("never-seen") == [] and len(hub.calls) == calls
+
+def test_stores_are_written_out_together(hub, workdir):
+    for i in range(20): hf_utils.list_repo_files_rich(f"org/m{i}-GGUF")
+    assert not (workdir / hf_utils.METADATA_CACHE_FILE).exists() # Pending until the timer or a flush
+    hf_utils.flush_meta_cache()
+    hf_utils._meta_cache = None
+    hub.down = True
+    assert len(hf_utils.list_repo_files_rich("org/m7-GGUF")) == 1 # Read back from disk
+    assert len(hub.calls) == 20
+
+def test_remote_headers_are_keyed_by_size_and_sha256(hub, monkeypatch):
+    signatures = []
+    monkeypatch.setattr(hf_utils, "cached_path", lambda repo_id, filename: None)
+    monkeypatch.setattr(hf_utils.gguf_reader, "read_remote_summary",
+                        lambda key, signature, read_range: signatures.append(signature) or {"quant": "Q4_K_M"})
+    assert hf_utils.get_gguf_summary("org/m-GGUF", "m.Q4_K_M.gguf") == {"quant": "Q4_K_M"}
+    assert hf_utils.get_gguf_summary("org/m-GGUF", "m.Q4_K_M.gguf", size_bytes=2 * 1024 ** 3)
+    assert signatures == [[2 * 1024 ** 3, "ab" * 32]] * 2
+
+def test_a_reupload_of_the_same_size_rereads_the_header(workdir, monkeypatch):
+    monkeypatch.setattr(hf_utils.gguf_reader, "CACHE_FILE", str(workdir / "headers.json"))
+    monkeypatch.setattr(hf_utils.gguf_reader, "_cache", None)
+    reads = []
+    def read_range(n):
+        reads.append(n)
+        return _gguf(15)
+    first = hf_utils.gguf_reader.read_remote_summary("hf://org/m/m.gguf", [100, "aa"], read_range)
+    assert hf_utils.gguf_reader.read_remote_summary("hf://org/m/m.gguf", [100, "aa"], read_range) == first
+    hf_utils.gguf_reader.read_remote_summary("hf://org/m/m.gguf", [100, "bb"], read_range)
+    assert len(reads) == 2
+    hf_utils.gguf_reader.flush()
+
+def test_headers_without_a_signature_are_not_cached(workdir, monkeypatch):
+    monkeypatch.setattr(hf_utils.gguf_reader, "CACHE_FILE", str(workdir / "headers.json"))
+    monkeypatch.setattr(hf_utils.gguf_reader, "_cache", None)
+    reads = []
+    def read_range(n):
+        reads.append(n)
+        return _gguf(15)
+    for _ in range(2): hf_utils.gguf_reader.read_remote_summary("hf://org/m/m.gguf", [0, None], read_range)
+    assert len(reads) == 2 and "hf://org/m/m.gguf" not in hf_utils.gguf_reader._load_cache()
+
+def _shard(tensors, file_type=None):
+    """A GGUF header with Q4_K tensors of `tensors` elements each (and a file_type on the first shard)."""
+    key = b"general.file_type"
+    kv = struct.pack("<Q", len(key)) + key + struct.pack("<II", 4, file_type) if file_type is not None else b""
+    infos = b""
+    for i, elements in enumerate(tensors):
+        name = f"blk.{i}.weight".encode()
+        infos += struct.pack("<Q", len(name)) + name + struct.pack("<IQIQ", 1, elements, 12, 0)
+    return b"GGUF" + struct.pack("<IQQ", 3, len(tensors), 1 if kv else 0) + kv + infos
+
+def test_split_gguf_sizes_are_summed_over_shards(workdir, monkeypatch):
+    shards = {"m-Q4_K_M-00001-of-00003.gguf": _shard([256], file_type=15),
+              "m-Q4_K_M-00002-of-00003.gguf": _shard([512, 256]),
+              "m-Q4_K_M-00003-of-00003.gguf": _shard([1024])}
+    for name, data in shards.items(): (workdir / name).write_bytes(data)
+    monkeypatch.setattr(hf_utils, "cached_path", lambda repo_id, filename: str(workdir / filename))
+    summary = hf_utils.get_gguf_summary("org/m-GGUF", "m-Q4_K_M-00001-of-00003.gguf")
+    assert summary["parameters"] == 2048 and summary["tensor_count"] == 4 and summary["shards"] == 3
+    assert summary["weights_bytes"] == 2048 // 256 * 144 and summary["quant"] == "Q4_K_M"
+
+    monkeypatch.setattr(hf_utils, "_offline", True) # A missing shard can't be summed
+    os.remove(workdir / "m-Q4_K_M-00003-of-00003.gguf")
+    monkeypatch.setattr(hf_utils, "cached_path", lambda repo_id, filename: str(workdir / filename)
+                        if (workdir / filename).exists() else None)
+    assert hf_utils.get_gguf_summary("org/m-GGUF", "m-Q4_K_M-00001-of-00003.gguf") is None
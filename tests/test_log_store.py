@@ -0,0 +1,85 @@
+import os
+import gzip
+
+import pytest
+
+from src import log_store
+
+LINES = [f"line {i}{'x' * (i % 7)}\n" for i in range(200)]
+
+@pytest.fixture(params=["plain", "gzip", "blocks"])
+def log_name(workdir, request, monkeypatch):
+    os.makedirs(log_store.LOGS_DIR)
+    path = os.path.join(log_store.LOGS_DIR, "BATCH_test.log")
+    with open(path, "w") as f: f.write("".join(LINES))
+    if request.param == "blocks": monkeypatch.setattr(log_store, "BLOCK_SIZE", 64) # Pages span many blocks
+    if request.param != "plain": log_store.compress_log(path)
+    return "BATCH_test.log"
+
+def test_forward_pages_join_into_the_whole_log(log_name):
+    pages, start = [], 0
+    while True:
+        page = log_store.read_range(log_name, start=start, length=10)
+        assert page["start"] == start
+        assert page["data"].endswith("\n")
+        pages.append(page["data"])
+        start = page["end"]
+        if start >= page["size"]: break
+    assert "".join(pages) == "".join(LINES)
+
+def test_backward_pages_join_into_the_whole_log(log_name):
+    pages, end = [], None
+    while end != 0:
+        page = log_store.read_range(log_name, end=end, length=25)
+        pages.insert(0, page["data"])
+        end = page["start"]
+    assert "".join(pages) == "".join(LINES)
+
+def test_forward_window_is_clamped(log_name):
+    size = len("".join(LINES))
+    page = log_store.read_range(log_name, start=0, length=50, end=10 ** 9)
+    assert page["end"] <= 50
+    page = log_store.read_range(log_name, start=0, length=10 ** 9, end=10 ** 9)
+    assert page["end"] == size
+    assert len(page["data"]) == size
+
+def test_end_before_start_is_rejected(log_name):
+    with pytest.raises(ValueError):
+        log_store.read_range(log_name, start=100, end=50)
+
+def test_tail_offsets_land_on_line_boundaries(log_name):
+    chunk = log_store.read_tail(log_name, max_bytes=40)
+    assert chunk["data"] and chunk["data"].endswith("\n")
+    assert "".join(LINES).endswith(chunk["data"])
+    chunk = log_store.read_tail(log_name, offset=0, max_bytes=30)
+    assert "".join(LINES).startswith(chunk["data"]) and chunk["more"]
+
+def test_live_log_holds_back_its_partial_last_line(workdir):
+    os.makedirs(log_store.LOGS_DIR)
+    with open(os.path.join(log_store.LOGS_DIR, "BATCH_live.log"), "w") as f: f.write("done\nhalf a li")
+    page = log_store.read_range("BATCH_live.log", start=0, length=100)
+    assert page["data"] == "done\n" and page["end"] == 5
+    assert log_store.read_range("BATCH_live.log", start=5, length=100)["data"] == ""
+
+def test_compressed_pages_only_decompress_their_blocks(workdir, monkeypatch):
+    os.makedirs(log_store.LOGS_DIR)
+    path = os.path.join(log_store.LOGS_DIR, "BATCH_big.log")
+    with open(path, "w") as f: f.write("".join(LINES))
+    monkeypatch.setattr(log_store, "BLOCK_SIZE", 64)
+    log_store.compress_log(path)
+    with gzip.open(path + ".gz", "rt") as f: assert f.read() == "".join(LINES) # Still one plain .gz
+
+    decompressed = []
+    real = gzip.decompress
+    monkeypatch.setattr(log_store.gzip, "decompress", lambda data: decompressed.append(1) or real(data))
+    page = log_store.read_range("BATCH_big.log", start=1000, length=100)
+    assert "".join(LINES)[page["start"]:page["end"]] == page["data"]
+    assert len(decompressed) <= 4
+
+def test_legacy_gzip_logs_get_a_block_index(workdir):
+    os.makedirs(log_store.LOGS_DIR)
+    with gzip.open(os.path.join(log_store.LOGS_DIR, "BATCH_old.log.gz"), "wt") as f: f.write("".join(LINES))
+    assert log_store.read_range("BATCH_old.log", start=0, length=10 ** 6)["data"] == "".join(LINES)
+    assert os.path.exists(os.path.join(log_store.LOGS_DIR, "BATCH_old.log.gz.idx"))
+    assert log_store.delete_log("BATCH_old.log")
+    assert os.listdir(log_store.LOGS_DIR) == []
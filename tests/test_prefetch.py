@@ -0,0 +1,36 @@
+import pytest
+
+from src import prefetch
+
+@pytest.fixture
+def downloads(workdir, monkeypatch):
+    """Prefetch with the HF cache and the worker replaced: records which files get queued."""
+    cached = set()
+    queued = []
+    monkeypatch.setattr(prefetch, "_states", {})
+    monkeypatch.setattr(prefetch, "is_cached", lambda repo_id, filename: (repo_id, filename) in cached)
+    monkeypatch.setattr(prefetch, "ensure_worker", lambda: None)
+    monkeypatch.setattr(prefetch._requests, "put", lambda item: queued.append(item[:2]))
+    return cached, queued
+
+def test_ready_files_are_not_fetched_again(downloads):
+    cached, queued = downloads
+    cached.add(("org/m", "m.gguf"))
+    prefetch._set_state(("org/m", "m.gguf"), "ready")
+    prefetch.request_prefetch("org/m", "m.gguf")
+    assert queued == []
+
+def test_a_deleted_ready_file_is_fetched_again(downloads):
+    cached, queued = downloads
+    prefetch._set_state(("org/m", "m.gguf"), "ready") # Deleted outside the model manager since
+    prefetch.request_prefetch("org/m", "m.gguf")
+    assert queued == [("org/m", "m.gguf")]
+    assert prefetch.get_state("org/m", "m.gguf") == "queued"
+
+def test_forget_drops_the_state_of_deleted_files(downloads):
+    for name in ("a.gguf", "b.gguf"): prefetch._set_state(("org/m", name), "ready")
+    prefetch._set_state(("org/other", "c.gguf"), "ready")
+    prefetch.forget("org/m", "a.gguf")
+    assert prefetch.get_state("org/m", "a.gguf") is None and prefetch.get_state("org/m", "b.gguf") == "ready"
+    prefetch.forget("org/m")
+    assert list(prefetch._states) == [("org/other", "c.gguf")]
@@ -0,0 +1,80 @@
+import os
+import json
+
+import pytest
+
+from src import results_db, storage
+
+def _save(repo_id, gguf_file, scores, limit=0, backend=None, screen=False):
+    """Saves one result record through storage, which indexes it like a finished run."""
+    data = {
+        "results": {task: {"alias": task, "acc,none": acc, "acc_stderr,none": 0.01} for task, acc in scores.items()},
+        "config": {"model": "hf", "limit": limit or None}
+    }
+    unique_name = storage.get_unique_name(repo_id, gguf_file, backend)
+    return storage.save_result(unique_name, data, repo_id, gguf_file, list(scores), limit, backend=backend, screen=screen)
+
+@pytest.fixture
+def results(workdir):
+    _save("org/Llama-3-8B-GGUF", "llama-3-8b.Q4_K_M.gguf", {"gsm8k": 0.50, "arc_easy": 0.70})
+    _save("org/Llama-3-8B-GGUF", "llama-3-8b.Q8_0.gguf", {"gsm8k": 0.55, "arc_easy": 0.72})
+    _save("org/Qwen2-7B-GGUF", "qwen2-7b.Q4_0.gguf", {"gsm8k": 0.60})
+    _save("org/Qwen2-7B-GGUF", "qwen2-7b.Q4_0.gguf", {"gsm8k": 0.58}, backend="llamacpp")
+    _save("org/Qwen2-7B-GGUF", "qwen2-7b.Q8_0.gguf", {"gsm8k": 0.90}, limit=10) # Smoke run
+    return workdir
+
+def test_rows_are_tagged_and_full_runs_only_by_default(results):
+    page = results_db.query_results({"task": "gsm8k"})
+    assert page["total"] == 4
+    assert [(r["family"], r["quant"], r["backend"], r["value"]) for r in page["rows"]] == [
+        ("Qwen2-7B", "Q4_0", "hf", 0.60), ("Qwen2-7B", "Q4_0", "llamacpp", 0.58),
+        ("Llama-3-8B", "Q8_0", "hf", 0.55), ("Llama-3-8B", "Q4_K_M", "hf", 0.50)]
+    assert results_db.query_results({"task": "gsm8k", "include_limited": True})["total"] == 5
+
+def test_filters_sorting_and_pages(results):
+    page = results_db.query_results({"quant": "q4", "backend": "hf"}, sort="value", order="asc", limit=2, offset=1)
+    assert page["total"] == 3
+    assert [(r["task"], r["value"]) for r in page["rows"]] == [("gsm8k", 0.60), ("arc_easy", 0.70)]
+    assert results_db.query_results({"search": "qwen"})["total"] == 2
+    # Unknown sort columns fall back to the value instead of reaching the SQL
+    assert results_db.query_results({}, sort="value; DROP TABLE results")["total"] == 6
+
+def test_best_per_group_and_aggregates(results):
+    best = results_db.best_per_group({"task": "gsm8k", "backend": "hf"}, group_by="family")
+    assert [(r["family"], r["gguf_file"]) for r in best] == [("Qwen2-7B", "qwen2-7b.Q4_0.gguf"),
+                                                              ("Llama-3-8B", "llama-3-8b.Q8_0.gguf")]
+    summary = results_db.aggregate({"task": "arc_easy"}, group_by="quant", agg="count")
+    assert sorted((r["grp"], r["value"]) for r in summary) == [("Q4_K_M", 1), ("Q8_0", 1)]
+    avg = results_db.aggregate({"task": "gsm8k", "family": "Llama-3-8B"}, agg="avg")
+    assert avg[0]["value"] == pytest.approx(0.525) and avg[0]["n"] == 2
+
+def test_import_picks_up_changed_and_deleted_files(results):
+    assert results_db.import_json_dir()["imported"] == 0 # Everything was indexed on save
+    path = _save("org/Mistral-7B-GGUF", "mistral.Q5_K_M.gguf", {"gsm8k": 0.40})
+    with open(path) as f: data = json.load(f)
+    data["results"]["gsm8k"]["acc,none"] = 0.45
+    with open(path, "w") as f: json.dump(data, f)
+    os.utime(path, (1, 1))
+    assert results_db.import_json_dir()["imported"] == 1
+    rows = results_db.query_results({"family": "Mistral-7B"})["rows"]
+    assert [r["value"] for r in rows] == [0.45] and rows[0]["quant"] == "Q5_K_M"
+
+    os.remove(path)
+    results_db.import_json_dir()
+    assert results_db.query_results({"family": "Mistral-7B"})["total"] == 0
+
+def test_existing_files_are_imported_on_first_query(results, monkeypatch):
+    os.remove(results_db.RESULTS_INDEX_DB)
+    monkeypatch.setattr(results_db, "_initialized", False)
+    monkeypatch.setattr(results_db, "_imported", False)
+    assert results_db.query_results({"task": "gsm8k"})["total"] == 4
+
+def test_legacy_files_beside_a_populated_index_are_imported(workdir):
+    # A record written before the index existed (no task_index), then a new run indexed on save
+    legacy = {"custom_repo_id": "org/Phi-3-GGUF", "custom_gguf_file": "phi-3.Q4_K_M.gguf", "config": {"limit": None},
+              "results": {"gsm8k": {"acc,none": 0.3}}}
+    os.makedirs(results_db.RESULTS_DIR)
+    with open(os.path.join(results_db.RESULTS_DIR, "legacy0001.json"), "w") as f: json.dump(legacy, f)
+    _save("org/Llama-3-8B-GGUF", "llama-3-8b.Q4_K_M.gguf", {"gsm8k": 0.50})
+    rows = results_db.query_results({"task": "gsm8k"})["rows"]
+    assert sorted(r["family"] for r in rows) == ["Llama-3-8B", "Phi-3"]
@@ -0,0 +1,43 @@
+from src import screening
+
+def _results(limit, total=1000):
+    n = min(limit or total, total)
+    stderr = 0.5 / n ** 0.5
+    return {"results": {"arc_easy": {"acc,none": 0.6, "acc_stderr,none": stderr}},
+            "n-samples": {"arc_easy": {"effective": n, "original": total}}}
+
+def test_screens_grow_until_the_interval_is_narrow():
+    config = dict(screening.DEFAULTS, ci_half_width=0.05)
+    logged, limits = [], []
+    data = screening.run(lambda limit: limits.append(limit) or _results(limit), "arc_easy", config, log=logged.append)
+    assert limits == [16, 32, 64, 128, 256, 512]
+    entry = data["screening"]["arc_easy"]
+    assert entry["converged"] and entry["samples"] == 512
+    # Without document counts increments are lm_eval --limit: the first N documents, and the record says so
+    assert entry["sampling"] == "first_n"
+    assert logged[0] == "[SCREEN] arc_easy: first 16 documents per subtask..."
+
+def test_screens_stop_when_the_task_runs_out():
+    data = screening.run(lambda limit: _results(limit, total=40), "arc_easy", dict(screening.DEFAULTS), log=lambda text: None)
+    entry = data["screening"]["arc_easy"]
+    assert entry["exhausted"] and not entry["converged"]
+    assert [s["limit"] for s in entry["steps"]] == [16, 32, 64]
+
+def test_screens_draw_nested_seeded_samples_per_subtask():
+    counts = {"mmlu_anatomy": 135, "mmlu_astronomy": 152}
+    drawn = []
+    def evaluate(limit, samples=None):
+        assert limit is None # lm_eval takes either a limit or samples
+        drawn.append(samples)
+        return {"results": {"mmlu": {"acc,none": 0.6, "acc_stderr,none": 0.5 / (2 * len(samples["mmlu_anatomy"])) ** 0.5}},
+                "group_subtasks": {"mmlu": list(counts)}}
+    config = dict(screening.DEFAULTS, ci_half_width=0.1)
+    data = screening.run(evaluate, "mmlu", config, log=lambda text: None, doc_counts=counts)
+    entry = data["screening"]["mmlu"]
+    assert entry["sampling"] == "seeded_shuffle" and entry["seed"] == 1234
+    assert entry["samples"] == 2 * 64 and entry["total_samples"] == 135 + 152
+    first, second = drawn[0]["mmlu_anatomy"], drawn[1]["mmlu_anatomy"]
+    assert len(first) == 16 and set(first) < set(second) # Increments extend the previous sample
+    assert first != list(range(16)) # Not the first documents
+    assert screening.get_samples(counts, 16, 1234) == drawn[0] # Same seed, same documents
+    assert screening.get_samples(counts, 16, 7) != drawn[0]
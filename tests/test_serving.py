@@ -0,0 +1,28 @@
+import json
+import threading
+
+import server
+from src import static_files
+
+def test_preload_compresses_the_ui_once(tmp_path, monkeypatch):
+    (tmp_path / "js").mkdir()
+    (tmp_path / "js" / "app.js").write_text("console.log('pocketbench');\n" * 100)
+    (tmp_path / "index.html").write_text("<html></html>")
+    monkeypatch.setattr(static_files, "_cache", {})
+    assert static_files.preload(str(tmp_path)) == 2
+
+    compressed = []
+    monkeypatch.setattr(static_files.gzip, "compress", lambda *a, **k: compressed.append(a) or b"")
+    with server.app.test_request_context("/js/app.js", headers={"Accept-Encoding": "gzip"}):
+        response = static_files.serve(str(tmp_path), "js/app.js")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert compressed == [] # Served from the startup cache
+
+def test_streams_beyond_the_cap_get_a_notice(monkeypatch):
+    monkeypatch.setattr(server, "_stream_slots", threading.BoundedSemaphore(1))
+    assert server._stream_slots.acquire(blocking=False) # One viewer holds the only slot
+    with server.app.test_request_context("/api/queue/stream"):
+        response = server._stream_batch("b1")
+    assert response.status_code == 503
+    frame = json.loads(response.get_data(as_text=True)[len("data: "):])
+    assert frame["done"] and "Too many live viewers" in frame["log"]
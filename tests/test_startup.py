@@ -0,0 +1,39 @@
+import sys
+import time
+import threading
+import json
+import subprocess
+
+from conftest import ROOT
+
+def test_server_import_loads_no_subsystems(tmp_path):
+    """Routes import what they use: a cold `import server` is Flask plus the startup clock."""
+    code = ("import sys, json; sys.path.insert(0, %r); import server; "
+            "print(json.dumps(sorted(m for m in sys.modules if m.startswith(('src.', 'huggingface_hub', 'psutil')))))" % ROOT)
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == ["src.startup", "src.static_files"]
+    assert not list(tmp_path.iterdir()) # Nor does it create state files
+
+def test_hf_utils_import_leaves_huggingface_hub_unloaded(tmp_path):
+    code = "import sys; sys.path.insert(0, %r); from src import hf_utils; print('huggingface_hub' in sys.modules)" % ROOT
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "False"
+
+def test_ready_once_the_served_app_has_started_its_workers(workdir, monkeypatch):
+    import server
+    from src import startup, job_queue, uploader
+    release = threading.Event()
+    monkeypatch.setattr(job_queue, "ensure_worker", lambda: release.wait(10))
+    monkeypatch.setattr(uploader, "ensure_worker", lambda: None)
+    monkeypatch.setattr(startup, "_ready", None)
+    monkeypatch.setattr(server, "_workers_started", False)
+    client = server.app.test_client()
+
+    # The first request (any WSGI host) starts the workers; until they are up the probe says so
+    assert client.get("/api/ready").status_code == 503
+    release.set()
+    deadline = time.time() + 10
+    while not startup.is_ready() and time.time() < deadline: time.sleep(0.05)
+    response = client.get("/api/ready")
+    assert response.status_code == 200
+    assert "workers" in [p["name"] for p in response.get_json()["phases"]]
@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import types
+
+import pytest
+
+from src import storage
+
+UNIQUE = storage.get_unique_name("org/model-GGUF", "model.Q4_K_M.gguf")
+
+def _output(task, acc, version=1.0, limit=None):
+    return {
+        "results": {task: {"alias": task, "acc,none": acc, "acc_stderr,none": 0.01}},
+        "configs": {task: {"task": task, "num_fewshot": 0}},
+        "versions": {task: version},
+        "config": {"model": "hf", "limit": limit}
+    }
+
+def _save(task, acc=0.5, limit=0, **kwargs):
+    return storage.save_result(UNIQUE, _output(task, acc, limit=limit or None), "org/model-GGUF", "model.Q4_K_M.gguf",
+                               [task], limit, **kwargs)
+
+@pytest.fixture
+def signatures(workdir, monkeypatch):
+    """Task definitions as lm_eval would report them now."""
+    current = {}
+    monkeypatch.setattr(storage, "get_task_signature", lambda task: current.get(task))
+    return current
+
+def test_saves_merge_tasks_into_one_record(workdir):
+    _save("arc_easy", 0.6)
+    path = _save("hellaswag", 0.4)
+    with open(path) as f: record = json.load(f)
+    assert set(record["results"]) == {"arc_easy", "hellaswag"}
+    assert record["results"]["arc_easy"]["acc,none"] == 0.6
+    assert record["custom_repo_id"] == "org/model-GGUF"
+    assert storage.check_cache(UNIQUE, ["arc_easy", "hellaswag"])["results"] == record["results"]
+    assert storage.check_cache(UNIQUE, ["arc_easy", "mmlu"]) is None
+    assert storage.get_missing_tasks(UNIQUE, ["mmlu", "arc_easy"]) == ["mmlu"]
+
+def test_limited_and_screened_runs_never_count_as_full_runs(workdir):
+    _save("arc_easy", limit=50)
+    _save("hellaswag", screen=True)
+    assert storage.get_cached_tasks(UNIQUE, ["arc_easy", "hellaswag"]) == []
+    assert storage.get_cached_tasks(UNIQUE, ["arc_easy"], limit=50) == ["arc_easy"]
+    assert storage.get_cached_tasks(UNIQUE, ["arc_easy"], limit=10) == []
+    assert storage.get_cached_tasks(UNIQUE, ["hellaswag"], screen=True) == ["hellaswag"]
+
+def test_legacy_full_run_records_stay_cached(workdir):
+    path = storage.get_result_path(UNIQUE)
+    os.makedirs(storage.RESULTS_DIR, exist_ok=True)
+    with open(path, "w") as f: json.dump(_output("mmlu", 0.7), f)
+    assert storage.get_cached_tasks(UNIQUE, ["mmlu", "gsm8k"]) == ["mmlu"]
+    assert storage.get_cached_tasks(UNIQUE, ["mmlu"], limit=20) == []
+    _save("gsm8k") # The legacy tasks are indexed on the next save
+    assert storage.get_cached_tasks(UNIQUE, ["mmlu", "gsm8k"]) == ["mmlu", "gsm8k"]
+
+def test_changed_task_definition_is_run_again(signatures):
+    signatures["arc_easy"] = {"version": 1.0, "task_hash": "aaaa1111"}
+    _save("arc_easy")
+    assert storage.get_cached_tasks(UNIQUE, ["arc_easy"]) == ["arc_easy"]
+    signatures["arc_easy"] = {"version": 1.0, "task_hash": "bbbb2222"}
+    assert storage.get_missing_tasks(UNIQUE, ["arc_easy"]) == ["arc_easy"]
+
+def test_changed_task_version_is_run_again(signatures):
+    _save("hellaswag") # Output version 1.0, no definition hash known at save time
+    signatures["hellaswag"] = {"version": "1", "task_hash": "cccc3333"}
+    assert storage.get_cached_tasks(UNIQUE, ["hellaswag"]) == ["hellaswag"]
+    signatures["hellaswag"] = {"version": 2.0, "task_hash": "cccc3333"}
+    assert storage.check_cache(UNIQUE, ["hellaswag"]) is None
+
+def test_unknown_definitions_trust_the_record(signatures):
+    _save("custom_task")
+    assert storage.get_cached_tasks(UNIQUE, ["custom_task"]) == ["custom_task"]
+
+def test_signatures_come_from_the_task_yaml(workdir, monkeypatch):
+    yaml_path = workdir / "arc_easy.yaml"
+    yaml_path.write_text(json.dumps({"task": "arc_easy", "metadata": {"version": 1.0}}))
+    fake_utils = types.SimpleNamespace(load_yaml_config=lambda path, mode="full": json.loads(open(path).read()))
+    monkeypatch.setitem(sys.modules, "lm_eval", types.ModuleType("lm_eval"))
+    monkeypatch.setitem(sys.modules, "lm_eval.utils", fake_utils)
+    monkeypatch.setattr(storage, "_task_manager", types.SimpleNamespace(task_index={"arc_easy": {"yaml_path": str(yaml_path)}}))
+
+    first = storage.get_task_signature("arc_easy")
+    assert first["version"] == 1.0 and first["task_hash"]
+    assert storage.get_task_signature("no_such_task") is None
+    _save("arc_easy")
+    assert storage.get_cached_tasks(UNIQUE, ["arc_easy"]) == ["arc_easy"]
+
+    yaml_path.write_text(json.dumps({"task": "arc_easy", "num_fewshot": 5, "metadata": {"version": 1.0}}))
+    storage._task_signatures.clear()
+    assert storage.get_task_signature("arc_easy")["task_hash"] != first["task_hash"]
+    assert storage.get_missing_tasks(UNIQUE, ["arc_easy"]) == ["arc_easy"]
+
+@pytest.fixture
+def task_yamls(workdir, monkeypatch):
+    """Fake lm_eval task index: gsm8k generates, arc_easy is multiple choice, mmlu is a group."""
+    configs = {
+        "gsm8k": {"task": "gsm8k", "output_type": "generate_until"},
+        "arc_easy": {"task": "arc_easy", "output_type": "multiple_choice"},
+        "drop_lite": {"task": "drop_lite"}, # lm_eval's default output type
+        "math_group": {"group": "math_group", "task": ["gsm8k", {"task": "gsm8k_cot", "output_type": "generate_until"}]},
+        "mixed_group": {"group": "mixed_group", "task": ["gsm8k", "arc_easy"]},
+    }
+    index = {}
+    for name, config in configs.items():
+        path = workdir / f"{name}.yaml"
+        path.write_text(json.dumps(config))
+        index[name] = {"type": "group" if "group" in config else "task", "yaml_path": str(path)}
+    index["gen_tag"] = {"type": "tag", "task": ["gsm8k", "drop_lite"], "yaml_path": -1}
+    index["py_task"] = {"type": "python_task", "yaml_path": -1}
+    fake_utils = types.SimpleNamespace(load_yaml_config=lambda path, mode="full": json.loads(open(path).read()))
+    monkeypatch.setitem(sys.modules, "lm_eval", types.ModuleType("lm_eval"))
+    monkeypatch.setitem(sys.modules, "lm_eval.utils", fake_utils)
+    monkeypatch.setattr(storage, "_task_manager", types.SimpleNamespace(task_index=index))
+
+def test_task_output_types(task_yamls):
+    assert storage.get_task_output_types("gsm8k") == {"generate_until"}
+    assert storage.get_task_output_types("drop_lite") == {"generate_until"}
+    assert storage.get_task_output_types("math_group") == {"generate_until"}
+    assert storage.get_task_output_types("gen_tag") == {"generate_until"}
+    assert storage.get_task_output_types("mixed_group") == {"generate_until", "multiple_choice"}
+    assert storage.get_task_output_types("py_task") is None
+    assert storage.get_task_output_types("no_such_task") is None
+
+def test_first_leaf_of_groups_and_tags(task_yamls):
+    assert storage.get_first_leaf("arc_easy") == "arc_easy"
+    assert storage.get_first_leaf("mixed_group") == "gsm8k"
+    assert storage.get_first_leaf("gen_tag") == "gsm8k"
+    assert storage.get_first_leaf("py_task") == "py_task"
+    assert storage.get_first_leaf("no_such_task") is None
+
+def test_llama_server_only_runs_generation_tasks(task_yamls, monkeypatch):
+    from src import llama_backend
+    tasks = ["gsm8k", "arc_easy", "math_group", "mixed_group", "py_task"]
+    monkeypatch.setattr(llama_backend, "LLAMA_SERVER_BIN", None)
+    assert llama_backend.unsupported_tasks(tasks) == []
+    monkeypatch.setattr(llama_backend, "LLAMA_SERVER_BIN", "/opt/llama.cpp/llama-server")
+    assert llama_backend.unsupported_tasks(tasks) == ["arc_easy", "mixed_group", "py_task"]
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from src import uploader
+
+class FakeSpace:
+    """Stands in for the Gradio client of the submission Space."""
+    def __init__(self, fail=0, during=None):
+        self.fail, self.during, self.calls = fail, during, []
+
+    def predict(self, file_path, api_name):
+        self.calls.append((file_path, api_name))
+        if self.during: self.during()
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("Space unreachable")
+        return "Accepted"
+
+@pytest.fixture
+def space(workdir, monkeypatch):
+    fake = FakeSpace()
+    monkeypatch.setattr(uploader.hf_utils, "get_submission_client", lambda: fake)
+    monkeypatch.setattr(uploader, "ensure_worker", lambda: None) # Drained by hand below
+    monkeypatch.setattr(uploader, "_client", None)
+    return fake
+
+def _record(workdir, name="rec.json"):
+    path = workdir / name
+    path.write_text(json.dumps({"results": {"mmlu": {"acc,none": 0.5}}}))
+    return str(path)
+
+def _drain():
+    for row in uploader._due_items(): uploader._upload_one(row["path"], row["attempts"], row["version"])
+
+def _row(path):
+    return next(i for i in uploader.get_status()["items"] if i["path"] == path)
+
+def test_upload_is_sent_once_and_marked_done(workdir, space):
+    path = _record(workdir)
+    assert uploader.enqueue_upload(path) == 1
+    _drain()
+    assert _row(path)["status"] == "done" and _row(path)["response"] == "Accepted"
+    assert len(space.calls) == 1 and space.calls[0][1] == "/handle_upload"
+    assert space.calls[0][0]["path"] == path
+    assert uploader.get_depth() == 0
+
+def test_failures_back_off_then_fail(workdir, space, monkeypatch):
+    monkeypatch.setattr(uploader, "MAX_ATTEMPTS", 2)
+    space.fail = 5
+    path = _record(workdir)
+    uploader.enqueue_upload(path)
+    _drain()
+    row = _row(path)
+    assert row["status"] == "pending" and row["attempts"] == 1 and "unreachable" in row["last_error"]
+    assert uploader._due_items() == [] # Waiting out its backoff
+    uploader.retry_failed(path)        # Due again now
+    with uploader._connect() as conn: conn.execute("UPDATE outbox SET attempts = 1")
+    _drain()
+    assert _row(path)["status"] == "failed"
+    assert uploader.retry_failed() == 1 and _row(path)["status"] == "pending"
+
+def test_reenqueue_during_upload_keeps_the_newer_record_pending(workdir, space):
+    path = _record(workdir)
+    uploader.enqueue_upload(path)
+    space.during = lambda: uploader.enqueue_upload(path) # Another task merged into the record mid-upload
+    _drain()
+    assert _row(path)["status"] == "pending"
+    space.during = None
+    _drain()
+    assert _row(path)["status"] == "done" and len(space.calls) == 2
+
+def test_missing_record_fails_without_calling_the_space(workdir, space):
+    path = _record(workdir)
+    uploader.enqueue_upload(path)
+    (workdir / "rec.json").unlink()
+    _drain()
+    assert _row(path)["status"] == "failed" and space.calls == []